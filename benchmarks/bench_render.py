@@ -0,0 +1,77 @@
+# coding: utf-8
+"""
+Сравнение отрисовки структуры через шаблоны полей и встроенным python-рендерером.
+
+    python benchmarks/bench_render.py [--sizes 50 500 2000] [--repeat 5]
+"""
+import argparse
+import os
+import sys
+import timeit
+
+import django
+from django.conf import settings
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+settings.configure(
+    DATABASES={'default': {'ENGINE': 'django.db.backends.sqlite3', 'NAME': ':memory:'}},
+    INSTALLED_APPS=['django.contrib.contenttypes', 'django.contrib.auth', 'dyn_struct'],
+    TEMPLATES=[{'BACKEND': 'django.template.backends.django.DjangoTemplates', 'APP_DIRS': True}],
+    USE_TZ=True,
+)
+django.setup()
+
+from django.core.management import call_command  # noqa: E402
+from django.test.utils import override_settings  # noqa: E402
+
+from dyn_struct import rendering  # noqa: E402
+from dyn_struct.db import models  # noqa: E402
+
+
+def create_structure(size):
+    struct = models.DynamicStructure.objects.create(name='bench_{}'.format(size))
+    fields = []
+    for i in range(size):
+        if i % 10 == 0:
+            fields.append(models.DynamicStructureField(structure=struct, header='Раздел {}'.format(i),
+                                                       row=i, position=0, classes='col-md-12'))
+        fields.append(models.DynamicStructureField(structure=struct, name='field{}'.format(i),
+                                                   form_field='CharField', form_kwargs='{"required": false}',
+                                                   row=i, position=1, classes='col-md-6'))
+    models.DynamicStructureField.objects.bulk_create(fields)
+    return struct
+
+
+def bench(struct, template, value, repeat):
+    rendering.render_structure(struct, 'data', value, template)
+    return min(timeit.repeat(lambda: rendering.render_structure(struct, 'data', value, template),
+                             number=1, repeat=repeat))
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--sizes', nargs='+', type=int, default=[50, 500, 2000])
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--template', default='bootstrap3', choices=sorted(rendering.PYTHON_RENDERERS))
+    args = parser.parse_args()
+
+    call_command('migrate', verbosity=0)
+
+    print('{:>6} {:>12} {:>12} {:>8}'.format('fields', 'templates', 'python', 'speedup'))
+    for size in args.sizes:
+        struct = create_structure(size)
+        value = {'data-field{}'.format(i): 'value {}'.format(i) for i in range(size)}
+
+        with override_settings(DYN_STRUCT_PYTHON_RENDERER=False):
+            template_time = bench(struct, args.template, value, args.repeat)
+        with override_settings(DYN_STRUCT_PYTHON_RENDERER=True):
+            python_time = bench(struct, args.template, value, args.repeat)
+
+        print('{:>6} {:>11.4f}s {:>11.4f}s {:>7.1f}x'.format(
+            size, template_time, python_time, template_time / python_time
+        ))
+
+
+if __name__ == '__main__':
+    main()
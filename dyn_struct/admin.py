@@ -18,11 +18,15 @@ class DynamicStructureField(admin.ModelAdmin):
         return qs
 
     def save_model(self, request, obj, form, change):
+        if change and not form.has_changed():
+            # поле не изменилось - новая версия структуры не нужна
+            return
+
         if obj.structure.fields.exists():
-            obj.structure.clone(exclude_field=obj)
-            obj.structure_id = obj.structure.id
-            obj.id = None
+            # новая версия создается вместе с измененным полем в одной транзакции
+            obj.structure.clone(fields_override=[obj])
             form.fields['structure'].queryset = models.DynamicStructure.objects.all()
+            return
         return super(DynamicStructureField, self).save_model(request, obj, form, change)
 
 admin.site.register(models.DynamicStructureField, DynamicStructureField)
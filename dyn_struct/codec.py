@@ -0,0 +1,101 @@
+# coding: utf-8
+import json
+
+from django.conf import settings
+
+from dyn_struct.db import fields
+
+# форматы хранения данных объекта:
+# 1 - form_data и полный verbose_data (с отступами)
+# 2 - только ссылка на структуру и значения, verbose_data строится при чтении по версии структуры
+FORMAT_VERBOSE = 1
+FORMAT_COMPACT = 2
+FORMATS = (FORMAT_VERBOSE, FORMAT_COMPACT)
+
+
+def get_default_format():
+    return getattr(settings, 'DYN_STRUCT_DATA_FORMAT', FORMAT_VERBOSE)
+
+
+def get_format(data):
+    return data.get('format', FORMAT_VERBOSE)
+
+
+def decode(value):
+    """ Разобранные данные объекта любого формата (изменять результат нельзя) """
+    return fields.parse_data(value)
+
+
+def encode(struct_name, version, form_data, verbose_data=None, data_format=None):
+    data_format = data_format or get_default_format()
+    if data_format not in FORMATS:
+        raise ValueError('Неизвестный формат данных {}'.format(data_format))
+
+    if data_format == FORMAT_COMPACT:
+        dynamic_data = {
+            'structure': struct_name,
+            'version': version,
+            'format': FORMAT_COMPACT,
+            'form_data': form_data,
+        }
+        return json.dumps(dynamic_data, ensure_ascii=False, separators=(',', ':'))
+
+    dynamic_data = {
+        'structure': struct_name,
+        'version': version,
+        'form_data': form_data,
+        'verbose_data': verbose_data,
+    }
+    return json.dumps(dynamic_data, indent=4, ensure_ascii=False)
+
+
+def encode_structure_data(struct, form_data, data_format=None):
+    data_format = data_format or get_default_format()
+
+    verbose_data = None
+    if data_format == FORMAT_VERBOSE:
+        verbose_data = build_verbose_data(struct, form_data)
+    return encode(struct.name, struct.version, form_data, verbose_data, data_format)
+
+
+def recode(value, data_format=FORMAT_COMPACT):
+    """ Перекодирование данных объекта в другой формат """
+    data = decode(value)
+    verbose_data = data.get('verbose_data')
+    if data_format == FORMAT_VERBOSE and verbose_data is None:
+        verbose_data = build_verbose_data(get_structure(data), data['form_data'])
+    return encode(data['structure'], data['version'], data['form_data'], verbose_data, data_format)
+
+
+def build_verbose_data(struct, form_data):
+    """ Удобные для отображения данные формы """
+    verbose_data = []
+    for field in struct.get_compiled().fields:
+        item = {
+            'row': field.row,
+            'position': field.position,
+            'is_header': field.is_header(),
+            'name': field.name or field.header,
+            'value': None,
+            'classes': field.classes,
+        }
+        if not field.is_header():
+            # содержимое файлов (или ссылка на них) хранится под тем же ключом, что и значения полей
+            item['value'] = form_data.get(field.get_transliterate_name())
+
+        verbose_data.append(item)
+    return verbose_data
+
+
+def get_structure(data):
+    from dyn_struct.db import models
+    return models.DynamicStructure.standard_objects.get(name=data['structure'], version=data['version'])
+
+
+def get_verbose_data(data, struct=None):
+    if get_format(data) == FORMAT_VERBOSE:
+        return data['verbose_data']
+
+    if struct is None:
+        struct = get_structure(data)
+    return build_verbose_data(struct, data['form_data'])
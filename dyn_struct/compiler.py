@@ -0,0 +1,159 @@
+# coding: utf-8
+import copy
+import itertools
+import threading
+from collections import OrderedDict
+
+from django import forms
+from django.conf import settings
+
+from dyn_struct import sharedcache
+
+
+class LRUCache(object):
+    """ Потокобезопасный словарь с вытеснением давно не используемых ключей """
+
+    def __init__(self, maxsize=128):
+        self.maxsize = maxsize
+        self._data = OrderedDict()
+        self._lock = threading.RLock()
+
+    def __len__(self):
+        return len(self._data)
+
+    def __contains__(self, key):
+        return key in self._data
+
+    def get(self, key, default=None):
+        with self._lock:
+            if key not in self._data:
+                return default
+            self._data.move_to_end(key)
+            return self._data[key]
+
+    def set(self, key, value):
+        with self._lock:
+            self._data[key] = value
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def pop(self, key, default=None):
+        with self._lock:
+            return self._data.pop(key, default)
+
+    def keys(self):
+        with self._lock:
+            return list(self._data.keys())
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+
+class CompiledStructure(object):
+    """
+    Скомпилированная версия динамической структуры.
+    Класс формы собирается один раз на версию с данным набором полей (см. get_compiled),
+    а на каждый запрос создается только экземпляр формы.
+    """
+
+    def __init__(self, struct, fields):
+        self.name = struct.name
+        self.version = struct.version
+        self.fields = tuple(fields)
+        self.form_class = self._build_form_class()
+        self.rows = self._build_rows()
+        # отрисованные фрагменты разметки (см. rendering), сбрасываются вместе с версией
+        self.render_cache = {}
+        # производные данные версии (значения по-умолчанию и т.п., см. datatools)
+        self.data_cache = {}
+
+    def _build_form_class(self):
+        base_fields = OrderedDict()
+        for field in self.fields:
+            if not field.name:
+                continue
+            base_fields[field.get_transliterate_name()] = field.build()
+
+        # поля задаются через base_fields, а не атрибутами класса,
+        # чтобы названия полей не перекрывали методы формы (clean, data, ...)
+        form_class = type('DynamicStructureCompiledForm', (forms.Form, ), {})
+        form_class.base_fields = base_fields
+        return form_class
+
+    def _build_rows(self):
+        # план раскладки: строки из пар (поле, ключ в форме), ключ заголовка - None
+        fields = sorted(self.fields, key=lambda f: (f.row, f.position))
+
+        rows = []
+        for _, row in itertools.groupby(fields, lambda f: f.row):
+            rows.append(tuple(
+                (field, None if field.is_header() else field.get_transliterate_name())
+                for field in row
+            ))
+        return tuple(rows)
+
+    def bind_rows(self, form):
+        """ Строки структуры с привязанными полями формы; сам план при этом не меняется """
+        table = []
+        for row in self.rows:
+            bound_row = []
+            for field, field_name in row:
+                field = copy.copy(field)
+                if field_name is not None:
+                    field.bound_field = form[field_name]
+                bound_row.append(field)
+            table.append(bound_row)
+        return table
+
+
+_compiled_structures = None
+_compiled_structures_lock = threading.Lock()
+
+
+def get_cache():
+    # размер берется из настроек при первом обращении, а не при импорте модуля
+    global _compiled_structures
+    if _compiled_structures is None:
+        with _compiled_structures_lock:
+            if _compiled_structures is None:
+                maxsize = getattr(settings, 'DYN_STRUCT_COMPILED_CACHE_SIZE', 128)
+                _compiled_structures = LRUCache(maxsize=maxsize)
+    return _compiled_structures
+
+
+def get_compiled(struct):
+    cache = get_cache()
+    # поля версии могут быть изменены на месте (загрузка версий из файла, правка первого поля в админке),
+    # а invalidate() сбрасывает только кэш текущего процесса: по отпечатку в ключе изменение видят все процессы
+    key = (struct.name, struct.version, struct.fingerprint)
+    compiled = cache.get(key)
+    if compiled is None:
+        compiled = CompiledStructure(struct, sharedcache.get_fields(struct))
+        cache.set(key, compiled)
+    return compiled
+
+
+def invalidate(name, version=None):
+    """ Сброс скомпилированных версий структуры (всех, если версия не указана) """
+    cache = get_cache()
+    if version is not None:
+        for key in cache.keys():
+            if key[:2] == (name, version):
+                cache.pop(key)
+        sharedcache.invalidate_fields(name, [version])
+        return
+
+    if sharedcache.get_cache() is not None:
+        from dyn_struct.db import models
+        versions = models.DynamicStructure.standard_objects.filter(name=name).values_list('version', flat=True)
+        sharedcache.invalidate_fields(name, list(versions))
+
+    for key in cache.keys():
+        if key[0] == name:
+            cache.pop(key)
+
+
+def clear():
+    get_cache().clear()
@@ -0,0 +1,4 @@
+"""
+Проекция динамических данных в таблицу DynamicValue (см. dyn_struct.projection).
+Подключается отдельно: 'dyn_struct.contrib.projection' в INSTALLED_APPS, требует django.contrib.contenttypes
+"""
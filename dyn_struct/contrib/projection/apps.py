@@ -0,0 +1,12 @@
+from django.apps import AppConfig
+
+
+class ProjectionConfig(AppConfig):
+    name = 'dyn_struct.contrib.projection'
+    label = 'dyn_struct_projection'
+    verbose_name = 'Проекция динамических данных'
+    default_auto_field = 'django.db.models.AutoField'
+
+    def ready(self):
+        from dyn_struct import projection
+        projection.connect_signals()
@@ -0,0 +1,41 @@
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+        ('contenttypes', '0002_remove_content_type_name'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DynamicValue',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('object_id', models.BigIntegerField(verbose_name='ID объекта')),
+                ('structure_name', models.CharField(max_length=255, verbose_name='Структура')),
+                ('structure_version', models.PositiveIntegerField(verbose_name='Версия структуры')),
+                ('key', models.CharField(max_length=512, verbose_name='Ключ в форме')),
+                ('value_text', models.CharField(max_length=255, null=True, verbose_name='Строковое значение')),
+                ('value_number', models.FloatField(null=True, verbose_name='Числовое значение')),
+                ('value_bool', models.BooleanField(null=True, verbose_name='Логическое значение')),
+                ('content_type', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE,
+                                                   to='contenttypes.contenttype', verbose_name='Тип объекта')),
+            ],
+            options={
+                'verbose_name': 'значение динамического поля',
+                'verbose_name_plural': 'значения динамических полей',
+                'indexes': [
+                    models.Index(fields=['content_type', 'object_id'], name='dyn_struct_value_object'),
+                    models.Index(fields=['content_type', 'key', 'value_text'], name='dyn_struct_value_text'),
+                    models.Index(fields=['content_type', 'key', 'value_number'], name='dyn_struct_value_number'),
+                    models.Index(fields=['content_type', 'key', 'value_bool'], name='dyn_struct_value_bool'),
+                    models.Index(fields=['structure_name', 'structure_version', 'key'],
+                                 name='dyn_struct_value_structure'),
+                ],
+            },
+        ),
+    ]
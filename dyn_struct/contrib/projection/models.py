@@ -0,0 +1,29 @@
+# coding: utf-8
+from django.contrib.contenttypes.models import ContentType
+from django.db import models
+
+
+class DynamicValue(models.Model):
+    """
+    Проекция динамических данных объекта: строка на каждое значение поля формы (см. projection).
+    Заполняется при включенной настройке DYN_STRUCT_PROJECTION либо командой rebuild_dynamic_values
+    """
+    content_type = models.ForeignKey(ContentType, verbose_name='Тип объекта', on_delete=models.CASCADE)
+    object_id = models.BigIntegerField(verbose_name='ID объекта')
+    structure_name = models.CharField(max_length=255, verbose_name='Структура')
+    structure_version = models.PositiveIntegerField(verbose_name='Версия структуры')
+    key = models.CharField(max_length=512, verbose_name='Ключ в форме')
+    value_text = models.CharField(max_length=255, verbose_name='Строковое значение', null=True)
+    value_number = models.FloatField(verbose_name='Числовое значение', null=True)
+    value_bool = models.BooleanField(verbose_name='Логическое значение', null=True)
+
+    class Meta:
+        verbose_name = 'значение динамического поля'
+        verbose_name_plural = 'значения динамических полей'
+        indexes = [
+            models.Index(fields=['content_type', 'object_id'], name='dyn_struct_value_object'),
+            models.Index(fields=['content_type', 'key', 'value_text'], name='dyn_struct_value_text'),
+            models.Index(fields=['content_type', 'key', 'value_number'], name='dyn_struct_value_number'),
+            models.Index(fields=['content_type', 'key', 'value_bool'], name='dyn_struct_value_bool'),
+            models.Index(fields=['structure_name', 'structure_version', 'key'], name='dyn_struct_value_structure'),
+        ]
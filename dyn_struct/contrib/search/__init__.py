@@ -0,0 +1,4 @@
+"""
+Полнотекстовый поиск по динамическим данным (см. dyn_struct.search).
+Подключается отдельно: 'dyn_struct.contrib.search' в INSTALLED_APPS, требует django.contrib.contenttypes
+"""
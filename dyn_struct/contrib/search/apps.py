@@ -0,0 +1,12 @@
+from django.apps import AppConfig
+
+
+class SearchConfig(AppConfig):
+    name = 'dyn_struct.contrib.search'
+    label = 'dyn_struct_search'
+    verbose_name = 'Поиск по динамическим данным'
+    default_auto_field = 'django.db.models.AutoField'
+
+    def ready(self):
+        from dyn_struct import search
+        search.connect_signals()
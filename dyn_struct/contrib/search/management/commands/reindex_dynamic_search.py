@@ -0,0 +1,26 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from dyn_struct import recoding, search
+from dyn_struct.db.models import DynamicStructureMixin
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the full-text search index of dynamic data for model records'
+
+    def add_arguments(self, parser):
+        parser.add_argument('-m', '--model', dest='models', type=str, action='append', required=True,
+                            help='app_label.ModelName, can be repeated')
+        parser.add_argument('-c', '--chunk-size', dest='chunk_size', type=int, default=500)
+
+    def handle(self, *args, **options):
+        for model_label in options['models']:
+            try:
+                model = recoding.get_model(model_label)
+            except (LookupError, ValueError) as ex:
+                raise CommandError(str(ex))
+
+            if not issubclass(model, DynamicStructureMixin):
+                raise CommandError('{} does not use DynamicStructureMixin'.format(model_label))
+
+            count, documents_count = search.reindex(model, chunk_size=options['chunk_size'])
+            self.stdout.write('{}: {} records, {} documents'.format(model_label, count, documents_count))
@@ -0,0 +1,59 @@
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+def has_fts5(connection):
+    with connection.cursor() as cursor:
+        cursor.execute("SELECT sqlite_compileoption_used('ENABLE_FTS5')")
+        return bool(cursor.fetchone()[0])
+
+
+def create_search_index(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+    if vendor == 'sqlite':
+        # SQLite без FTS5: таблица не создается, поиск выполняется через icontains
+        if has_fts5(schema_editor.connection):
+            schema_editor.execute('CREATE VIRTUAL TABLE IF NOT EXISTS dyn_struct_search_fts USING fts5(text)')
+    elif vendor == 'postgresql':
+        schema_editor.execute(
+            "CREATE INDEX IF NOT EXISTS dyn_struct_search_tsv ON dyn_struct_search_dynamicsearchdocument "
+            "USING GIN (to_tsvector('simple', text))"
+        )
+
+
+def drop_search_index(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+    if vendor == 'sqlite':
+        schema_editor.execute('DROP TABLE IF EXISTS dyn_struct_search_fts')
+    elif vendor == 'postgresql':
+        schema_editor.execute('DROP INDEX IF EXISTS dyn_struct_search_tsv')
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+        ('contenttypes', '0002_remove_content_type_name'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DynamicSearchDocument',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('object_id', models.BigIntegerField(verbose_name='ID объекта')),
+                ('structure_name', models.CharField(max_length=255, verbose_name='Структура')),
+                ('structure_version', models.PositiveIntegerField(verbose_name='Версия структуры')),
+                ('text', models.TextField(verbose_name='Текст')),
+                ('content_type', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE,
+                                                   to='contenttypes.contenttype', verbose_name='Тип объекта')),
+            ],
+            options={
+                'verbose_name': 'поисковый документ динамических данных',
+                'verbose_name_plural': 'поисковые документы динамических данных',
+                'unique_together': {('content_type', 'object_id')},
+            },
+        ),
+        migrations.RunPython(create_search_index, drop_search_index),
+    ]
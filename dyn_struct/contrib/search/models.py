@@ -0,0 +1,20 @@
+# coding: utf-8
+from django.contrib.contenttypes.models import ContentType
+from django.db import models
+
+
+class DynamicSearchDocument(models.Model):
+    """
+    Текстовые значения динамических данных объекта для полнотекстового поиска (см. search).
+    Заполняется при включенной настройке DYN_STRUCT_SEARCH либо командой reindex_dynamic_search
+    """
+    content_type = models.ForeignKey(ContentType, verbose_name='Тип объекта', on_delete=models.CASCADE)
+    object_id = models.BigIntegerField(verbose_name='ID объекта')
+    structure_name = models.CharField(max_length=255, verbose_name='Структура')
+    structure_version = models.PositiveIntegerField(verbose_name='Версия структуры')
+    text = models.TextField(verbose_name='Текст')
+
+    class Meta:
+        verbose_name = 'поисковый документ динамических данных'
+        verbose_name_plural = 'поисковые документы динамических данных'
+        unique_together = ('content_type', 'object_id')
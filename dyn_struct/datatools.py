@@ -1,8 +1,16 @@
 # coding: utf-8
-import json
 import base64
+import collections
+import concurrent.futures
+import copy
+import hashlib
+import json
+import django
 import django.forms
+from django.apps import apps
+from django.db import connections
 from djutils.forms import transform_form_error
+from dyn_struct import codec, filestorage
 from dyn_struct.exceptions import CheckClassArgumentsException
 
 
@@ -14,6 +22,50 @@ def get_django_widgets():
     return django.forms.widgets.__all__
 
 
+# унаследованные при fork соединения родителя: ссылки хранятся, чтобы деструктор драйвера их не закрыл
+_inherited_connections = []
+
+
+def init_process_worker():
+    """
+    Инициализация дочернего процесса: соединения с БД родителя отбрасываются без закрытия
+    (закрытие в дочернем процессе оборвало бы соединение родителя), при обращении к БД откроются новые
+    """
+    if not apps.ready:
+        django.setup()
+    for connection in connections.all(initialized_only=True):
+        if connection.connection is not None:
+            _inherited_connections.append(connection.connection)
+            connection.connection = None
+
+
+def map_chunks(func, chunks, workers=1):
+    """
+    Обработка порций с сохранением порядка, при workers > 1 - пулом процессов.
+    Процессы запускаются до чтения первой порции, в очереди не больше двух порций на процесс,
+    поэтому память не зависит от объема данных
+    :param func: функция уровня модуля (передается в дочерний процесс), принимает порцию
+    :return: генератор результатов
+    """
+    if workers <= 1:
+        for chunk in chunks:
+            yield func(chunk)
+        return
+
+    pending = collections.deque()
+    with concurrent.futures.ProcessPoolExecutor(max_workers=workers, initializer=init_process_worker) as executor:
+        # при fork все процессы запускаются с первой задачей: пустая задача запускает их до чтения порций,
+        # чтобы дочерним процессам не достался открытый курсор родителя
+        executor.submit(int).result()
+        for chunk in chunks:
+            pending.append(executor.submit(func, chunk))
+            if len(pending) >= workers * 2:
+                yield pending.popleft().result()
+
+        while pending:
+            yield pending.popleft().result()
+
+
 def get_all_bases_classes(class_obj, base_classes=None):
     if base_classes is None:
         base_classes = [class_obj, ]
@@ -69,60 +121,54 @@ def structure_from_dict(struct_info, use_local_version=False, struct_name=None):
     :param struct_name: название структуры (по-умолчанию берется из файла)
     :return:
     """
-    from dyn_struct.db import models
-
-    name = struct_name or struct_info.get('name')
-
-    if use_local_version:
-        struct, created = models.DynamicStructure.objects.get_or_create(name=name)
-
-        if not created:
-            struct.clone()
-            struct = models.DynamicStructure.objects.get(name=name)
-    else:
-        version = struct_info.get('version', 1)
-        struct, _, = models.DynamicStructure.objects.get_or_create(
-            name=name,
-            version=version,
-            is_deprecated=struct_info.get('is_deprecated', False)
-        )
-
-    for field_info in struct_info['fields']:
-        struct_field, created = struct.fields.get_or_create(
-            name=field_info['name'],
-            header=field_info['header'],
-            defaults=field_info
-        )
-        if not created:
-            struct.fields.filter(id=struct_field.id).update(**field_info)
+    from dyn_struct import loading
 
-    models.DynamicStructure.objects.filter(name=name, version__lt=struct.version).update(is_deprecated=True)
+    struct, _ = loading.load_structure(struct_info, use_local_version=use_local_version, struct_name=struct_name)
     return struct
 
 
+STRUCTURE_FIELD_KEYS = (
+    'header', 'name', 'form_field', 'form_kwargs', 'widget', 'widget_kwargs', 'row', 'position', 'classes',
+)
+
+
+def get_field_data(field):
+    return {key: getattr(field, key) for key in STRUCTURE_FIELD_KEYS}
+
+
 def get_structure_fields_data(struct):
-    fields_data = []
-    for field in struct.fields.all():
-        fields_data.append({
-            'header': field.header,
-            'name': field.name,
-            'form_field': field.form_field,
-            'form_kwargs': field.form_kwargs,
-            'widget': field.widget,
-            'widget_kwargs': field.widget_kwargs,
-            'row': field.row,
-            'position': field.position,
-            'classes': field.classes,
-        })
-
-    return fields_data
+    return [get_field_data(field) for field in struct.fields.all()]
 
 
-def get_structure_initial(struct, prefix=None):
-    """ Параметры по-умолчанию для формы на основе настроек """
+def _normalize_kwargs(value):
+    # параметры хранятся в JSON с разным форматированием (clean() добавляет отступы)
+    try:
+        return json.loads(value) if value else {}
+    except (TypeError, ValueError):
+        return value
+
+
+def get_fields_fingerprint(fields_data):
+    """
+    Отпечаток набора полей структуры: не зависит от порядка полей и форматирования JSON-параметров
+    :param fields_data: словари полей (см. get_structure_fields_data)
+    """
+    normalized = []
+    for field_data in fields_data:
+        item = {key: field_data.get(key) for key in STRUCTURE_FIELD_KEYS}
+        item['form_kwargs'] = _normalize_kwargs(item['form_kwargs'])
+        item['widget_kwargs'] = _normalize_kwargs(item['widget_kwargs'])
+        normalized.append(item)
+
+    normalized.sort(key=lambda i: (i['row'] or 0, i['position'] or 0, i['name'] or '', i['header'] or ''))
+    dumped = json.dumps(normalized, sort_keys=True, ensure_ascii=False, separators=(',', ':'))
+    return hashlib.sha256(dumped.encode('utf-8')).hexdigest()
+
+
+def _build_structure_initial(compiled, prefix=None):
     initial = {}
 
-    for field_name, field in struct.build_form().fields.items():
+    for field_name, field in compiled.form_class.base_fields.items():
         if prefix:
             field_name = prefix + '-' + field_name
 
@@ -139,32 +185,62 @@ def get_structure_initial(struct, prefix=None):
     return initial
 
 
-def get_structure_initial_data(struct, prefix=None, validate=True):
+def get_structure_initial(struct, prefix=None):
+    """ Параметры по-умолчанию для формы на основе настроек (запоминаются для версии структуры) """
+    compiled = struct.get_compiled()
+    key = ('initial', prefix)
+    initial = compiled.data_cache.get(key)
+    if initial is None:
+        initial = _build_structure_initial(compiled, prefix)
+        compiled.data_cache[key] = initial
+    return copy.deepcopy(initial)
+
+
+def get_structure_initial_data(struct, prefix=None, validate=True, data_format=None):
     """ Получение значения параметра data, которое записывается в объект """
-    initial = get_structure_initial(struct, prefix)
-    return get_structure_data(struct, initial, validate)
+    data_format = data_format or codec.get_default_format()
+    compiled = struct.get_compiled()
 
+    # проверенное значение подходит и для вызова без проверки, но не наоборот
+    json_data = compiled.data_cache.get(('initial_data', prefix, data_format, True))
+    if json_data is None and not validate:
+        json_data = compiled.data_cache.get(('initial_data', prefix, data_format, False))
+
+    if json_data is None:
+        initial = get_structure_initial(struct, prefix)
+        json_data = get_structure_data(struct, initial, validate, data_format)
+        compiled.data_cache[('initial_data', prefix, data_format, validate)] = json_data
+    return json_data
+
+
+def get_structure_initial_data_batch(struct, count, prefix=None, validate=True, data_format=None):
+    """
+    Значения параметра data по-умолчанию для пакетного создания объектов:
+    структура загружается и проверяется один раз на все объекты
+    """
+    json_data = get_structure_initial_data(struct, prefix, validate, data_format)
+    return [json_data] * count
 
-def get_structure_data(struct, data, validate=True):
-    # удобные для отображения данные формы
-    verbose_data = []
-    files = {}
-    for field in struct.fields.all():
-        item = {
-            'row': field.row,
-            'position': field.position,
-            'is_header': field.is_header(),
-            'name': field.name or field.header,
-            'value': None,
-            'classes': field.classes,
-        }
-        if not field.is_header():
-            item['value'] = data[field.get_transliterate_name()]
 
+def get_structure_files(struct, data):
+    """ Загруженные файлы из данных формы по ключу поля в форме """
+    files = {}
+    for field in struct.get_compiled().fields:
         if field.widget == 'FileInput':
-            files[item['name']] = item['value']
+            key = field.get_transliterate_name()
+            files[key] = data[key]
+    return files
+
 
-        verbose_data.append(item)
+def get_structure_data(struct, data, validate=True, data_format=None, file_storage=None):
+    """
+    Получение значения параметра data, которое записывается в объект
+    :param data_format: формат хранения (codec.FORMAT_VERBOSE / codec.FORMAT_COMPACT),
+        по-умолчанию берется из настройки DYN_STRUCT_DATA_FORMAT
+    :param file_storage: хранилище для загруженных файлов (см. filestorage.get_storage),
+        без него содержимое файлов записывается в данные в base64
+    """
+    files = get_structure_files(struct, data)
 
     # проверим, что переданные данные являются валидными для данной формы
     struct_form = struct.build_form(data=data, files=files, prefix=None)
@@ -172,17 +248,28 @@ def get_structure_data(struct, data, validate=True):
         form_errors = transform_form_error(struct_form)
         raise django.forms.ValidationError(', '.join(form_errors))
 
-    dynamic_data = {
-        'structure': struct.name,
-        'version': struct.version,
-        'form_data': data,
-        'verbose_data': verbose_data,
-    }
+    return serialize_structure_data(struct, data, files, data_format, file_storage)
 
+
+def serialize_structure_data(struct, data, files=None, data_format=None, file_storage=None):
+    """
+    Значение параметра data для уже проверенных данных формы (без повторной валидации)
+    :param files: загруженные файлы (см. get_structure_files), по-умолчанию берутся из data
+    """
+    if files is None:
+        files = get_structure_files(struct, data)
+
+    storage = filestorage.get_storage(file_storage)
+    storage_name = filestorage.get_storage_name(file_storage, storage) if storage is not None else None
+    form_data = data
     for f_field_name, f in files.items():
         if not f:
             continue
 
+        if storage is not None:
+            form_data[f_field_name] = filestorage.store_file(f, storage, storage_name)
+            continue
+
         content = f.read()
         if hasattr(f, 'seek') and callable(f.seek):
             f.seek(0)
@@ -191,10 +278,6 @@ def get_structure_data(struct, data, validate=True):
         if hasattr(f, 'image'):
             content_base64 = f'data:image/{f.image.format.lower()};base64,' + content_base64
 
-        dynamic_data['form_data'][f_field_name] = content_base64
-        for verbose_item in dynamic_data['verbose_data']:
-            if verbose_item['name'] == f_field_name:
-                verbose_item['value'] = content_base64
-                break
+        form_data[f_field_name] = content_base64
 
-    return json.dumps(dynamic_data, indent=4, ensure_ascii=False)
+    return codec.encode_structure_data(struct, form_data, data_format)
@@ -1,7 +1,16 @@
+# coding: utf-8
+import json
+import re
+
 from django.db import models
+from django.db.models.query_utils import DeferredAttribute
+from django.utils.functional import cached_property
 
 from dyn_struct.db import validators
 
+# начало данных, которые пишет get_structure_data: {"structure": ..., "version": ...
+DATA_HEADER_RE = re.compile(r'\A\s*\{\s*"structure"\s*:\s*("(?:[^"\\]|\\.)*")\s*,\s*"version"\s*:\s*(\d+)')
+
 
 class ParamsField(models.TextField):
 
@@ -12,3 +21,67 @@ class ParamsField(models.TextField):
             validators.ParamsValidator()
         ])
         return field_validators
+
+
+def parse_data_header(value):
+    """
+    Название и версия структуры из JSON-данных объекта без разбора form_data/verbose_data
+    :return: (название структуры, версия)
+    """
+    if isinstance(value, DynamicData):
+        return value.header
+
+    match = DATA_HEADER_RE.match(value)
+    if match:
+        return json.loads(match.group(1)), int(match.group(2))
+
+    data = json.loads(value)
+    return data['structure'], data['version']
+
+
+def parse_data(value):
+    """ Разобранные JSON-данные объекта (для DynamicData - из кэша, изменять результат нельзя) """
+    if isinstance(value, DynamicData):
+        return value.parsed
+    return json.loads(value)
+
+
+class DynamicData(str):
+    """ JSON-данные динамической структуры, которые разбираются один раз и кэшируются """
+
+    @cached_property
+    def parsed(self):
+        return json.loads(self)
+
+    @cached_property
+    def header(self):
+        if 'parsed' in self.__dict__:
+            return self.parsed['structure'], self.parsed['version']
+        return parse_data_header(str(self))
+
+    @property
+    def structure(self):
+        return self.header[0]
+
+    @property
+    def version(self):
+        return self.header[1]
+
+
+class DynamicDataDescriptor(DeferredAttribute):
+    """ При присваивании оборачивает строку в DynamicData, сбрасывая тем самым кэш разобранных данных """
+
+    def __set__(self, instance, value):
+        if isinstance(value, str) and not isinstance(value, DynamicData):
+            value = DynamicData(value)
+        instance.__dict__[self.field.attname] = value
+
+
+class DynamicDataField(models.TextField):
+    descriptor_class = DynamicDataDescriptor
+
+    def get_prep_value(self, value):
+        value = super(DynamicDataField, self).get_prep_value(value)
+        if isinstance(value, DynamicData):
+            value = str(value)
+        return value
@@ -1,15 +1,45 @@
 # coding: utf-8
+import contextlib
+import contextvars
 import json
 import itertools
 
-from django.db import models
+from django.apps import apps
+from django.db import IntegrityError, models, transaction
+from django.db.models.signals import class_prepared, post_save, post_delete
+from django.dispatch import receiver
 from django import forms
-from dyn_struct import datatools
+from dyn_struct import codec, compiler, datatools, filestorage, sharedcache
 from dyn_struct.db import fields
 from dyn_struct.exceptions import CheckClassArgumentsException
 from swutils.string import transliterate
 
 
+# структуры, пересчет отпечатка которых отложен до выхода из defer_fingerprint
+_deferred_fingerprints = contextvars.ContextVar('dyn_struct_deferred_fingerprints', default=None)
+
+
+@contextlib.contextmanager
+def defer_fingerprint():
+    """
+    Отложенный пересчет отпечатков для кода, сохраняющего поля структуры по одному через save()
+    (например, фабриками): отпечаток пересчитывается один раз при выходе из блока, а не после каждого поля.
+    bulk_create/bulk_update сигналы не отправляют, там отпечаток обновляется явно (см. clone, loading)
+    """
+    if _deferred_fingerprints.get() is not None:
+        yield
+        return
+
+    structures = {}
+    token = _deferred_fingerprints.set(structures)
+    try:
+        yield
+    finally:
+        _deferred_fingerprints.reset(token)
+    for structure in structures.values():
+        structure.update_fingerprint()
+
+
 class ExcludeDeprecatedManager(models.Manager):
     def get_queryset(self):
         return super(ExcludeDeprecatedManager, self).get_queryset().filter(is_deprecated=False)
@@ -19,6 +49,8 @@ class DynamicStructure(models.Model):
     name = models.CharField(max_length=255, verbose_name='Название')
     version = models.PositiveIntegerField(editable=False, default=1)
     is_deprecated = models.BooleanField(editable=False, default=False)
+    fingerprint = models.CharField(max_length=64, verbose_name='Отпечаток полей', blank=True, editable=False,
+                                   db_index=True)
     created = models.DateTimeField(auto_now_add=True)
 
     objects = ExcludeDeprecatedManager()
@@ -29,30 +61,77 @@ class DynamicStructure(models.Model):
         verbose_name_plural = 'динамические структуры'
         unique_together = ('name', 'version')
         ordering = ('name', '-version')
+        indexes = [
+            models.Index(fields=['name', 'is_deprecated', '-version'], name='dyn_struct_name_actual'),
+        ]
+
+    @classmethod
+    def get_current(cls, name):
+        """
+        Актуальная версия структуры по названию: один запрос по первичному ключу указателя.
+        Указатель не обновляется при записи в обход save() (bulk_create, queryset.update),
+        поэтому при его отсутствии или устаревании версия ищется по названию и указатель восстанавливается
+        """
+        struct = sharedcache.get_current(name)
+        if struct is not None:
+            return struct
+
+        pointer = DynamicStructureCurrent.objects.select_related('structure').filter(name=name).first()
+        struct = pointer.structure if pointer is not None else None
+        if struct is None or struct.is_deprecated or struct.name != name:
+            struct = cls.update_current(name)
+            if struct is None:
+                raise cls.DoesNotExist('Структура "{}" не найдена'.format(name))
+
+        sharedcache.set_current(struct)
+        return struct
+
+    @classmethod
+    def update_current(cls, name):
+        """
+        Пересчет указателя на актуальную версию структуры
+        :return: актуальная версия (None, если структуры с таким названием нет)
+        """
+        struct = cls.objects.filter(name=name).order_by('-version').first()
+        sharedcache.invalidate_current(name)
+        pointers = DynamicStructureCurrent.objects.filter(name=name)
+        if struct is None:
+            pointers.delete()
+        elif not pointers.update(structure=struct):
+            try:
+                with transaction.atomic(using=pointers.db):
+                    DynamicStructureCurrent.objects.create(name=name, structure=struct)
+            except IntegrityError:
+                # указатель одновременно создан другой транзакцией
+                pointers.update(structure=struct)
+        return struct
 
     @staticmethod
-    def get_verbose(data_json):
+    def get_verbose(data_json, structure=None):
         table = []
 
         if not data_json:
             return table
 
-        data = json.loads(data_json)
-        verbose_data = data['verbose_data']
-        verbose_data.sort(key=lambda i: i['row'])
+        # разобранные данные могут быть общими (кэш DynamicData), поэтому не изменяем их
+        data = codec.decode(data_json)
+        verbose_data = sorted(codec.get_verbose_data(data, structure), key=lambda i: i['row'])
 
         for i, row in itertools.groupby(verbose_data, lambda i: i['row']):
             row = sorted(row, key=lambda i: i['position'])
 
             # дополним поля некоторыми свойствами для красивого отображения
+            display_row = []
             for field in row:
                 if isinstance(field.get('value'), list):
                     display_value = '; '.join(field['value'])
+                elif filestorage.is_file_ref(field.get('value')):
+                    display_value = filestorage.StoredFile(field['value'])
                 else:
                     display_value = field.get('value')
-                field['display_value'] = display_value
+                display_row.append(dict(field, display_value=display_value))
 
-            table.append(row)
+            table.append(display_row)
         return table
 
     def __str__(self):
@@ -64,46 +143,136 @@ class DynamicStructure(models.Model):
     def get_field_names(self):
         return list(self.fields.values_list('name', flat=True))
 
+    def get_field_by_key(self, form_key):
+        """ Поле структуры по ключу в форме (транслитерированному названию) """
+        return self.fields.filter(form_key=form_key).first()
+
     def get_rows(self, form):
-        table = []
-        for row_number in self.fields.values_list('row', flat=True).order_by('row').distinct():
-            row = []
-            for field in self.fields.filter(row=row_number).order_by('position'):
-                if not field.is_header():
-                    field_name = field.get_transliterate_name()
-                    field.bound_field = form[field_name]
-                row.append(field)
-            table.append(row)
-        return table
+        return self.get_compiled().bind_rows(form)
+
+    def get_compiled(self):
+        return compiler.get_compiled(self)
+
+    def get_form_class(self):
+        return self.get_compiled().form_class
 
     def build_form(self, data=None, files=None, prefix='data'):
-        form = forms.Form(data=data, files=files, prefix=prefix)
-        for field in self.fields.exclude(name=''):
-            field_name = field.get_transliterate_name()
-            form.fields[field_name] = field.build()
-        return form
+        form_class = self.get_form_class()
+        return form_class(data=data, files=files, prefix=prefix)
+
+    def compute_fingerprint(self, fields=None):
+        if fields is None:
+            fields = self.fields.all()
+        return datatools.get_fields_fingerprint([datatools.get_field_data(field) for field in fields])
+
+    def update_fingerprint(self, fields=None):
+        self.fingerprint = self.compute_fingerprint(fields)
+        DynamicStructure.standard_objects.filter(id=self.id).update(fingerprint=self.fingerprint)
+        sharedcache.invalidate_current(self.name)
+
+    def clone(self, exclude_field=None, fields_override=None, skip_unchanged=False):
+        """
+        Создание новой версии структуры (текущий объект становится новой версией)
+        :param exclude_field: поле, которое не переносится в новую версию
+        :param fields_override: поля, которые заменяют поля текущей версии (совпадение по id,
+            либо по названию и заголовку) или добавляются в новую версию
+        :param skip_unchanged: не создавать версию, если набор полей не изменился
+        :return: создана ли новая версия
+        """
+        fields_override = list(fields_override or [])
+        # при откате транзакции объекты возвращаются к исходной версии, а не указывают на несуществующую
+        state = (self.id, self.version, self.is_deprecated, self.fingerprint)
+        fields_state = [(field, field.id, field.structure_id, field.form_key, field._form_key_name)
+                        for field in fields_override]
+
+        try:
+            with transaction.atomic(using=self._state.db):
+                fields = list(self.fields.all())
+
+                new_fields = []
+                for field in fields:
+                    if exclude_field and exclude_field.id and exclude_field.id == field.id:
+                        continue
+
+                    for override in fields_override:
+                        is_same_id = override.id is not None and override.id == field.id
+                        if is_same_id or (override.name, override.header) == (field.name, field.header):
+                            fields_override.remove(override)
+                            field = override
+                            break
+
+                    new_fields.append(field)
+                new_fields.extend(fields_override)
+
+                fingerprint = self.compute_fingerprint(new_fields)
+                if skip_unchanged and fingerprint == self.compute_fingerprint(fields):
+                    return False
+
+                DynamicStructure.standard_objects.filter(id=self.id).update(is_deprecated=True)
+
+                self.id = None
+                self.version += 1
+                self.is_deprecated = False
+                self.fingerprint = fingerprint
+                self.save()
+
+                for field in new_fields:
+                    field.form_key = field.get_transliterate_name()
+                    field._form_key_name = field.name
+                    field.id = None
+                    field.structure = self
+                DynamicStructureField.objects.bulk_create(new_fields)
+
+                overrides = [state[0] for state in fields_state if state[0].id is None]
+                if overrides:
+                    # без RETURNING (MySQL) bulk_create не проставляет id, а переданные поля считаются сохраненными
+                    ids = {(name, header): field_id
+                           for name, header, field_id in self.fields.values_list('name', 'header', 'id')}
+                    for field in overrides:
+                        field.id = ids[(field.name, field.header)]
+        except Exception:
+            self.id, self.version, self.is_deprecated, self.fingerprint = state
+            for field, field_id, structure_id, form_key, form_key_name in fields_state:
+                field.id, field.structure_id, field.form_key = field_id, structure_id, form_key
+                field._form_key_name = form_key_name
+            raise
+
+        compiler.invalidate(self.name, self.version)
+        return True
+
+    def save(self, *args, **kwargs):
+        # указатель на актуальную версию обновляется в post_save (update_current_structure) в той же транзакции
+        with transaction.atomic(using=kwargs.get('using'), savepoint=False):
+            super(DynamicStructure, self).save(*args, **kwargs)
 
-    def clone(self, exclude_field=None):
+    def delete(self, using=None):
         self.is_deprecated = True
         self.save()
 
-        fields = list(self.fields.all())
 
-        self.id = None
-        self.version += 1
-        self.is_deprecated = False
-        self.save()
+class DynamicStructureCurrent(models.Model):
+    """ Указатель на актуальную (последнюю не устаревшую) версию структуры """
+    name = models.CharField(max_length=255, verbose_name='Название', primary_key=True)
+    structure = models.ForeignKey(DynamicStructure, verbose_name='Структура', related_name='+',
+                                  on_delete=models.CASCADE)
 
-        for field in fields:
-            if exclude_field and exclude_field.id and exclude_field.id == field.id:
-                continue
-            field.id = None
-            field.structure = self
-            field.save()
+    class Meta:
+        verbose_name = 'актуальная версия динамической структуры'
+        verbose_name_plural = 'актуальные версии динамических структур'
+
+    def __str__(self):
+        return self.name
 
-    def delete(self, using=None):
-        self.is_deprecated = True
-        self.save()
+
+@receiver(post_save, sender=DynamicStructure)
+def update_current_structure(sender, instance, created=False, **kwargs):
+    # сигнал отправляется и при загрузке фикстур (loaddata сохраняет объекты в обход save())
+    names = {instance.name}
+    if not created:
+        # при переименовании пересчитывается и указатель прежнего названия
+        names.update(DynamicStructureCurrent.objects.filter(structure=instance).values_list('name', flat=True))
+    for name in names:
+        DynamicStructure.update_current(name)
 
 
 class DynamicStructureField(models.Model):
@@ -126,6 +295,7 @@ class DynamicStructureField(models.Model):
     position = models.PositiveSmallIntegerField(verbose_name='Позиция в строке')
     classes = models.CharField(max_length=255, verbose_name='CSS-классы', help_text='col-md-3, custom-class ...',
                                blank=True)
+    form_key = models.CharField(max_length=512, verbose_name='Ключ в форме', blank=True, editable=False)
 
     created = models.DateTimeField(auto_now_add=True)
 
@@ -134,6 +304,9 @@ class DynamicStructureField(models.Model):
         verbose_name_plural = 'поля динамических структур'
         unique_together = ('structure', 'name', 'header')
         ordering = ('structure__name', 'row', 'position')
+        indexes = [
+            models.Index(fields=['structure', 'form_key'], name='dyn_struct_field_form_key'),
+        ]
 
     def __str__(self):
         if self.is_header():
@@ -147,8 +320,31 @@ class DynamicStructureField(models.Model):
         else:
             return self.name
 
+    @staticmethod
+    def make_form_key(name):
+        return transliterate(name, space='_').replace("'", "") if name else ''
+
+    # название, для которого вычислен form_key (загруженный из БД или записанный при сохранении)
+    _form_key_name = None
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super(DynamicStructureField, cls).from_db(db, field_names, values)
+        instance._form_key_name = instance.__dict__.get('name')
+        return instance
+
     def get_transliterate_name(self):
-        return transliterate(self.name, space='_').replace("'", "")
+        # ключ хранится в БД, транслитерация нужна только для несохраненных или переименованных полей
+        if self.form_key and self.name == self._form_key_name:
+            return self.form_key
+        return self.make_form_key(self.name)
+
+    def save(self, *args, **kwargs):
+        self.form_key = self.make_form_key(self.name)
+        self._form_key_name = self.name
+        if kwargs.get('update_fields') is not None and 'name' in kwargs['update_fields']:
+            kwargs['update_fields'] = set(kwargs['update_fields']) | {'form_key'}
+        super(DynamicStructureField, self).save(*args, **kwargs)
 
     def is_header(self):
         return bool(self.header)
@@ -212,24 +408,102 @@ class DynamicStructureField(models.Model):
         datatools.check_class_arguments(widget_class, kwargs)
 
 
+@receiver([post_save, post_delete], sender=DynamicStructureField)
+def invalidate_compiled_structure(sender, instance, **kwargs):
+    compiler.invalidate(instance.structure.name, instance.structure.version)
+
+
+@receiver([post_save, post_delete], sender=DynamicStructureField)
+def update_structure_fingerprint(sender, instance, raw=False, **kwargs):
+    # при загрузке фикстур отпечаток структуры загружается вместе с ней
+    if raw:
+        return
+
+    structures = _deferred_fingerprints.get()
+    if structures is not None:
+        structures[instance.structure_id] = instance.structure
+        return
+    instance.structure.update_fingerprint()
+
+
 class DynamicStructureMixin(object):
     data_field = 'data'
 
     def get_structure_name(self):
         raise NotImplementedError()
 
+    def get_structure_version(self):
+        data = getattr(self, self.data_field)
+        return fields.parse_data_header(data)[1]
+
     def get_structure(self):
         structure_name = self.get_structure_name()
+        version = self.get_structure_version()
 
-        data = getattr(self, self.data_field)
-        version = json.loads(data)['version']
+        # структура могла быть загружена заранее через prefetch_structures
+        structure = getattr(self, '_dynamic_structure', None)
+        if structure is not None and structure.name == structure_name and structure.version == version:
+            return structure
 
         structure = DynamicStructure.standard_objects.get(
             version=version,
             name=structure_name
         )
+        self._dynamic_structure = structure
 
         return structure
 
     def get_verbose_data(self):
-        return self.get_structure().get_verbose(self.data)
+        data = getattr(self, self.data_field)
+        if not data:
+            return []
+
+        structure = self.get_structure()
+        return structure.get_verbose(data, structure=structure)
+
+
+def connect_dynamic_receivers(receivers, dispatch_uid):
+    """
+    Подключение обработчиков сигналов только для моделей с DynamicStructureMixin:
+    уже зарегистрированных и объявленных позже (вызывается из AppConfig.ready())
+    :param receivers: пары (сигнал, обработчик)
+    """
+    def connect(sender, **kwargs):
+        if issubclass(sender, DynamicStructureMixin):
+            for signal, handler in receivers:
+                signal.connect(handler, sender=sender, dispatch_uid=dispatch_uid)
+
+    for model in apps.get_models():
+        connect(model)
+    class_prepared.connect(connect, weak=False, dispatch_uid=dispatch_uid)
+
+
+def prefetch_structures(instances):
+    """
+    Загрузка структур (вместе с полями) для набора объектов с DynamicStructureMixin.
+    Аналог prefetch_related: два запроса на весь набор вместо запроса на каждый объект
+    :param instances: объекты (или queryset) моделей с DynamicStructureMixin
+    :return: список объектов
+    """
+    instances = list(instances)
+
+    instances_by_key = {}
+    for instance in instances:
+        if not getattr(instance, instance.data_field):
+            continue
+        key = (instance.get_structure_name(), instance.get_structure_version())
+        instances_by_key.setdefault(key, []).append(instance)
+
+    if not instances_by_key:
+        return instances
+
+    query = models.Q()
+    for name, version in instances_by_key.keys():
+        query |= models.Q(name=name, version=version)
+
+    structures = DynamicStructure.standard_objects.filter(query).prefetch_related('fields')
+    for structure in structures:
+        for instance in instances_by_key.get((structure.name, structure.version), []):
+            instance._dynamic_structure = structure
+
+    return instances
@@ -0,0 +1,210 @@
+# coding: utf-8
+"""
+Запросы к динамическим данным средствами БД: значение поля формы извлекается из JSON в SQL
+и приводится к типу по полю формы структуры (IntegerField -> integer и т.д.).
+Поддерживаются SQLite (JSON1), PostgreSQL и MySQL.
+
+    class Protocol(DynamicStructureMixin, models.Model):
+        objects = DynamicManager()
+
+    Protocol.objects.filter_dynamic('Осмотр', vozrast__gte=18, diagnoz='да')
+"""
+import hashlib
+import json
+
+from django.db import NotSupportedError, connections, models
+from django.db.models import F, Func
+from django.db.models.functions import Cast
+
+CAST_FIELDS = {
+    'IntegerField': models.IntegerField,
+    'FloatField': models.FloatField,
+    'DecimalField': lambda: models.DecimalField(max_digits=30, decimal_places=10),
+    'BooleanField': models.BooleanField,
+    'NullBooleanField': models.BooleanField,
+    'DateField': models.DateField,
+    'DateTimeField': models.DateTimeField,
+    'TimeField': models.TimeField,
+}
+
+
+class DynamicKeyText(Func):
+    """
+    Текстовое значение form_data[key] из JSON-данных объекта
+    :param empty_as_null: пустая строка (незаполненное необязательное поле) заменяется на NULL
+    """
+    output_field = models.TextField()
+    section = 'form_data'
+
+    def __init__(self, expression, key, empty_as_null=False, **extra):
+        super(DynamicKeyText, self).__init__(expression, **extra)
+        self.key = key
+        self.empty_as_null = empty_as_null
+
+    def wrap_empty(self, sql):
+        # '' подставляется литералом, как и путь: параметр помешал бы сопоставлению с функциональным индексом
+        return "NULLIF({}, '')".format(sql) if self.empty_as_null else sql
+
+    def get_json_path(self):
+        keys = [self.section, self.key] if self.section else [self.key]
+        return '$.' + '.'.join(json.dumps(key, ensure_ascii=False) for key in keys)
+
+    def compile_data(self, compiler):
+        return compiler.compile(self.source_expressions[0])
+
+    def as_sql(self, compiler, connection, **extra_context):
+        raise NotSupportedError('Запросы к динамическим данным не поддерживаются для {}'.format(connection.vendor))
+
+    def as_sqlite(self, compiler, connection, **extra_context):
+        lhs, params = self.compile_data(compiler)
+        # путь подставляется литералом: иначе SQLite не сопоставит выражение с функциональным индексом
+        path = self.get_json_path().replace("'", "''")
+        return self.wrap_empty("JSON_EXTRACT({}, '{}')".format(lhs, path)), params
+
+    def as_postgresql(self, compiler, connection, **extra_context):
+        lhs, params = self.compile_data(compiler)
+        if self.section:
+            sql, params = "((({})::jsonb -> %s) ->> %s)".format(lhs), tuple(params) + (self.section, self.key)
+        else:
+            sql, params = "(({})::jsonb ->> %s)".format(lhs), tuple(params) + (self.key, )
+        return self.wrap_empty(sql), params
+
+    def as_mysql(self, compiler, connection, **extra_context):
+        lhs, params = self.compile_data(compiler)
+        sql = self.wrap_empty('JSON_UNQUOTE(JSON_EXTRACT({}, %s))'.format(lhs))
+        return sql, tuple(params) + (self.get_json_path(), )
+
+
+class DynamicHeaderText(DynamicKeyText):
+    """ Значение ключа заголовка JSON-данных объекта (structure, version); для пустых данных - NULL """
+    section = None
+
+    def compile_data(self, compiler):
+        lhs, params = super(DynamicHeaderText, self).compile_data(compiler)
+        # у объекта без данных поле пустое, а '' - невалидный JSON
+        return "NULLIF({}, '')".format(lhs), params
+
+
+def get_cast_field(form_field):
+    field_class = CAST_FIELDS.get(form_field)
+    return field_class() if field_class else None
+
+
+def get_form_fields(structure):
+    """ Поля формы структуры по ключу: {ключ: название класса поля формы} """
+    if structure is None:
+        return {}
+    return {
+        field.get_transliterate_name(): field.form_field
+        for field in structure.get_compiled().fields
+        if not field.is_header()
+    }
+
+
+def dynamic_key(key, form_field=None, data_field='data'):
+    """ Выражение для значения поля формы, приведенное к типу поля формы (текст, если тип не известен) """
+    output_field = get_cast_field(form_field)
+    if output_field is None:
+        return DynamicKeyText(F(data_field), key)
+
+    # пустое необязательное поле хранится как '': SQLite привел бы его к 0, а PostgreSQL - не смог бы привести
+    return Cast(DynamicKeyText(F(data_field), key, empty_as_null=True), output_field)
+
+
+def filter_structure(queryset, structure_name, data_field='data'):
+    """ Отбор записей структуры по заголовку JSON-данных (для любых моделей, не только с DynamicManager) """
+    return queryset.alias(_dynamic_structure=DynamicHeaderText(F(data_field), 'structure')).filter(
+        _dynamic_structure=structure_name
+    )
+
+
+def get_index_name(model, key):
+    # имя индекса ограничено 30 символами
+    digest = hashlib.sha1('{}.{}'.format(model._meta.db_table, key).encode('utf-8')).hexdigest()
+    return 'dyn_{}'.format(digest[:16])
+
+
+def get_dynamic_index(model, key, form_field=None, name=None):
+    """
+    Функциональный индекс по значению поля формы, для Meta.indexes или миграции AddIndex.
+    Тип поля должен совпадать с тем, что используется в запросах, иначе индекс не будет использован
+    """
+    data_field = getattr(model, 'data_field', 'data')
+    return models.Index(dynamic_key(key, form_field, data_field), name=name or get_index_name(model, key))
+
+
+def create_dynamic_index(model, key, form_field=None, name=None, using='default'):
+    index = get_dynamic_index(model, key, form_field, name)
+    with connections[using].schema_editor() as schema_editor:
+        schema_editor.add_index(model, index)
+    return index
+
+
+def drop_dynamic_index(model, key, form_field=None, name=None, using='default'):
+    index = get_dynamic_index(model, key, form_field, name)
+    with connections[using].schema_editor() as schema_editor:
+        schema_editor.remove_index(model, index)
+
+
+class DynamicQuerySet(models.QuerySet):
+    """ QuerySet для моделей с DynamicStructureMixin с отбором по значениям полей формы """
+
+    def _get_structure(self, structure):
+        if isinstance(structure, str):
+            from dyn_struct.db.models import DynamicStructure
+            return DynamicStructure.get_current(structure)
+        return structure
+
+    def _get_data_field(self):
+        return getattr(self.model, 'data_field', 'data')
+
+    def dynamic_key(self, key, structure=None):
+        """
+        Выражение для значения поля формы
+        :param structure: структура (или ее название), по полям которой определяется тип значения
+        """
+        form_fields = get_form_fields(self._get_structure(structure))
+        return dynamic_key(key, form_fields.get(key), self._get_data_field())
+
+    def alias_dynamic(self, structure=None, **aliases):
+        """ alias() значений полей формы: alias_dynamic(structure, age='vozrast') """
+        form_fields = get_form_fields(self._get_structure(structure))
+        data_field = self._get_data_field()
+        return self.alias(**{
+            alias: dynamic_key(key, form_fields.get(key), data_field) for alias, key in aliases.items()
+        })
+
+    def annotate_dynamic(self, structure=None, **aliases):
+        """ annotate() значений полей формы: annotate_dynamic(structure, age='vozrast') """
+        form_fields = get_form_fields(self._get_structure(structure))
+        data_field = self._get_data_field()
+        return self.annotate(**{
+            alias: dynamic_key(key, form_fields.get(key), data_field) for alias, key in aliases.items()
+        })
+
+    def filter_structure(self, structure_name):
+        """ Записи структуры с указанным названием (любой версии) """
+        return filter_structure(self, structure_name, self._get_data_field())
+
+    def filter_dynamic(self, structure=None, **lookups):
+        """
+        Отбор по значениям полей формы: filter_dynamic(structure, vozrast__gte=18, diagnoz='да').
+        Со структурой отбираются только ее записи (любой версии), без нее - записи всех структур, значения - текстом
+        """
+        structure = self._get_structure(structure)
+        form_fields = get_form_fields(structure)
+        data_field = self._get_data_field()
+
+        queryset = self if structure is None else self.filter_structure(structure.name)
+        for lookup, value in lookups.items():
+            key, lookup_name = lookup, 'exact'
+            if key not in form_fields and '__' in lookup:
+                key, lookup_name = lookup.rsplit('__', 1)
+
+            alias = '_dynamic_{}'.format(len(queryset.query.annotations))
+            queryset = queryset.alias(**{alias: dynamic_key(key, form_fields.get(key), data_field)})
+            queryset = queryset.filter(**{'{}__{}'.format(alias, lookup_name): value})
+        return queryset
+
+
+DynamicManager = models.Manager.from_queryset(DynamicQuerySet)
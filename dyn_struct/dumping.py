@@ -0,0 +1,99 @@
+# coding: utf-8
+"""
+Потоковая выгрузка структур: структуры читаются порциями вместе с полями
+и записываются по мере чтения, без сборки всей выгрузки в памяти.
+"""
+import concurrent.futures
+import hashlib
+import itertools
+import json
+import os
+
+from django.utils.text import slugify
+
+from dyn_struct.datatools import structure_to_dict
+from dyn_struct.db import models
+
+FILE_FORMATS = ('json', 'jsonl')
+
+
+def iter_structure_dicts(structures=None, is_compact=True, chunk_size=100):
+    """ Словари структур; поля подгружаются одним запросом на порцию структур """
+    if structures is None:
+        structures = models.DynamicStructure.objects.all()
+
+    for struct in structures.prefetch_related('fields').iterator(chunk_size=chunk_size):
+        yield structure_to_dict(struct, is_compact=is_compact)
+
+
+def write_json(items, file, indent=None, **dump_kwargs):
+    """ Запись JSON-массива поэлементно; результат совпадает с json.dumps(list(items), ...) """
+    is_empty = True
+    for item in items:
+        dumped = json.dumps(item, indent=indent, **dump_kwargs)
+        if indent is None:
+            file.write(', ' if not is_empty else '[')
+        else:
+            file.write(',\n' if not is_empty else '[\n')
+            prefix = ' ' * indent if isinstance(indent, int) else indent
+            dumped = '\n'.join(prefix + line for line in dumped.split('\n'))
+        file.write(dumped)
+        is_empty = False
+
+    if is_empty:
+        file.write('[]')
+    elif indent is None:
+        file.write(']')
+    else:
+        file.write('\n]')
+
+
+def write_jsonl(items, file, **dump_kwargs):
+    for item in items:
+        file.write(json.dumps(item, **dump_kwargs))
+        file.write('\n')
+
+
+def write_items(items, file, file_format='json', indent=None, **dump_kwargs):
+    if file_format == 'jsonl':
+        write_jsonl(items, file, **dump_kwargs)
+    else:
+        write_json(items, file, indent=indent, **dump_kwargs)
+
+
+def get_shard_file_name(name, file_format='json'):
+    # хэш в имени исключает совпадение файлов для названий, различающихся только спецсимволами
+    name_hash = hashlib.sha1(name.encode('utf-8')).hexdigest()[:8]
+    return '{}-{}.{}'.format(slugify(name, allow_unicode=True) or 'structure', name_hash, file_format)
+
+
+def _write_shard(path, items, file_format, indent, dump_kwargs):
+    with open(path, 'w', encoding='utf-8') as file:
+        write_items(items, file, file_format, indent, **dump_kwargs)
+    return path
+
+
+def write_shards(items, shard_dir, file_format='json', workers=1, indent=None, **dump_kwargs):
+    """
+    Запись структур по файлу на каждое название (все версии в одном файле).
+    Структуры должны идти сгруппированными по названию (сортировка модели по-умолчанию).
+    Файлы пишутся параллельно, в очереди держится не больше двух групп на поток
+    :return: список записанных файлов
+    """
+    os.makedirs(shard_dir, exist_ok=True)
+
+    paths = []
+    pending = set()
+    with concurrent.futures.ThreadPoolExecutor(max_workers=workers) as executor:
+        for name, group in itertools.groupby(items, lambda item: item['name']):
+            path = os.path.join(shard_dir, get_shard_file_name(name, file_format))
+            pending.add(executor.submit(_write_shard, path, list(group), file_format, indent, dump_kwargs))
+
+            if len(pending) >= workers * 2:
+                done, pending = concurrent.futures.wait(pending, return_when=concurrent.futures.FIRST_COMPLETED)
+                paths.extend(future.result() for future in done)
+
+        for future in concurrent.futures.as_completed(pending):
+            paths.append(future.result())
+
+    return sorted(paths)
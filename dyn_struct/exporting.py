@@ -0,0 +1,171 @@
+# coding: utf-8
+"""
+Потоковая выгрузка динамических данных объектов в плоскую таблицу: столбец на каждое поле структуры
+(по всем ее версиям). Записи читаются порциями через iterator(), разбор JSON при необходимости
+выполняется пулом процессов, в памяти одновременно находится ограниченное число порций.
+"""
+import csv
+import functools
+import json
+import math
+import os
+
+from dyn_struct import codec, datatools, filestorage
+from dyn_struct.db import fields, models, query
+
+FILE_FORMATS = ('csv', 'jsonl', 'npz')
+NUMERIC_FORM_FIELDS = ('IntegerField', 'FloatField', 'DecimalField')
+BASE_COLUMNS = ('id', 'structure_version')
+# разделитель значений полей с множественным выбором (см. importing.get_form_data)
+LIST_SEPARATOR = '; '
+
+
+class Column(object):
+    def __init__(self, key, label, form_field):
+        self.key = key
+        self.label = label
+        self.form_field = form_field
+
+    @property
+    def is_numeric(self):
+        return self.form_field in NUMERIC_FORM_FIELDS
+
+
+def get_columns(structure_name):
+    """
+    Столбцы выгрузки по всем версиям структуры: сначала поля последней версии в порядке вывода,
+    затем поля, которые есть только в предыдущих версиях
+    """
+    structure_fields = models.DynamicStructureField.objects.filter(
+        structure__name=structure_name, header=''
+    ).order_by('-structure__version', 'row', 'position').values_list('form_key', 'name', 'form_field')
+
+    columns = {}
+    for key, name, form_field in structure_fields:
+        key = key or models.DynamicStructureField.make_form_key(name)
+        if key not in columns:
+            columns[key] = Column(key, name, form_field)
+    return list(columns.values())
+
+
+def iter_records(queryset, structure_name, data_field='data', chunk_size=1000):
+    """ Порции пар (ключ объекта, данные) записей структуры; записи других структур отбираются в SQL """
+    queryset = query.filter_structure(queryset, structure_name, data_field).order_by('pk')
+    chunk = []
+    for record in queryset.values_list('pk', data_field).iterator(chunk_size=chunk_size):
+        chunk.append(record)
+        if len(chunk) >= chunk_size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def _format_value(value):
+    if isinstance(value, list):
+        return LIST_SEPARATOR.join(str(item) for item in value)
+    if filestorage.is_file_ref(value):
+        return value['name']
+    return value
+
+
+def decode_chunk(chunk, structure_name, keys):
+    """ Строки таблицы для порции записей; записи других структур и пустые данные пропускаются """
+    rows = []
+    for pk, data in chunk:
+        if not data:
+            continue
+
+        name, version = fields.parse_data_header(data)
+        if name != structure_name:
+            continue
+
+        form_data = codec.decode(data).get('form_data') or {}
+        rows.append([pk, version] + [_format_value(form_data.get(key)) for key in keys])
+    return rows
+
+
+def iter_rows(queryset, structure_name, columns, data_field='data', chunk_size=1000, workers=1):
+    """ Порции строк таблицы в порядке ключей объектов; при workers > 1 порции разбираются пулом процессов """
+    keys = [column.key for column in columns]
+    decode = functools.partial(decode_chunk, structure_name=structure_name, keys=keys)
+    return datatools.map_chunks(decode, iter_records(queryset, structure_name, data_field, chunk_size), workers)
+
+
+def write_csv(row_chunks, columns, file):
+    writer = csv.writer(file)
+    writer.writerow(list(BASE_COLUMNS) + [column.key for column in columns])
+    count = 0
+    for rows in row_chunks:
+        writer.writerows(rows)
+        count += len(rows)
+    return count
+
+
+def write_jsonl(row_chunks, columns, file):
+    keys = list(BASE_COLUMNS) + [column.key for column in columns]
+    count = 0
+    for rows in row_chunks:
+        for row in rows:
+            # строка и ее перевод пишутся одним вызовом: OutputWrapper команды дополняет переводом каждую запись
+            file.write(json.dumps(dict(zip(keys, row)), ensure_ascii=False) + '\n')
+        count += len(rows)
+    return count
+
+
+def _to_number(value):
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return math.nan
+
+
+def write_npz(row_chunks, columns, output_dir):
+    """
+    Столбцовый формат: каталог с частями part-00000.npz (массив numpy на каждый столбец порции).
+    Числовые поля - float64 (NaN для пустых значений), остальные - строки
+    """
+    import numpy
+
+    os.makedirs(output_dir, exist_ok=True)
+    with open(os.path.join(output_dir, 'columns.json'), 'w', encoding='utf-8') as file:
+        json.dump([{'key': key, 'label': key, 'form_field': None} for key in BASE_COLUMNS] + [
+            {'key': column.key, 'label': column.label, 'form_field': column.form_field} for column in columns
+        ], file, ensure_ascii=False)
+
+    count = 0
+    for part, rows in enumerate(row_chunks):
+        if not rows:
+            continue
+
+        values = list(zip(*rows))
+        arrays = {
+            'id': numpy.array(values[0], dtype=numpy.int64),
+            'structure_version': numpy.array(values[1], dtype=numpy.int64),
+        }
+        for column, column_values in zip(columns, values[2:]):
+            if column.is_numeric:
+                arrays[column.key] = numpy.array([_to_number(value) for value in column_values],
+                                                 dtype=numpy.float64)
+            else:
+                arrays[column.key] = numpy.array(['' if value is None else str(value) for value in column_values])
+
+        numpy.savez(os.path.join(output_dir, 'part-{:05d}.npz'.format(part)), **arrays)
+        count += len(rows)
+    return count
+
+
+def export(queryset, structure_name, output, file_format='csv', data_field='data', chunk_size=1000, workers=1):
+    """
+    Выгрузка записей одной структуры
+    :param output: файл (открытый на запись) для csv/jsonl, каталог для npz
+    :return: количество выгруженных записей
+    """
+    columns = get_columns(structure_name)
+    row_chunks = iter_rows(queryset, structure_name, columns, data_field, chunk_size, workers)
+
+    if file_format == 'npz':
+        return write_npz(row_chunks, columns, output)
+    if file_format == 'jsonl':
+        return write_jsonl(row_chunks, columns, output)
+    return write_csv(row_chunks, columns, output)
@@ -0,0 +1,168 @@
+# coding: utf-8
+"""
+Хранение загруженных файлов (поля с виджетом FileInput) вне JSON-данных объекта.
+Файл сохраняется в хранилище Django под именем от хэша содержимого (одинаковые файлы хранятся один раз),
+а в данные объекта пишется только ссылка на него.
+"""
+import functools
+import hashlib
+
+from django.conf import settings
+from django.core.files.storage import Storage, default_storage
+from django.utils.module_loading import import_string
+
+FILE_REF_TYPE = 'file'
+CHUNK_SIZE = 64 * 2 ** 10
+
+
+@functools.lru_cache(maxsize=None)
+def _load_storage_class(path):
+    return import_string(path)()
+
+
+def get_storage(storage=None):
+    """
+    Хранилище для файлов динамических структур
+    :param storage: экземпляр хранилища, алиас из STORAGES или путь к классу хранилища,
+        по-умолчанию берется из настройки DYN_STRUCT_FILE_STORAGE
+    :return: хранилище или None, если файлы хранятся внутри данных (base64)
+    """
+    if storage is None:
+        storage = getattr(settings, 'DYN_STRUCT_FILE_STORAGE', None)
+
+    if storage is None or isinstance(storage, Storage):
+        return storage
+
+    if '.' in storage:
+        return _load_storage_class(storage)
+
+    from django.core.files.storage import storages
+    return storages[storage]
+
+
+def get_storage_name(storage, resolved=None):
+    """
+    Имя хранилища для записи в ссылку на файл, чтобы при чтении файл искался в том же хранилище
+    :param storage: хранилище, как оно передано в get_storage
+    :param resolved: результат get_storage(storage)
+    :return: алиас из STORAGES или путь к классу хранилища, None - если хранилище не найдено по имени
+    """
+    if storage is None:
+        storage = getattr(settings, 'DYN_STRUCT_FILE_STORAGE', None)
+    if isinstance(storage, str):
+        return storage
+
+    # экземпляр из STORAGES ищется среди уже созданных хранилищ, остальные не создаются ради поиска
+    from django.core.files.storage import storages
+    resolved = resolved or storage
+    for alias, instance in getattr(storages, '_storages', {}).items():
+        if instance is resolved:
+            return alias
+    return None
+
+
+def _iter_chunks(f):
+    if hasattr(f, 'chunks') and callable(f.chunks):
+        for chunk in f.chunks(CHUNK_SIZE):
+            yield chunk
+    else:
+        for chunk in iter(lambda: f.read(CHUNK_SIZE), b''):
+            yield chunk
+
+
+def _rewind(f):
+    if hasattr(f, 'seek') and callable(f.seek):
+        f.seek(0)
+
+
+def get_content_type(f):
+    if hasattr(f, 'image'):
+        return 'image/{}'.format(f.image.format.lower())
+    return getattr(f, 'content_type', None)
+
+
+def store_file(f, storage, storage_name=None):
+    """
+    Потоковое сохранение файла в хранилище под именем от sha256 содержимого
+    :param storage_name: имя хранилища (см. get_storage_name), сохраняется в ссылке
+    :return: ссылка на файл для записи в данные объекта
+    """
+    hasher = hashlib.sha256()
+    size = 0
+    for chunk in _iter_chunks(f):
+        hasher.update(chunk)
+        size += len(chunk)
+    _rewind(f)
+
+    digest = hasher.hexdigest()
+    name = 'dyn_struct/{}/{}/{}'.format(digest[:2], digest[2:4], digest)
+    if not storage.exists(name):
+        name = storage.save(name, f)
+        _rewind(f)
+
+    ref = {
+        'type': FILE_REF_TYPE,
+        'sha256': digest,
+        'name': name,
+        'size': size,
+        'filename': getattr(f, 'name', None),
+        'content_type': get_content_type(f),
+    }
+    if storage_name:
+        ref['storage'] = storage_name
+    return ref
+
+
+def is_file_ref(value):
+    return isinstance(value, dict) and value.get('type') == FILE_REF_TYPE and 'sha256' in value
+
+
+class StoredFile(object):
+    """
+    Файл из хранилища по ссылке из данных объекта; содержимое читается только при обращении.
+    Хранилище берется из ссылки, для ссылок без него - из настройки DYN_STRUCT_FILE_STORAGE
+    """
+
+    def __init__(self, ref, storage=None):
+        self.ref = ref
+        self._storage = storage
+
+    @property
+    def storage(self):
+        return get_storage(self._storage or self.ref.get('storage')) or default_storage
+
+    @property
+    def name(self):
+        return self.ref['name']
+
+    @property
+    def filename(self):
+        return self.ref.get('filename')
+
+    @property
+    def size(self):
+        return self.ref.get('size')
+
+    @property
+    def content_type(self):
+        return self.ref.get('content_type')
+
+    @property
+    def url(self):
+        return self.storage.url(self.name)
+
+    def open(self, mode='rb'):
+        return self.storage.open(self.name, mode)
+
+    def read(self):
+        with self.open() as f:
+            return f.read()
+
+    def __eq__(self, other):
+        return isinstance(other, StoredFile) and self.ref == other.ref
+
+    def __hash__(self):
+        return hash(self.ref['sha256'])
+
+    def __str__(self):
+        return self.url
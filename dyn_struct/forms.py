@@ -1,13 +1,24 @@
 # coding: utf-8
 import six
-import json
 
 from django import forms
 from django.core.exceptions import ValidationError
 from django.template import Template, Context
 
-from dyn_struct.datatools import get_structure_data
-from dyn_struct.db import models
+from djutils.forms import transform_form_error
+
+from dyn_struct.datatools import get_structure_data, serialize_structure_data
+from dyn_struct.db import fields, models
+
+_render_template = None
+
+
+def get_render_template():
+    # шаблон компилируется один раз, при первой отрисовке (движок шаблонов при импорте может быть не настроен)
+    global _render_template
+    if _render_template is None:
+        _render_template = Template('{% load dyn_struct %} {% render_struct structure prefix value template %}')
+    return _render_template
 
 
 class DynamicWidget(forms.Widget):
@@ -22,7 +33,7 @@ class DynamicWidget(forms.Widget):
         assert self.dynamic_structure is not None
 
         if value and isinstance(value, six.string_types):
-            value = json.loads(value)['form_data']
+            value = fields.parse_data(value)['form_data']
 
         data = None
         if value:
@@ -31,14 +42,13 @@ class DynamicWidget(forms.Widget):
                 inner_key = name + '-' + key
                 data[inner_key] = value[key]
 
-        template = Template('{% load dyn_struct %} {% render_struct structure prefix value template %}')
         context = Context({
             'structure': self.dynamic_structure,
             'prefix': name,
             'value': data,
             'template': self.template,
         })
-        return template.render(context)
+        return get_render_template().render(context)
 
     def value_from_datadict(self, data, files, name):
         assert self.dynamic_structure is not None
@@ -59,17 +69,18 @@ class DynamicField(forms.Field):
     widget = DynamicWidget
 
     def clean(self, data, initial=None):
-        # удобные для отображения данные формы
-        json_data = get_structure_data(struct=self.widget.dynamic_structure, data=data)
-        cleaned_data = json.loads(super(DynamicField, self).clean(json_data))
+        struct = self.widget.dynamic_structure
+        inner_form = self.widget.inner_form
+        if inner_form is None:
+            # данные переданы не через виджет - форму строим и проверяем здесь
+            return super(DynamicField, self).clean(get_structure_data(struct=struct, data=data))
 
-        if not self.widget.inner_form.is_valid():
-            msg = ''
-            for field_name, errors in self.widget.inner_form.errors.items():
-                msg += field_name + ': ' + ', '.join(errors) + '\n'
-            raise ValidationError(msg)
+        # внутренняя форма уже построена виджетом, проверяем ее один раз
+        if not inner_form.is_valid():
+            raise ValidationError(', '.join(transform_form_error(inner_form)))
 
-        return json.dumps(cleaned_data, indent=4, ensure_ascii=False)
+        json_data = serialize_structure_data(struct, data)
+        return super(DynamicField, self).clean(json_data)
 
 
 class DynamicStructureForm(forms.ModelForm):
@@ -82,16 +93,14 @@ class DynamicStructureForm(forms.ModelForm):
         super(DynamicStructureForm, self).__init__(*args, **kwargs)
 
         if self.instance and self.instance.id and self.instance.data:
-            data = json.loads(self.instance.data)
-            dynamic_structure_name = data['structure']
-            version = data['version']
+            dynamic_structure_name, version = fields.parse_data_header(self.instance.data)
 
             dynamic_structure = models.DynamicStructure.standard_objects.get(
                 version=version,
                 name=dynamic_structure_name
             )
         else:
-            dynamic_structure = models.DynamicStructure.objects.get(name=dynamic_structure_name)
+            dynamic_structure = models.DynamicStructure.get_current(dynamic_structure_name)
         self.fields['data'].widget.dynamic_structure = dynamic_structure
 
         if dynamic_template:
@@ -0,0 +1,126 @@
+# coding: utf-8
+"""
+Пакетный импорт данных формы в записи модели: класс формы структуры строится один раз,
+записи проверяются порциями (при необходимости пулом процессов), прошедшие проверку
+сохраняются через bulk_create, отклоненные - вместе с ошибками пишутся в файл отказов.
+bulk_create не отправляет сигналы: проекцию значений и поисковый индекс после импорта
+нужно перестроить (rebuild_dynamic_values / reindex_dynamic_search)
+"""
+import csv
+import functools
+import itertools
+import json
+
+from django import forms
+from django.db import transaction
+from djutils.forms import transform_form_error
+
+from dyn_struct import codec, datatools, exporting
+from dyn_struct.db import models
+
+FILE_FORMATS = ('csv', 'jsonl')
+
+
+def iter_rows(file, file_format=None, is_export=False):
+    """
+    Данные формы из файла: csv с заголовком или JSON Lines (объект в строке), ключи - form_key полей
+    :param is_export: файл получен выгрузкой (см. exporting), ее служебные столбцы пропускаются
+    """
+    if file_format is None:
+        name = getattr(file, 'name', '')
+        file_format = 'csv' if isinstance(name, str) and name.endswith('.csv') else 'jsonl'
+
+    if file_format == 'csv':
+        rows = csv.DictReader(file)
+    else:
+        rows = (json.loads(line) for line in file if line.strip())
+
+    skip_keys = exporting.BASE_COLUMNS if is_export else ()
+    for row in rows:
+        yield {key: value for key, value in row.items() if key not in skip_keys}
+
+
+def get_form_data(form_class, row):
+    """
+    Данные формы из записи файла: сохраняются только поля формы (столбцы прежних версий структуры
+    и прочие столбцы пропускаются), списки выгрузки ('a; b') разбиваются для полей с множественным выбором.
+    Файлы в выгрузке представлены названиями, поэтому поля файлов не загружаются
+    """
+    form_data = {}
+    for key, field in form_class.base_fields.items():
+        if key not in row or isinstance(field, forms.FileField):
+            continue
+
+        value = row[key]
+        if isinstance(field, forms.MultipleChoiceField) and isinstance(value, str):
+            value = value.split(exporting.LIST_SEPARATOR) if value else []
+        form_data[key] = value
+    return form_data
+
+
+def validate_chunk(struct, rows, data_format=codec.FORMAT_COMPACT):
+    """
+    Проверка порции записей формой структуры
+    :param rows: пары (номер записи, данные формы)
+    :return: (список (номер записи, данные объекта), список (номер записи, данные формы, ошибки))
+    """
+    form_class = struct.get_compiled().form_class
+    accepted = []
+    rejected = []
+    for number, row in rows:
+        form_data = get_form_data(form_class, row)
+        form = form_class(data=form_data)
+        if not form.is_valid():
+            rejected.append((number, row, transform_form_error(form)))
+            continue
+
+        # загрузка файлов при импорте не поддерживается
+        accepted.append((number, datatools.serialize_structure_data(struct, form_data, files={},
+                                                                    data_format=data_format)))
+    return accepted, rejected
+
+
+def iter_validated(struct, rows, chunk_size=1000, workers=1, data_format=codec.FORMAT_COMPACT):
+    """ Проверенные порции в исходном порядке; при workers > 1 порции проверяются пулом процессов """
+    numbered = enumerate(rows, 1)
+    chunks = iter(lambda: list(itertools.islice(numbered, chunk_size)), [])
+    # класс формы строится до запуска пула: дочерние процессы получают его вместе с памятью родителя
+    struct.get_compiled()
+    validate = functools.partial(validate_chunk, struct, data_format=data_format)
+    return datatools.map_chunks(validate, chunks, workers)
+
+
+def write_rejects(file, rejected):
+    for number, row, errors in rejected:
+        file.write(json.dumps({'line': number, 'data': row, 'errors': errors}, ensure_ascii=False))
+        file.write('\n')
+
+
+def import_records(model, structure_name, rows, data_field='data', defaults=None, chunk_size=1000, workers=1,
+                   rejects_file=None, data_format=codec.FORMAT_COMPACT):
+    """
+    Импорт записей актуальной версии структуры; каждая порция сохраняется в отдельной транзакции
+    :param rows: данные форм (словари по form_key полей)
+    :param defaults: значения остальных полей модели для всех записей
+    :param rejects_file: файл (открытый на запись) для отклоненных записей в формате JSON Lines
+    :return: статистика (rows - прочитано записей, imported - сохранено, rejected - отклонено)
+    """
+    struct = models.DynamicStructure.get_current(structure_name)
+    defaults = defaults or {}
+    stats = {'rows': 0, 'imported': 0, 'rejected': 0}
+
+    for accepted, rejected in iter_validated(struct, rows, chunk_size, workers, data_format):
+        stats['rows'] += len(accepted) + len(rejected)
+        stats['rejected'] += len(rejected)
+        if rejects_file is not None:
+            write_rejects(rejects_file, rejected)
+
+        if not accepted:
+            continue
+
+        objs = [model(**dict(defaults, **{data_field: data})) for _, data in accepted]
+        with transaction.atomic(using=model._base_manager.db):
+            model._base_manager.bulk_create(objs, batch_size=chunk_size)
+        stats['imported'] += len(objs)
+
+    return stats
@@ -0,0 +1,401 @@
+# coding: utf-8
+import functools
+import glob
+import itertools
+import json
+import os
+import time
+
+from django.db import transaction
+
+from dyn_struct import compiler, datatools
+from dyn_struct.db import models
+
+
+class LoadStats(object):
+    """ Результат загрузки одной структуры """
+
+    def __init__(self, name, version=None):
+        self.name = name
+        self.version = version
+        self.created = 0
+        self.updated = 0
+        self.unchanged = 0
+        self.elapsed = 0.0
+
+    def __str__(self):
+        return '{} v{}: {} created, {} updated, {} unchanged ({:.3f}s)'.format(
+            self.name, self.version, self.created, self.updated, self.unchanged, self.elapsed
+        )
+
+
+def _get_fields_fingerprint(fields_info):
+    """ Отпечаток загружаемых полей с учетом значений по-умолчанию модели """
+    fields = {}
+    for field_info in fields_info:
+        fields[(field_info['name'], field_info['header'])] = models.DynamicStructureField(**field_info)
+    return datatools.get_fields_fingerprint([datatools.get_field_data(field) for field in fields.values()])
+
+
+def _get_structure(name, struct_info, fingerprint):
+    version = struct_info.get('version', 1)
+    is_deprecated = struct_info.get('is_deprecated', False)
+    struct, created = models.DynamicStructure.standard_objects.get_or_create(
+        name=name,
+        version=version,
+        defaults={'is_deprecated': is_deprecated, 'fingerprint': fingerprint}
+    )
+    if not created and struct.is_deprecated != is_deprecated:
+        struct.is_deprecated = is_deprecated
+        models.DynamicStructure.standard_objects.filter(id=struct.id).update(is_deprecated=is_deprecated)
+        models.DynamicStructure.update_current(name)
+    return struct, created
+
+
+def _diff_fields(struct, fields, fields_info, stats):
+    """
+    Сравнение полей структуры с загружаемыми: измененные поля обновляются в памяти, новые - добавляются в fields
+    :param fields: поля структуры по ключу (название, заголовок)
+    :return: (новые поля, измененные поля, названия измененных атрибутов)
+    """
+    to_create = {}
+    to_update = {}
+    update_field_names = set()
+
+    for field_info in fields_info:
+        key = (field_info['name'], field_info['header'])
+        field = fields.get(key)
+
+        if field is None:
+            field = models.DynamicStructureField(structure=struct, **field_info)
+            field.form_key = field.make_form_key(field.name)
+            fields[key] = field
+            to_create[key] = field
+            continue
+
+        changed = [attr for attr, value in field_info.items() if getattr(field, attr) != value]
+        for attr in changed:
+            setattr(field, attr, field_info[attr])
+        if key in to_create:
+            continue
+        if changed:
+            to_update[key] = field
+            update_field_names.update(changed)
+        elif key not in to_update:
+            stats.unchanged += 1
+
+    stats.created = len(to_create)
+    stats.updated = len(to_update)
+    return to_create, to_update, update_field_names
+
+
+def _load_local_version(struct, name, struct_info, fingerprint, stats):
+    """ Загрузка с локальным версионированием: при изменении полей создается новая версия структуры """
+    if struct is None:
+        struct = models.DynamicStructure.objects.create(name=name, fingerprint=fingerprint)
+        return struct, True
+
+    fields = {(field.name, field.header): field for field in struct.fields.all()}
+    _diff_fields(struct, fields, struct_info['fields'], stats)
+    if not struct.clone(fields_override=fields.values(), skip_unchanged=True):
+        stats.created = stats.updated = 0
+        stats.unchanged = len(struct_info['fields'])
+    return struct, False
+
+
+def load_structure(struct_info, use_local_version=False, struct_name=None):
+    """
+    Загрузка структуры из словаря: поля сравниваются с существующими в памяти
+    и записываются через bulk_create/bulk_update в одной транзакции.
+    Если отпечаток загружаемых полей совпадает с отпечатком структуры, запись в БД не выполняется
+    :return: (структура, LoadStats)
+    """
+    started = time.monotonic()
+    name = struct_name or struct_info.get('name')
+    stats = LoadStats(name)
+    fingerprint = _get_fields_fingerprint(struct_info['fields'])
+
+    with transaction.atomic():
+        created = False
+        if use_local_version:
+            struct = models.DynamicStructure.objects.filter(name=name).first()
+        else:
+            struct, created = _get_structure(name, struct_info, fingerprint)
+
+        if struct is not None and struct.fingerprint == fingerprint and not created:
+            stats.version = struct.version
+            stats.unchanged = len(struct_info['fields'])
+            stats.elapsed = time.monotonic() - started
+            return struct, stats
+
+        is_upsert = True
+        if use_local_version:
+            struct, created = _load_local_version(struct, name, struct_info, fingerprint, stats)
+            is_upsert = created
+
+        if is_upsert:
+            # поля структуры однозначно определяются парой (название, заголовок)
+            fields = {} if created else {(field.name, field.header): field for field in struct.fields.all()}
+            to_create, to_update, update_field_names = _diff_fields(struct, fields, struct_info['fields'], stats)
+
+            models.DynamicStructureField.objects.bulk_create(to_create.values())
+            if to_update:
+                models.DynamicStructureField.objects.bulk_update(to_update.values(), sorted(update_field_names))
+            if not created:
+                struct.update_fingerprint(fields.values())
+
+        if models.DynamicStructure.objects.filter(name=name, version__lt=struct.version).update(is_deprecated=True):
+            models.DynamicStructure.update_current(name)
+
+    # bulk-операции не отправляют сигналы, поэтому скомпилированную версию сбрасываем явно
+    compiler.invalidate(struct.name, struct.version)
+
+    stats.version = struct.version
+    stats.elapsed = time.monotonic() - started
+    return struct, stats
+
+
+def iter_json_array(file, chunk_size=64 * 2 ** 10):
+    """ Потоковый разбор JSON-массива верхнего уровня: элементы читаются из файла и возвращаются по одному """
+    decoder = json.JSONDecoder()
+    buffer = ''
+    pos = 0
+    is_eof = False
+    is_started = False
+
+    while True:
+        while pos < len(buffer) and buffer[pos].isspace():
+            pos += 1
+
+        if pos >= len(buffer):
+            if is_eof:
+                raise ValueError('Неожиданный конец JSON-массива')
+            chunk = file.read(chunk_size)
+            is_eof = not chunk
+            buffer = buffer[pos:] + chunk
+            pos = 0
+            continue
+
+        if not is_started:
+            if buffer[pos] != '[':
+                raise ValueError('Ожидается JSON-массив')
+            is_started = True
+            pos += 1
+            continue
+
+        if buffer[pos] == ']':
+            return
+        if buffer[pos] == ',':
+            pos += 1
+            continue
+
+        try:
+            item, end = decoder.raw_decode(buffer, pos)
+            # число на границе буфера могло быть прочитано не полностью
+            is_complete = is_eof or end < len(buffer)
+        except json.JSONDecodeError:
+            if is_eof:
+                raise
+            is_complete = False
+
+        if not is_complete:
+            # элемент прочитан не полностью - дочитываем файл
+            chunk = file.read(chunk_size)
+            is_eof = not chunk
+            buffer = buffer[pos:] + chunk
+            pos = 0
+            continue
+
+        yield item
+        pos = end
+
+
+def iter_json_lines(file):
+    for line in file:
+        line = line.strip()
+        if line:
+            yield json.loads(line)
+
+
+def iter_structures(file, file_format=None):
+    """
+    Структуры из файла выгрузки
+    :param file_format: 'json' (массив) или 'jsonl' (по структуре в строке), по-умолчанию - по расширению файла
+    """
+    if file_format is None:
+        name = getattr(file, 'name', '')
+        file_format = 'jsonl' if isinstance(name, str) and name.endswith(('.jsonl', '.ndjson')) else 'json'
+
+    if file_format == 'jsonl':
+        return iter_json_lines(file)
+    return iter_json_array(file)
+
+
+def read_checkpoint(checkpoint_path):
+    """ Количество уже загруженных (зафиксированных) структур """
+    if not checkpoint_path or not os.path.exists(checkpoint_path):
+        return 0
+
+    with open(checkpoint_path, 'r') as file:
+        return json.load(file)['loaded']
+
+
+def write_checkpoint(checkpoint_path, loaded):
+    tmp_path = checkpoint_path + '.tmp'
+    with open(tmp_path, 'w') as file:
+        json.dump({'loaded': loaded}, file)
+    os.replace(tmp_path, checkpoint_path)
+
+
+def load_structures(struct_infos, batch_size=1, skip=0, checkpoint_path=None, use_local_version=False):
+    """
+    Загрузка последовательности структур порциями, каждая порция - в отдельной транзакции.
+    После фиксации порции количество загруженных структур пишется в контрольную точку
+    :param skip: количество уже загруженных структур (для продолжения после сбоя)
+    :return: генератор пар (загружено структур, список LoadStats порции)
+    """
+    loaded = skip
+    struct_infos = itertools.islice(struct_infos, skip, None)
+
+    while True:
+        batch = list(itertools.islice(struct_infos, batch_size))
+        if not batch:
+            return
+
+        with transaction.atomic():
+            batch_stats = [load_structure(struct_info, use_local_version=use_local_version)[1]
+                           for struct_info in batch]
+
+        loaded += len(batch)
+        if checkpoint_path:
+            write_checkpoint(checkpoint_path, loaded)
+        yield loaded, batch_stats
+
+
+def get_files(path):
+    """ Файлы выгрузки: файл, каталог (все .json/.jsonl/.ndjson файлы) или шаблон пути """
+    if os.path.isdir(path):
+        return sorted(
+            file_path
+            for extension in ('json', 'jsonl', 'ndjson')
+            for file_path in glob.glob(os.path.join(path, '*.' + extension))
+        )
+    if glob.has_magic(path):
+        return sorted(glob.glob(path))
+    return [path]
+
+
+def iter_files_structures(paths, file_format=None):
+    for path in paths:
+        with open(path, 'r', encoding='utf-8') as file:
+            for struct_info in iter_structures(file, file_format):
+                yield struct_info
+
+
+def group_by_name(struct_infos):
+    """ Структуры, сгруппированные по названию; версии одного названия упорядочены по возрастанию """
+    groups = {}
+    for struct_info in struct_infos:
+        groups.setdefault(struct_info['name'], []).append(struct_info)
+
+    for struct_infos in groups.values():
+        struct_infos.sort(key=lambda i: i.get('version', 1))
+    return groups
+
+
+def load_name_group(name, struct_infos):
+    """
+    Последовательная загрузка всех версий одного названия (каждая версия в своей транзакции).
+    После ошибки следующие версии названия не загружаются
+    :return: (название, список LoadStats, текст ошибки или None)
+    """
+    stats_list = []
+    for struct_info in struct_infos:
+        try:
+            _, stats = load_structure(struct_info)
+        except Exception as ex:
+            error = 'v{}: {}: {}'.format(struct_info.get('version', 1), type(ex).__name__, ex)
+            return name, stats_list, error
+        stats_list.append(stats)
+    return name, stats_list, None
+
+
+def get_file_names(paths, file_format=None):
+    """ Названия структур в каждом файле (сами структуры в памяти не накапливаются) """
+    return {path: {struct_info['name'] for struct_info in iter_files_structures([path], file_format)}
+            for path in paths}
+
+
+def plan_file_tasks(file_names, workers=2):
+    """
+    Задачи параллельной загрузки: файлы с общими названиями структур попадают в одну задачу
+    (версии одного названия должны загружаться одним процессом). Если групп файлов меньше, чем процессов,
+    названия группы делятся между несколькими задачами
+    :param file_names: названия по файлам (см. get_file_names)
+    :return: список (файлы, названия для загрузки)
+    """
+    groups = []
+    for path, names in file_names.items():
+        related = [group for group in groups if group[1] & names]
+        group = ([path], set(names))
+        for other in related:
+            groups.remove(other)
+            group[0].extend(other[0])
+            group[1].update(other[1])
+        groups.append(group)
+
+    parts = max(1, workers // len(groups)) if groups else 1
+    tasks = []
+    for paths, names in groups:
+        names = sorted(names)
+        size = -(-len(names) // parts)
+        for start in range(0, len(names), size):
+            tasks.append((sorted(paths), names[start:start + size]))
+    return tasks
+
+
+def load_files(paths, names, file_format=None):
+    """
+    Загрузка структур с указанными названиями из файлов (выполняется в дочернем процессе, файлы читаются им же)
+    :return: список (название, список LoadStats, текст ошибки или None)
+    """
+    names = set(names)
+    struct_infos = (struct_info for struct_info in iter_files_structures(paths, file_format)
+                    if struct_info['name'] in names)
+    return [load_name_group(name, name_struct_infos) for name, name_struct_infos in group_by_name(struct_infos).items()]
+
+
+def _load_files_worker(task, file_format=None):
+    return load_files(task[0], task[1], file_format)
+
+
+def load_parallel(paths, file_format=None, workers=2):
+    """
+    Загрузка файлов структур пулом процессов с разбиением по названию: версии одного названия загружаются
+    последовательно в одном процессе, у каждого процесса свое соединение с БД. Родительский процесс только
+    собирает названия по файлам, структуры разбирает каждый процесс из своих файлов.
+    Ошибка одного названия не прерывает загрузку остальных
+    :return: список (название, список LoadStats, текст ошибки или None), упорядоченный по названию
+    """
+    tasks = plan_file_tasks(get_file_names(paths, file_format), workers)
+    load = functools.partial(_load_files_worker, file_format=file_format)
+
+    results = []
+    for task_results in datatools.map_chunks(load, tasks, workers):
+        results.extend(task_results)
+
+    for name, _, _ in results:
+        compiler.invalidate(name)
+    return sorted(results, key=lambda result: result[0])
+
+
+def summarize(stats_list):
+    totals = {'structures': 0, 'created': 0, 'updated': 0, 'unchanged': 0}
+    for stats in stats_list:
+        totals['structures'] += 1
+        totals['created'] += stats.created
+        totals['updated'] += stats.updated
+        totals['unchanged'] += stats.unchanged
+    return '{structures} structures: {created} fields created, {updated} updated, {unchanged} unchanged'.format(
+        **totals
+    )
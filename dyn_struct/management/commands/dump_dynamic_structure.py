@@ -1,8 +1,8 @@
-import json
+import sys
 
 from django.core.management.base import BaseCommand
 
-from dyn_struct.datatools import structure_to_dict
+from dyn_struct import dumping
 from dyn_struct.db import models
 
 
@@ -14,6 +14,14 @@ class Command(BaseCommand):
         parser.add_argument('-s', '--sorted', dest='sorted', default=False, action='store_true')
         parser.add_argument('-c', '--compact', dest='compact', default=False, action='store_true')
         parser.add_argument('-p', '--pretty', dest='pretty', default=False, action='store_true')
+        parser.add_argument('--format', dest='format', choices=dumping.FILE_FORMATS, default='json',
+                            help='json array or JSON Lines (one structure per line)')
+        parser.add_argument('-o', '--output', dest='output', type=str, help='output file, by default stdout')
+        parser.add_argument('--shard-dir', dest='shard_dir', type=str,
+                            help='write one file per structure name into the directory')
+        parser.add_argument('-w', '--workers', dest='workers', type=int, default=1,
+                            help='threads writing shard files')
+        parser.add_argument('--chunk-size', dest='chunk_size', type=int, default=100)
 
     def handle(self, *args, **options):
         is_compact = options['compact']
@@ -22,19 +30,29 @@ class Command(BaseCommand):
         if is_compact:
             structures = structures.filter(is_deprecated=False)
 
-        structures_data = [structure_to_dict(struct, is_compact=is_compact) for struct in structures.iterator()]
-        pretty = options['pretty']
+        structures_data = dumping.iter_structure_dicts(structures, is_compact=is_compact,
+                                                       chunk_size=options['chunk_size'])
+        file_format = options['format']
         dump_kwargs = {
             'sort_keys': options['sorted']
         }
-        if options['indent'] is not None:
+        if options['indent'] is not None and file_format == 'json':
             dump_kwargs['indent'] = options['indent']
 
-        if pretty:
+        if options['pretty']:
             dump_kwargs['ensure_ascii'] = False
 
-        dumped_data = json.dumps(structures_data, **dump_kwargs)
-        if pretty:
-            dumped_data = dumped_data.encode('utf-8').decode('utf-8')
+        if options['shard_dir']:
+            paths = dumping.write_shards(structures_data, options['shard_dir'], file_format,
+                                         workers=options['workers'], **dump_kwargs)
+            print('{} files written'.format(len(paths)))
+            return
 
-        print(dumped_data)
+        if options['output']:
+            with open(options['output'], 'w', encoding='utf-8') as file:
+                dumping.write_items(structures_data, file, file_format, **dump_kwargs)
+            return
+
+        dumping.write_items(structures_data, sys.stdout, file_format, **dump_kwargs)
+        if file_format == 'json':
+            sys.stdout.write('\n')
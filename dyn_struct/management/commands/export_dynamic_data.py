@@ -0,0 +1,55 @@
+from django.core.exceptions import FieldDoesNotExist
+from django.core.management.base import BaseCommand, CommandError
+
+from dyn_struct import exporting, recoding
+
+
+class Command(BaseCommand):
+    help = 'Export dynamic data of model records of one structure as a flat table (a column per field)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('-m', '--model', dest='model', type=str, required=True, help='app_label.ModelName')
+        parser.add_argument('-f', '--field', dest='field', type=str, default='data')
+        parser.add_argument('-s', '--structure', dest='structure', type=str, required=True, help='structure name')
+        parser.add_argument('--format', dest='format', choices=exporting.FILE_FORMATS, default='csv',
+                            help='csv, JSON Lines or npz (directory of numpy column arrays per chunk)')
+        parser.add_argument('-o', '--output', dest='output', type=str,
+                            help='output file (directory for npz), by default stdout')
+        parser.add_argument('-c', '--chunk-size', dest='chunk_size', type=int, default=1000)
+        parser.add_argument('-w', '--workers', dest='workers', type=int, default=1,
+                            help='processes decoding the data')
+
+    def handle(self, *args, **options):
+        try:
+            model = recoding.get_model(options['model'])
+            model._meta.get_field(options['field'])
+        except (LookupError, ValueError, FieldDoesNotExist) as ex:
+            raise CommandError(str(ex))
+
+        file_format = options['format']
+        output = options['output']
+        if file_format == 'npz' and not output:
+            raise CommandError('--output directory is required for npz')
+
+        export_kwargs = {
+            'structure_name': options['structure'],
+            'file_format': file_format,
+            'data_field': options['field'],
+            'chunk_size': options['chunk_size'],
+            'workers': options['workers'],
+        }
+        queryset = model._base_manager.all()
+
+        try:
+            if file_format == 'npz':
+                count = exporting.export(queryset, output=output, **export_kwargs)
+            elif output:
+                with open(output, 'w', encoding='utf-8', newline='') as file:
+                    count = exporting.export(queryset, output=file, **export_kwargs)
+            else:
+                count = exporting.export(queryset, output=self.stdout, **export_kwargs)
+        except ImportError as ex:
+            raise CommandError('npz format requires numpy ({})'.format(ex))
+
+        if output:
+            self.stdout.write('{} records exported'.format(count))
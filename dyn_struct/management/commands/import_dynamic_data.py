@@ -0,0 +1,67 @@
+from django.core.exceptions import FieldDoesNotExist
+from django.core.management.base import BaseCommand, CommandError
+
+from dyn_struct import codec, importing, recoding
+from dyn_struct.db import models
+
+
+class Command(BaseCommand):
+    help = 'Import form data (csv or JSON Lines, keys are field form keys) as model records of one structure'
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', type=str, help='csv or jsonl file')
+        parser.add_argument('-m', '--model', dest='model', type=str, required=True, help='app_label.ModelName')
+        parser.add_argument('-f', '--field', dest='field', type=str, default='data')
+        parser.add_argument('-s', '--structure', dest='structure', type=str, required=True, help='structure name')
+        parser.add_argument('--format', dest='format', choices=importing.FILE_FORMATS,
+                            help='by default by file extension')
+        parser.add_argument('--export', dest='is_export', default=False, action='store_true',
+                            help='the file is made by export_dynamic_data, its id and structure_version are skipped')
+        parser.add_argument('-d', '--default', dest='defaults', action='append', default=[],
+                            help='field=value for other model fields, may be repeated')
+        parser.add_argument('-r', '--rejects', dest='rejects', type=str,
+                            help='JSON Lines file for rejected records with errors')
+        parser.add_argument('-c', '--chunk-size', dest='chunk_size', type=int, default=1000)
+        parser.add_argument('-w', '--workers', dest='workers', type=int, default=1,
+                            help='processes validating the records')
+        parser.add_argument('--data-format', dest='data_format', type=int, choices=codec.FORMATS,
+                            default=codec.FORMAT_COMPACT, help='format of the saved data, compact by default')
+
+    def handle(self, *args, **options):
+        try:
+            model = recoding.get_model(options['model'])
+            model._meta.get_field(options['field'])
+        except (LookupError, ValueError, FieldDoesNotExist) as ex:
+            raise CommandError(str(ex))
+
+        defaults = {}
+        for item in options['defaults']:
+            if '=' not in item:
+                raise CommandError('Default must be field=value: {}'.format(item))
+            key, value = item.split('=', 1)
+            defaults[key] = value
+
+        try:
+            models.DynamicStructure.get_current(options['structure'])
+        except models.DynamicStructure.DoesNotExist:
+            raise CommandError('Structure {} does not exist'.format(options['structure']))
+
+        rejects_file = open(options['rejects'], 'w', encoding='utf-8') if options['rejects'] else None
+        try:
+            with open(options['path'], 'r', encoding='utf-8', newline='') as file:
+                stats = importing.import_records(
+                    model,
+                    options['structure'],
+                    importing.iter_rows(file, options['format'], options['is_export']),
+                    data_field=options['field'],
+                    defaults=defaults,
+                    chunk_size=options['chunk_size'],
+                    workers=options['workers'],
+                    rejects_file=rejects_file,
+                    data_format=options['data_format'],
+                )
+        finally:
+            if rejects_file is not None:
+                rejects_file.close()
+
+        self.stdout.write('{rows} records: {imported} imported, {rejected} rejected'.format(**stats))
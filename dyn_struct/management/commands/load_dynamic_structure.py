@@ -1,22 +1,73 @@
-import json
+import os
 
-from django.core.management.base import BaseCommand
+from django.core.management.base import BaseCommand, CommandError
 
-from dyn_struct.datatools import structure_from_dict
+from dyn_struct import loading
 
 
 class Command(BaseCommand):
     help = 'Load dynamic structure'
 
     def add_arguments(self, parser):
-        parser.add_argument('-f', '--file', dest='file', type=str, required=True)
+        parser.add_argument('-f', '--file', dest='file', type=str, required=True,
+                            help='file, directory with shard files or glob pattern')
+        parser.add_argument('--format', dest='format', choices=('json', 'jsonl'),
+                            help='json array or JSON Lines, by default detected by file extension')
+        parser.add_argument('-b', '--batch-size', dest='batch_size', type=int, default=1,
+                            help='structures committed in one transaction')
+        parser.add_argument('--checkpoint', dest='checkpoint', type=str,
+                            help='file with the count of committed structures, a repeated run continues after them')
+        parser.add_argument('-w', '--workers', dest='workers', type=int, default=1,
+                            help='processes loading structures in parallel (partitioned by structure name), '
+                                 'not combined with --checkpoint and --batch-size')
 
     def handle(self, *args, **options):
         print('Load ... ')
-        with open(options['file'], 'r') as file:
-            structs_data = json.loads(file.read())
+        paths = loading.get_files(options['file'])
+        if not paths:
+            raise CommandError('No files found: {}'.format(options['file']))
 
-        for struct_info in structs_data:
-            structure_from_dict(struct_info)
+        if options['workers'] > 1:
+            if options['checkpoint'] or options['batch_size'] != 1:
+                raise CommandError('--checkpoint and --batch-size are not supported with --workers')
+            self.load_parallel(paths, options)
+        else:
+            self.load_serial(paths, options)
 
         print('Success!')
+
+    def load_serial(self, paths, options):
+        checkpoint = options['checkpoint']
+        skip = loading.read_checkpoint(checkpoint)
+        if skip:
+            print('Skip {} loaded structures'.format(skip))
+
+        struct_infos = loading.iter_files_structures(paths, options['format'])
+        batches = loading.load_structures(struct_infos, batch_size=options['batch_size'], skip=skip,
+                                          checkpoint_path=checkpoint)
+        all_stats = []
+        for loaded, batch_stats in batches:
+            for stats in batch_stats:
+                print(stats)
+            print('{} structures loaded'.format(loaded))
+            all_stats.extend(batch_stats)
+
+        if checkpoint and os.path.exists(checkpoint):
+            os.remove(checkpoint)
+        print(loading.summarize(all_stats))
+
+    def load_parallel(self, paths, options):
+        results = loading.load_parallel(paths, options['format'], workers=options['workers'])
+
+        all_stats = []
+        errors = []
+        for name, stats_list, error in results:
+            for stats in stats_list:
+                print(stats)
+            all_stats.extend(stats_list)
+            if error:
+                errors.append('{} {}'.format(name, error))
+
+        print(loading.summarize(all_stats))
+        if errors:
+            raise CommandError('Failed to load {} structures:\n{}'.format(len(errors), '\n'.join(errors)))
@@ -2,7 +2,7 @@ import json
 
 from django.core.management.base import BaseCommand
 
-from dyn_struct.datatools import structure_from_dict
+from dyn_struct.loading import load_structure
 
 
 class Command(BaseCommand):
@@ -16,6 +16,7 @@ class Command(BaseCommand):
         with open(options['file'], 'r') as file:
             structs_data = json.loads(file.read())
 
-        structure_from_dict(structs_data)
+        _, stats = load_structure(structs_data)
+        print(stats)
 
         print('Success!')
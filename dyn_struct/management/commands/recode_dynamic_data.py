@@ -0,0 +1,56 @@
+from django.core.exceptions import FieldDoesNotExist
+from django.core.management.base import BaseCommand, CommandError
+from django.db import models
+
+from dyn_struct import codec, datatools, recoding
+
+
+class Command(BaseCommand):
+    help = 'Recode saved dynamic data of model records (by default into the compact format)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('-m', '--model', dest='model', type=str, required=True, help='app_label.ModelName')
+        parser.add_argument('-f', '--field', dest='field', type=str, default='data')
+        parser.add_argument('--format', dest='format', type=int, default=codec.FORMAT_COMPACT, choices=codec.FORMATS)
+        parser.add_argument('-c', '--chunk-size', dest='chunk_size', type=int, default=1000)
+        parser.add_argument('-w', '--workers', dest='workers', type=int, default=1)
+        parser.add_argument('--checkpoint', dest='checkpoint', type=str,
+                            help='directory for checkpoints, a repeated run continues from the last saved chunk')
+        parser.add_argument('--dry-run', dest='dry_run', default=False, action='store_true')
+
+    def handle(self, *args, **options):
+        field_name = options['field']
+        try:
+            model = recoding.get_model(options['model'])
+            model._meta.get_field(field_name)
+        except (LookupError, ValueError, FieldDoesNotExist) as ex:
+            raise CommandError(str(ex))
+
+        workers = options['workers']
+        if workers > 1 and not isinstance(model._meta.pk, models.IntegerField):
+            raise CommandError('--workers requires an integer primary key')
+
+        plan = recoding.get_plan(model, options['checkpoint'], workers, options['dry_run'])
+        tasks = [
+            {
+                'model_label': options['model'],
+                'field_name': field_name,
+                'pk_range': pk_range,
+                'data_format': options['format'],
+                'chunk_size': options['chunk_size'],
+                'dry_run': options['dry_run'],
+                'checkpoint_dir': options['checkpoint'],
+            }
+            for pk_range in plan
+        ]
+
+        # диапазон ключей на процесс; при одном диапазоне пул не нужен
+        stats_list = datatools.map_chunks(recoding.recode_range_worker, tasks, workers if len(tasks) > 1 else 1)
+        stats = recoding.merge_stats(stats_list)
+        self.stdout.write('{}: {} rows, {} {}'.format(
+            options['model'],
+            stats['rows'],
+            stats['changed'],
+            'to recode' if options['dry_run'] else 'recoded',
+        ))
+        self.stdout.write('data size: {} -> {} bytes'.format(stats['bytes_before'], stats['bytes_after']))
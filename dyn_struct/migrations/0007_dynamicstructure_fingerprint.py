@@ -0,0 +1,58 @@
+import hashlib
+import json
+
+from django.db import migrations, models
+
+# копия алгоритма отпечатка на момент миграции (datatools.get_fields_fingerprint), чтобы миграция не менялась
+STRUCTURE_FIELD_KEYS = (
+    'header', 'name', 'form_field', 'form_kwargs', 'widget', 'widget_kwargs', 'row', 'position', 'classes',
+)
+
+
+def _normalize_kwargs(value):
+    try:
+        return json.loads(value) if value else {}
+    except (TypeError, ValueError):
+        return value
+
+
+def get_fields_fingerprint(fields_data):
+    normalized = []
+    for field_data in fields_data:
+        item = {key: field_data.get(key) for key in STRUCTURE_FIELD_KEYS}
+        item['form_kwargs'] = _normalize_kwargs(item['form_kwargs'])
+        item['widget_kwargs'] = _normalize_kwargs(item['widget_kwargs'])
+        normalized.append(item)
+
+    normalized.sort(key=lambda i: (i['row'] or 0, i['position'] or 0, i['name'] or '', i['header'] or ''))
+    dumped = json.dumps(normalized, sort_keys=True, ensure_ascii=False, separators=(',', ':'))
+    return hashlib.sha256(dumped.encode('utf-8')).hexdigest()
+
+
+def fill_fingerprint(apps, schema_editor):
+    DynamicStructure = apps.get_model('dyn_struct', 'DynamicStructure')
+    DynamicStructureField = apps.get_model('dyn_struct', 'DynamicStructureField')
+
+    for struct_id in DynamicStructure.objects.values_list('id', flat=True).iterator():
+        fields_data = DynamicStructureField.objects.filter(structure_id=struct_id).values(
+            *STRUCTURE_FIELD_KEYS
+        )
+        fingerprint = get_fields_fingerprint(fields_data)
+        DynamicStructure.objects.filter(id=struct_id).update(fingerprint=fingerprint)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('dyn_struct', '0006_auto_20200117_2316'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='dynamicstructure',
+            name='fingerprint',
+            field=models.CharField(blank=True, db_index=True, editable=False, max_length=64,
+                                   verbose_name='Отпечаток полей'),
+        ),
+        migrations.RunPython(fill_fingerprint, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,40 @@
+from django.db import migrations, models
+from swutils.string import transliterate
+
+
+def make_form_key(name):
+    # копия DynamicStructureField.make_form_key на момент миграции
+    return transliterate(name, space='_').replace("'", "") if name else ''
+
+
+def fill_form_key(apps, schema_editor):
+    DynamicStructureField = apps.get_model('dyn_struct', 'DynamicStructureField')
+
+    batch = []
+    for field in DynamicStructureField.objects.exclude(name='').only('id', 'name').iterator(chunk_size=1000):
+        field.form_key = make_form_key(field.name)
+        batch.append(field)
+        if len(batch) >= 1000:
+            DynamicStructureField.objects.bulk_update(batch, ['form_key'])
+            batch = []
+    DynamicStructureField.objects.bulk_update(batch, ['form_key'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('dyn_struct', '0007_dynamicstructure_fingerprint'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='dynamicstructurefield',
+            name='form_key',
+            field=models.CharField(blank=True, editable=False, max_length=512, verbose_name='Ключ в форме'),
+        ),
+        migrations.AddIndex(
+            model_name='dynamicstructurefield',
+            index=models.Index(fields=['structure', 'form_key'], name='dyn_struct_field_form_key'),
+        ),
+        migrations.RunPython(fill_form_key, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,44 @@
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+def fill_current(apps, schema_editor):
+    DynamicStructure = apps.get_model('dyn_struct', 'DynamicStructure')
+    DynamicStructureCurrent = apps.get_model('dyn_struct', 'DynamicStructureCurrent')
+
+    current = {}
+    structures = DynamicStructure.objects.filter(is_deprecated=False).order_by('name', 'version')
+    for struct_id, name in structures.values_list('id', 'name').iterator():
+        current[name] = struct_id
+
+    DynamicStructureCurrent.objects.bulk_create(
+        [DynamicStructureCurrent(name=name, structure_id=struct_id) for name, struct_id in current.items()],
+        batch_size=1000,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('dyn_struct', '0008_dynamicstructurefield_form_key'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='dynamicstructure',
+            index=models.Index(fields=['name', 'is_deprecated', '-version'], name='dyn_struct_name_actual'),
+        ),
+        migrations.CreateModel(
+            name='DynamicStructureCurrent',
+            fields=[
+                ('name', models.CharField(max_length=255, primary_key=True, serialize=False, verbose_name='Название')),
+                ('structure', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+',
+                                                to='dyn_struct.dynamicstructure', verbose_name='Структура')),
+            ],
+            options={
+                'verbose_name': 'актуальная версия динамической структуры',
+                'verbose_name_plural': 'актуальные версии динамических структур',
+            },
+        ),
+        migrations.RunPython(fill_current, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,157 @@
+# coding: utf-8
+"""
+Проекция динамических данных в таблицу DynamicValue: по строке на каждое значение поля формы
+с типизированными колонками и составными индексами. Позволяет отбирать объекты по значениям полей
+запросом к БД, без разбора JSON каждой записи.
+Таблица и обработчики сигналов подключаются приложением 'dyn_struct.contrib.projection' (см. INSTALLED_APPS).
+Ключ объекта должен быть целым числом, строки длиннее 255 символов сохраняются обрезанными.
+"""
+from django.conf import settings
+from django.contrib.contenttypes.models import ContentType
+from django.db import transaction
+from django.db.models import Exists, OuterRef
+from django.db.models.signals import post_delete, post_save
+
+from dyn_struct import filestorage
+from dyn_struct.contrib.projection.models import DynamicValue
+from dyn_struct.db import fields, models
+
+TEXT_MAX_LENGTH = 255
+
+
+def is_enabled():
+    return getattr(settings, 'DYN_STRUCT_PROJECTION', False)
+
+
+def _typed_value(value):
+    """ Значение по типизированным колонкам: value_text, value_number, value_bool """
+    if isinstance(value, bool):
+        return {'value_bool': value}
+    if isinstance(value, (int, float)):
+        return {'value_number': value, 'value_text': str(value)}
+
+    value = str(value)
+    typed = {'value_text': value[:TEXT_MAX_LENGTH]}
+    # данные формы хранятся в виде строк из запроса, числа распознаем
+    try:
+        typed['value_number'] = float(value)
+    except ValueError:
+        pass
+    return typed
+
+
+def build_values(instance, content_type=None):
+    """ Несохраненные строки DynamicValue для объекта """
+    data = getattr(instance, instance.data_field)
+    if not data:
+        return []
+
+    content_type = content_type or ContentType.objects.get_for_model(instance)
+    structure_name, version = fields.parse_data_header(data)
+    form_data = fields.parse_data(data).get('form_data') or {}
+
+    values = []
+    for key, value in form_data.items():
+        items = value if isinstance(value, list) else [value]
+        for item in items:
+            if item is None or item == '' or filestorage.is_file_ref(item) or isinstance(item, dict):
+                continue
+            values.append(DynamicValue(
+                content_type=content_type,
+                object_id=instance.pk,
+                structure_name=structure_name,
+                structure_version=version,
+                key=key,
+                **_typed_value(item)
+            ))
+    return values
+
+
+def update_instance(instance):
+    content_type = ContentType.objects.get_for_model(instance)
+    with transaction.atomic(using=instance._state.db):
+        DynamicValue.objects.filter(content_type=content_type, object_id=instance.pk).delete()
+        DynamicValue.objects.bulk_create(build_values(instance, content_type))
+
+
+def delete_instance(instance):
+    content_type = ContentType.objects.get_for_model(instance)
+    DynamicValue.objects.filter(content_type=content_type, object_id=instance.pk).delete()
+
+
+def _update_receiver(sender, instance, raw=False, **kwargs):
+    if is_enabled() and not raw:
+        update_instance(instance)
+
+
+def _delete_receiver(sender, instance, **kwargs):
+    if is_enabled():
+        delete_instance(instance)
+
+
+def connect_signals():
+    """ Обновление проекции при сохранении и удалении объектов моделей с DynamicStructureMixin """
+    models.connect_dynamic_receivers([(post_save, _update_receiver), (post_delete, _delete_receiver)],
+                                     dispatch_uid='dyn_struct.projection')
+
+
+def rebuild(model, chunk_size=1000):
+    """
+    Полное перестроение проекции для модели порциями по первичному ключу: строки порции удаляются
+    и записываются заново в одной транзакции, поэтому отбор по проекции во время перестроения
+    видит полные данные. Структуры порции загружаются одним запросом (см. prefetch_structures)
+    :return: количество обработанных объектов
+    """
+    content_type = ContentType.objects.get_for_model(model)
+    queryset = model._base_manager.order_by('pk')
+    values_qs = DynamicValue.objects.filter(content_type=content_type)
+
+    count = 0
+    last_pk = None
+    while True:
+        with transaction.atomic():
+            chunk_qs = queryset if last_pk is None else queryset.filter(pk__gt=last_pk)
+            chunk = models.prefetch_structures(chunk_qs[:chunk_size])
+            stale_qs = values_qs if last_pk is None else values_qs.filter(object_id__gt=last_pk)
+            if not chunk:
+                # строки объектов, удаленных после последней порции
+                stale_qs.delete()
+                return count
+
+            stale_qs.filter(object_id__lte=chunk[-1].pk).delete()
+            values = []
+            for instance in chunk:
+                values.extend(build_values(instance, content_type))
+            DynamicValue.objects.bulk_create(values, batch_size=chunk_size)
+
+        count += len(chunk)
+        last_pk = chunk[-1].pk
+
+
+def get_value_lookup(value, lookup='exact'):
+    """ Условие на типизированную колонку по типу искомого значения """
+    if isinstance(value, (list, tuple, set)) and value:
+        column = next(iter(_typed_value(next(iter(value)))))
+    else:
+        column = next(iter(_typed_value(value)))
+    if column == 'value_text' and lookup not in ('in', 'isnull'):
+        value = str(value)[:TEXT_MAX_LENGTH]
+    return {'{}__{}'.format(column, lookup): value}
+
+
+def filter_by_value(queryset, key, value, lookup='exact', structure_name=None):
+    """
+    Отбор объектов с DynamicStructureMixin по значению поля формы через индексированную таблицу DynamicValue
+        filter_by_value(Protocol.objects.all(), 'diagnoz', 'да')
+        filter_by_value(Protocol.objects.all(), 'vozrast', 18, lookup='gte')
+    :param key: ключ поля в форме (транслитерированное название)
+    """
+    values = DynamicValue.objects.filter(
+        content_type=ContentType.objects.get_for_model(queryset.model),
+        object_id=OuterRef('pk'),
+        key=key,
+        **get_value_lookup(value, lookup)
+    )
+    if structure_name is not None:
+        values = values.filter(structure_name=structure_name)
+    return queryset.filter(Exists(values))
@@ -0,0 +1,169 @@
+# coding: utf-8
+"""
+Перекодирование сохраненных данных объектов в другой формат хранения (см. codec).
+Записи читаются порциями по первичному ключу и записываются через bulk_update,
+каждая порция в отдельной транзакции, поэтому большие таблицы обрабатываются без длительных блокировок.
+"""
+import json
+import os
+
+from django.apps import apps
+from django.db import transaction
+
+from dyn_struct import codec
+
+PLAN_FILE_NAME = 'plan.json'
+
+
+def get_model(model_label):
+    return apps.get_model(model_label)
+
+
+def split_pk_range(min_pk, max_pk, parts):
+    """
+    Разбиение диапазона первичных ключей на части
+    :return: список пар (нижняя граница не включительно, верхняя граница включительно)
+    """
+    lower = min_pk - 1
+    total = max_pk - lower
+    parts = max(1, min(parts, total))
+
+    ranges = []
+    for i in range(parts):
+        upper = lower + total * (i + 1) // parts
+        start = ranges[-1][1] if ranges else lower
+        ranges.append((start, upper))
+    return ranges
+
+
+def get_plan(model, checkpoint_dir=None, workers=1, dry_run=False):
+    """
+    Диапазоны ключей для обработки; при наличии контрольной точки берутся из нее, чтобы продолжение совпадало
+    :param dry_run: не записывать план в каталог контрольных точек
+    """
+    plan_path = os.path.join(checkpoint_dir, PLAN_FILE_NAME) if checkpoint_dir else None
+    if plan_path and os.path.exists(plan_path):
+        with open(plan_path, 'r') as file:
+            return [tuple(pk_range) for pk_range in json.load(file)]
+
+    qs = model._base_manager.order_by()
+    min_pk = qs.order_by('pk').values_list('pk', flat=True).first()
+    max_pk = qs.order_by('-pk').values_list('pk', flat=True).first()
+    if min_pk is None:
+        plan = []
+    elif workers > 1:
+        plan = split_pk_range(min_pk, max_pk, workers)
+    else:
+        # для одного процесса диапазон не нужен, ключ может быть и нечисловым
+        plan = [(None, None)]
+
+    if plan_path and not dry_run:
+        os.makedirs(checkpoint_dir, exist_ok=True)
+        _write_json(plan_path, plan)
+    return plan
+
+
+def get_checkpoint_path(checkpoint_dir, pk_range):
+    return os.path.join(checkpoint_dir, 'range_{}_{}.json'.format(*pk_range))
+
+
+def read_checkpoint(checkpoint_dir, pk_range):
+    if not checkpoint_dir:
+        return None
+
+    path = get_checkpoint_path(checkpoint_dir, pk_range)
+    if not os.path.exists(path):
+        return None
+
+    with open(path, 'r') as file:
+        return json.load(file)
+
+
+def write_checkpoint(checkpoint_dir, pk_range, checkpoint):
+    if checkpoint_dir:
+        _write_json(get_checkpoint_path(checkpoint_dir, pk_range), checkpoint)
+
+
+def _write_json(path, data):
+    # запись через временный файл, чтобы прерванный процесс не оставил битую контрольную точку
+    tmp_path = path + '.tmp'
+    with open(tmp_path, 'w') as file:
+        json.dump(data, file)
+    os.replace(tmp_path, path)
+
+
+def read_chunk(model, field_name, pk_range, last_pk=None, chunk_size=1000, lock=False):
+    """
+    Порция пар (ключ, данные) из диапазона ключей после last_pk
+    :param lock: заблокировать строки порции до конца транзакции (select_for_update)
+    """
+    lower, upper = pk_range
+    qs = model._base_manager.order_by('pk')
+    if upper is not None:
+        qs = qs.filter(pk__lte=upper)
+
+    start = last_pk if last_pk is not None else lower
+    if start is not None:
+        qs = qs.filter(pk__gt=start)
+    if lock:
+        qs = qs.select_for_update()
+    return list(qs.values_list('pk', field_name)[:chunk_size])
+
+
+def recode_range(model_label, field_name, pk_range, data_format=codec.FORMAT_COMPACT, chunk_size=1000,
+                 dry_run=False, checkpoint_dir=None):
+    """
+    Перекодирование данных записей из диапазона ключей
+    :return: статистика (rows - просмотрено записей, changed - изменено, bytes_before/bytes_after - размер данных)
+    """
+    model = get_model(model_label)
+
+    checkpoint = None if dry_run else read_checkpoint(checkpoint_dir, pk_range)
+    if checkpoint is None:
+        checkpoint = {
+            'last_pk': None,
+            'stats': {'rows': 0, 'changed': 0, 'bytes_before': 0, 'bytes_after': 0},
+        }
+    stats = checkpoint['stats']
+
+    while True:
+        # порция читается с блокировкой в той же транзакции, что и записывается:
+        # иначе изменение записи, сделанное во время перекодирования, было бы перезаписано
+        with transaction.atomic(using=model._base_manager.db):
+            chunk = read_chunk(model, field_name, pk_range, checkpoint['last_pk'], chunk_size, lock=not dry_run)
+            if not chunk:
+                break
+
+            changed = []
+            for pk, value in chunk:
+                stats['rows'] += 1
+                if not value:
+                    continue
+
+                new_value = codec.recode(value, data_format)
+                stats['bytes_before'] += len(value.encode('utf-8'))
+                stats['bytes_after'] += len(new_value.encode('utf-8'))
+                if new_value != value:
+                    changed.append(model(pk=pk, **{field_name: new_value}))
+
+            stats['changed'] += len(changed)
+            if changed and not dry_run:
+                model._base_manager.bulk_update(changed, [field_name])
+
+        checkpoint['last_pk'] = chunk[-1][0]
+        if not dry_run:
+            write_checkpoint(checkpoint_dir, pk_range, checkpoint)
+
+    return stats
+
+
+def recode_range_worker(kwargs):
+    return recode_range(**kwargs)
+
+
+def merge_stats(stats_list):
+    total = {'rows': 0, 'changed': 0, 'bytes_before': 0, 'bytes_after': 0}
+    for stats in stats_list:
+        for key in total.keys():
+            total[key] += stats[key]
+    return total
@@ -0,0 +1,186 @@
+# coding: utf-8
+"""
+Отрисовка динамической структуры.
+Статические части разметки (стили, строки, колонки, заголовки) не зависят от данных формы,
+поэтому при включенной настройке DYN_STRUCT_RENDER_CACHE они отрисовываются один раз на версию структуры,
+а на каждый запрос отрисовываются только поля формы. Пустая (несвязанная) форма кэшируется целиком.
+При включенной настройке DYN_STRUCT_PYTHON_RENDERER поля шаблонов bootstrap2 и bootstrap3
+отрисовываются без движка шаблонов (см. PYTHON_RENDERERS).
+"""
+from django.conf import settings
+from django.template import Template
+from django.template.loader import get_template
+from django.utils.html import conditional_escape, format_html
+from django.utils.safestring import mark_safe
+
+STRUCT_TEMPLATE = 'dyn_struct/render_struct.html'
+FIELD_TEMPLATES = {
+    'bootstrap2': 'dyn_struct/render_struct_field_bootstrap2.html',
+    'bootstrap3': 'dyn_struct/render_struct_field_bootstrap3.html',
+}
+FIELD_MARKER = '<!--dyn_struct:field-->'
+
+_field_marker_template = None
+
+
+def is_cache_enabled():
+    return getattr(settings, 'DYN_STRUCT_RENDER_CACHE', False)
+
+
+def render_field_bootstrap2(item):
+    """ То же, что dyn_struct/render_struct_field_bootstrap2.html """
+    errors = ''
+    if item.errors:
+        errors = format_html(
+            "\n            <div class='clearfix'></div>"
+            '\n            <span class="help-inline">'
+            '\n                {}'
+            '\n            </span>'
+            '\n        ',
+            mark_safe(', '.join(conditional_escape(error) for error in item.errors))
+        )
+
+    help_text = ''
+    if item.help_text:
+        help_text = format_html(
+            "\n            <div class='clearfix'></div>"
+            "\n            <small class='muted'>{}</small>"
+            '\n        ',
+            mark_safe(item.help_text)
+        )
+
+    return format_html(
+        '<div class="control-group {}">'
+        '\n    <label class="control-label {}" for="id_">'
+        '\n        {}'
+        '\n    </label>'
+        '\n    <div class="controls">'
+        '\n        {}'
+        '\n\n        {}'
+        '\n\n        {}'
+        '\n    </div>'
+        '\n</div>',
+        'error' if item.errors else '',
+        'required' if item.field.required else '',
+        item.label,
+        item,
+        errors,
+        help_text,
+    )
+
+
+def render_field_bootstrap3(item):
+    """ То же, что dyn_struct/render_struct_field_bootstrap3.html """
+    return format_html(
+        '<div class="form-group ">'
+        '\n    <p><label class="control-label" for="id_">{}</label></p>'
+        '\n    {}'
+        '\n</div>\n',
+        item.label,
+        item,
+    )
+
+
+PYTHON_RENDERERS = {
+    'bootstrap2': render_field_bootstrap2,
+    'bootstrap3': render_field_bootstrap3,
+}
+
+
+def get_python_renderer(template):
+    """
+    Отрисовка поля без движка шаблонов; None - для собственных шаблонов или если не включено настройкой
+    (по-умолчанию выключено: переопределенные в проекте шаблоны полей иначе не применялись бы)
+    """
+    if not isinstance(template, str) or not getattr(settings, 'DYN_STRUCT_PYTHON_RENDERER', False):
+        return None
+    return PYTHON_RENDERERS.get(template)
+
+
+def get_field_template_name(template):
+    return FIELD_TEMPLATES.get(template, template)
+
+
+def get_field_marker_template():
+    # шаблон-заглушка вместо поля: по нему отрисованная структура делится на статические фрагменты
+    global _field_marker_template
+    if _field_marker_template is None:
+        _field_marker_template = Template(FIELD_MARKER)
+    return _field_marker_template
+
+
+def render_rows(rows, template, field_template=None):
+    return get_template(STRUCT_TEMPLATE).render({
+        'rows': rows,
+        'template': template,
+        'field_template': field_template or get_field_template_name(template),
+    })
+
+
+def render_field(field, template):
+    return get_template(get_field_template_name(template)).render({
+        'field': field,
+        'item': field.bound_field,
+        'template': template,
+    })
+
+
+def get_fragments(compiled, template):
+    """ Статические фрагменты разметки между полями (на одно больше, чем полей формы) """
+    key = ('fragments', template)
+    fragments = compiled.render_cache.get(key)
+    if fragments is None:
+        rows = [[field for field, _ in row] for row in compiled.rows]
+        fragments = tuple(render_rows(rows, template, get_field_marker_template()).split(FIELD_MARKER))
+        compiled.render_cache[key] = fragments
+    return fragments
+
+
+def render_cached(structure_obj, form, template):
+    compiled = structure_obj.get_compiled()
+    fragments = get_fragments(compiled, template)
+
+    parts = [fragments[0]]
+    bound_fields = (field for row in compiled.bind_rows(form) for field in row if not field.is_header())
+    for fragment, field in zip(fragments[1:], bound_fields):
+        parts.append(render_field(field, template))
+        parts.append(fragment)
+    return ''.join(parts)
+
+
+def render_python(structure_obj, form, template):
+    """ Отрисовка по плану строк: статические фрагменты версии структуры и поля формы без шаблонов """
+    compiled = structure_obj.get_compiled()
+    fragments = get_fragments(compiled, template)
+    render = get_python_renderer(template)
+
+    parts = [fragments[0]]
+    field_names = (field_name for row in compiled.rows for _, field_name in row if field_name is not None)
+    for fragment, field_name in zip(fragments[1:], field_names):
+        parts.append(render(form[field_name]))
+        parts.append(fragment)
+    return ''.join(parts)
+
+
+def render_form(structure_obj, form, template):
+    if get_python_renderer(template) is not None:
+        return render_python(structure_obj, form, template)
+    if is_cache_enabled():
+        return render_cached(structure_obj, form, template)
+    return render_rows(structure_obj.get_rows(form), template)
+
+
+def render_structure(structure_obj, prefix, value=None, template='bootstrap3'):
+    """ HTML структуры с полями формы, связанной с value """
+    if value or not is_cache_enabled() or not isinstance(template, str):
+        form = structure_obj.build_form(data=value, prefix=prefix)
+        return mark_safe(render_form(structure_obj, form, template))
+
+    # несвязанная форма зависит только от версии структуры - кэшируем ее целиком
+    compiled = structure_obj.get_compiled()
+    key = ('unbound', template, prefix)
+    html = compiled.render_cache.get(key)
+    if html is None:
+        html = render_form(structure_obj, structure_obj.build_form(prefix=prefix), template)
+        compiled.render_cache[key] = html
+    return mark_safe(html)
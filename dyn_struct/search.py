@@ -0,0 +1,233 @@
+# coding: utf-8
+"""
+Полнотекстовый поиск по динамическим данным. В DynamicSearchDocument пишутся только текстовые значения
+полей (без ключей JSON), индекс строится средствами БД: FTS5 в SQLite, tsvector (GIN-индекс) в PostgreSQL.
+Для остальных БД (и SQLite без FTS5) поиск выполняется через icontains по документам.
+Таблица документов и обработчики сигналов подключаются приложением 'dyn_struct.contrib.search' (см. INSTALLED_APPS).
+"""
+import re
+
+from django.conf import settings
+from django.contrib.contenttypes.models import ContentType
+from django.db import connections, router, transaction
+from django.db.models.signals import post_delete, post_save
+
+from dyn_struct import filestorage
+from dyn_struct.contrib.search.models import DynamicSearchDocument
+from dyn_struct.db import fields, models
+
+FTS_TABLE = 'dyn_struct_search_fts'
+PG_CONFIG = 'simple'
+
+# наличие таблицы FTS5 по алиасу соединения (см. uses_fts)
+_fts_tables = {}
+
+
+def is_enabled():
+    return getattr(settings, 'DYN_STRUCT_SEARCH', False)
+
+
+def get_connection():
+    return connections[router.db_for_write(DynamicSearchDocument)]
+
+
+def uses_fts(connection):
+    """
+    Поиск через FTS5: таблица создается миграцией, только если SQLite собран с FTS5.
+    Наличие таблицы проверяется один раз для соединения
+    """
+    if connection.vendor != 'sqlite':
+        return False
+    if connection.alias not in _fts_tables:
+        _fts_tables[connection.alias] = FTS_TABLE in connection.introspection.table_names()
+    return _fts_tables[connection.alias]
+
+
+def get_text(instance):
+    """ Текстовые значения динамических данных объекта (заголовки, числа, файлы и флаги пропускаются) """
+    parts = []
+    for row in instance.get_verbose_data():
+        for field in row:
+            if field.get('is_header'):
+                continue
+
+            value = field.get('value')
+            for item in value if isinstance(value, list) else [value]:
+                if isinstance(item, str) and item.strip() and not filestorage.is_file_ref(item):
+                    parts.append(item.strip())
+    return '\n'.join(parts)
+
+
+def _index_documents(connection, documents):
+    # в PostgreSQL индекс по выражению обновляется сам, в SQLite строки FTS5 пишутся явно
+    if not uses_fts(connection) or not documents:
+        return
+    with connection.cursor() as cursor:
+        cursor.executemany('DELETE FROM {} WHERE rowid = %s'.format(FTS_TABLE), [(doc.id, ) for doc in documents])
+        cursor.executemany('INSERT INTO {} (rowid, text) VALUES (%s, %s)'.format(FTS_TABLE),
+                           [(doc.id, doc.text) for doc in documents])
+
+
+def _delete_documents(connection, documents_qs):
+    if uses_fts(connection):
+        ids = [(document_id, ) for document_id in documents_qs.values_list('id', flat=True)]
+        with connection.cursor() as cursor:
+            cursor.executemany('DELETE FROM {} WHERE rowid = %s'.format(FTS_TABLE), ids)
+    documents_qs.delete()
+
+
+def _build_document(instance, content_type):
+    text = get_text(instance)
+    if not text:
+        return None
+
+    structure_name, version = fields.parse_data_header(getattr(instance, instance.data_field))
+    return DynamicSearchDocument(
+        content_type=content_type,
+        object_id=instance.pk,
+        structure_name=structure_name,
+        structure_version=version,
+        text=text,
+    )
+
+
+def update_instance(instance):
+    content_type = ContentType.objects.get_for_model(instance)
+    document = _build_document(instance, content_type)
+    connection = get_connection()
+
+    with transaction.atomic(using=connection.alias):
+        documents_qs = DynamicSearchDocument.objects.filter(content_type=content_type, object_id=instance.pk)
+        if document is None:
+            _delete_documents(connection, documents_qs)
+            return
+
+        document, _ = DynamicSearchDocument.objects.update_or_create(
+            content_type=content_type,
+            object_id=instance.pk,
+            defaults={
+                'structure_name': document.structure_name,
+                'structure_version': document.structure_version,
+                'text': document.text,
+            }
+        )
+        _index_documents(connection, [document])
+
+
+def delete_instance(instance):
+    content_type = ContentType.objects.get_for_model(instance)
+    connection = get_connection()
+    with transaction.atomic(using=connection.alias):
+        _delete_documents(
+            connection,
+            DynamicSearchDocument.objects.filter(content_type=content_type, object_id=instance.pk)
+        )
+
+
+def _update_receiver(sender, instance, raw=False, **kwargs):
+    if is_enabled() and not raw:
+        update_instance(instance)
+
+
+def _delete_receiver(sender, instance, **kwargs):
+    if is_enabled():
+        delete_instance(instance)
+
+
+def connect_signals():
+    """ Обновление документов при сохранении и удалении объектов моделей с DynamicStructureMixin """
+    models.connect_dynamic_receivers([(post_save, _update_receiver), (post_delete, _delete_receiver)],
+                                     dispatch_uid='dyn_struct.search')
+
+
+def reindex(model, chunk_size=500):
+    """
+    Полная переиндексация объектов модели порциями по первичному ключу: документы порции заменяются
+    в одной транзакции, поэтому поиск во время переиндексации находит все объекты.
+    Структуры порции загружаются одним запросом (см. prefetch_structures)
+    :return: (количество объектов, количество документов)
+    """
+    content_type = ContentType.objects.get_for_model(model)
+    connection = get_connection()
+    queryset = model._base_manager.order_by('pk')
+    documents_qs = DynamicSearchDocument.objects.filter(content_type=content_type)
+
+    count = 0
+    documents_count = 0
+    last_pk = None
+    while True:
+        with transaction.atomic(using=connection.alias):
+            chunk_qs = queryset if last_pk is None else queryset.filter(pk__gt=last_pk)
+            chunk = models.prefetch_structures(chunk_qs[:chunk_size])
+            stale_qs = documents_qs if last_pk is None else documents_qs.filter(object_id__gt=last_pk)
+            if not chunk:
+                # документы объектов, удаленных после последней порции
+                _delete_documents(connection, stale_qs)
+                return count, documents_count
+
+            _delete_documents(connection, stale_qs.filter(object_id__lte=chunk[-1].pk))
+            documents = [_build_document(instance, content_type) for instance in chunk]
+            documents = [document for document in documents if document is not None]
+            documents = DynamicSearchDocument.objects.bulk_create(documents)
+            _index_documents(connection, documents)
+
+        count += len(chunk)
+        documents_count += len(documents)
+        last_pk = chunk[-1].pk
+
+
+def get_fts_query(query):
+    # слова запроса берутся в кавычки, чтобы синтаксис FTS5 (OR, NOT, *, ...) не влиял на поиск
+    return ' '.join('"{}"'.format(word) for word in re.findall(r'\w+', query))
+
+
+def search(model, query, limit=None, structure_name=None):
+    """
+    Поиск объектов модели по тексту динамических данных (все слова запроса должны встречаться)
+    :return: список ID объектов, наиболее релевантные - первыми
+    """
+    content_type = ContentType.objects.get_for_model(model)
+    connection = get_connection()
+    documents_table = DynamicSearchDocument._meta.db_table
+
+    if uses_fts(connection):
+        query = get_fts_query(query)
+        if not query:
+            return []
+        sql = ('SELECT d.object_id FROM {fts} JOIN {docs} d ON d.id = {fts}.rowid '
+               'WHERE {fts} MATCH %s AND d.content_type_id = %s').format(fts=FTS_TABLE, docs=documents_table)
+        params = [query, content_type.id]
+        order_by = ' ORDER BY rank'
+    elif connection.vendor == 'postgresql':
+        sql = ("SELECT d.object_id FROM {docs} d "
+               "WHERE to_tsvector('{config}', d.text) @@ plainto_tsquery('{config}', %s) "
+               "AND d.content_type_id = %s").format(docs=documents_table, config=PG_CONFIG)
+        params = [query, content_type.id]
+        order_by = " ORDER BY ts_rank(to_tsvector('{config}', d.text), plainto_tsquery('{config}', %s)) DESC".format(
+            config=PG_CONFIG
+        )
+    else:
+        words = re.findall(r'\w+', query)
+        if not words:
+            return []
+        documents = DynamicSearchDocument.objects.filter(content_type=content_type)
+        for word in words:
+            documents = documents.filter(text__icontains=word)
+        if structure_name is not None:
+            documents = documents.filter(structure_name=structure_name)
+        object_ids = documents.order_by('object_id').values_list('object_id', flat=True)
+        return list(object_ids[:limit] if limit else object_ids)
+
+    if structure_name is not None:
+        sql += ' AND d.structure_name = %s'
+        params.append(structure_name)
+    sql += order_by
+    if connection.vendor == 'postgresql':
+        params.append(query)
+    if limit:
+        sql += ' LIMIT %s'
+        params.append(limit)
+
+    with connection.cursor() as cursor:
+        cursor.execute(sql, params)
+        return [row[0] for row in cursor.fetchall()]
@@ -0,0 +1,102 @@
+# coding: utf-8
+"""
+Общий для процессов кэш структур поверх кэша Django (настройка DYN_STRUCT_CACHE - алиас из CACHES).
+Хранятся актуальная версия структуры по названию и описания полей по паре (название, версия).
+Ключ актуальной версии сбрасывается при сохранении структуры, клонировании, удалении и загрузке,
+поэтому новая версия видна всем процессам сразу после фиксации транзакции.
+"""
+import hashlib
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import router, transaction
+
+KEY_PREFIX = 'dyn_struct:1'
+DEFAULT_TIMEOUT = 24 * 60 * 60
+
+
+def get_cache():
+    alias = getattr(settings, 'DYN_STRUCT_CACHE', None)
+    if alias is None:
+        return None
+    return caches[alias]
+
+
+def get_timeout():
+    return getattr(settings, 'DYN_STRUCT_CACHE_TIMEOUT', DEFAULT_TIMEOUT)
+
+
+def _name_hash(name):
+    # название может содержать пробелы и кириллицу, недопустимые в ключах memcached
+    return hashlib.sha1(name.encode('utf-8')).hexdigest()
+
+
+def get_current_key(name):
+    return '{}:current:{}'.format(KEY_PREFIX, _name_hash(name))
+
+
+def get_fields_key(name, version):
+    return '{}:fields:{}:{}'.format(KEY_PREFIX, _name_hash(name), version)
+
+
+def _dump(instance):
+    return {field.attname: getattr(instance, field.attname) for field in instance._meta.concrete_fields}
+
+
+def _load(model, data):
+    return model.from_db(router.db_for_read(model), list(data.keys()), list(data.values()))
+
+
+def get_current(name):
+    """ Актуальная версия структуры из кэша или None """
+    cache = get_cache()
+    if cache is None:
+        return None
+
+    from dyn_struct.db import models
+    data = cache.get(get_current_key(name))
+    return _load(models.DynamicStructure, data) if data is not None else None
+
+
+def set_current(struct):
+    cache = get_cache()
+    if cache is not None:
+        cache.set(get_current_key(struct.name), _dump(struct), get_timeout())
+
+
+def get_fields(struct):
+    """ Поля версии структуры: из кэша, либо из БД с сохранением в кэш """
+    cache = get_cache()
+    if cache is None:
+        return struct.fields.all()
+
+    from dyn_struct.db import models
+    key = get_fields_key(struct.name, struct.version)
+    fields_data = cache.get(key)
+    if fields_data is None:
+        fields = list(struct.fields.all())
+        cache.set(key, [_dump(field) for field in fields], get_timeout())
+        return fields
+
+    fields = [_load(models.DynamicStructureField, field_data) for field_data in fields_data]
+    for field in fields:
+        field.structure = struct
+    return fields
+
+
+def _delete(keys):
+    cache = get_cache()
+    if cache is None:
+        return
+
+    cache.delete_many(keys)
+    # до фиксации транзакции другой процесс мог снова записать в кэш прежнее значение
+    transaction.on_commit(lambda: cache.delete_many(keys))
+
+
+def invalidate_current(name):
+    _delete([get_current_key(name)])
+
+
+def invalidate_fields(name, versions):
+    _delete([get_fields_key(name, version) for version in versions])
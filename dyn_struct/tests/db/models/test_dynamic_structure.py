@@ -1,6 +1,13 @@
+import json
+from unittest import mock
+
+from django.db import connection
 from django.test import TestCase
+from django.utils import timezone
+from django.test.utils import CaptureQueriesContext
 from dyn_struct import datatools, factories
-from dyn_struct.db.models import DynamicStructure, DynamicStructureField
+from dyn_struct.db.fields import DynamicData
+from dyn_struct.db.models import DynamicStructure, DynamicStructureField, defer_fingerprint
 
 
 class BaseModels(TestCase):
@@ -77,6 +84,142 @@ class DynamicStructureTestCase(BaseModels):
         self.assertNotIn(exclude_field.name, self.dyn_struct.get_field_names())
         self.assertEqual(self.dyn_struct.fields.count(), count_fields_create - 1)
 
+    def test_clone_bulk_insert(self):
+        with CaptureQueriesContext(connection) as ctx:
+            self.dyn_struct.clone()
+        field_table = DynamicStructureField._meta.db_table
+        inserts = [q for q in ctx.captured_queries if q['sql'].startswith('INSERT INTO "{}"'.format(field_table))]
+        self.assertEqual(len(inserts), 1)
+        self.assertEqual(self.dyn_struct.fields.count(), 10)
+
+    def test_clone_with_fields_override(self):
+        old_id = self.dyn_struct.id
+        changed_field = self.dyn_struct.fields.first()
+        changed_field.classes = 'col-md-6'
+        new_field = DynamicStructureField(header='new_header', row=10, position=0)
+
+        self.dyn_struct.clone(fields_override=[changed_field, new_field])
+
+        self.assertEqual(self.dyn_struct.fields.count(), 11)
+        self.assertEqual(self.dyn_struct.fields.get(header=changed_field.header).classes, 'col-md-6')
+        self.assertTrue(self.dyn_struct.fields.filter(header='new_header').exists())
+
+        old_dyn_struct = DynamicStructure.standard_objects.get(id=old_id)
+        self.assertEqual(old_dyn_struct.fields.count(), 10)
+        self.assertNotEqual(old_dyn_struct.fields.get(header=changed_field.header).classes, 'col-md-6')
+
+    def test_clone_override_ids_without_returning(self):
+        # MySQL не возвращает id строк, вставленных bulk_create
+        changed_field = self.dyn_struct.fields.first()
+        changed_field.classes = 'col-md-6'
+        new_field = DynamicStructureField(header='new_header', row=10, position=0)
+
+        with mock.patch.object(connection.features, 'can_return_columns_from_insert', False):
+            self.dyn_struct.clone(fields_override=[changed_field, new_field])
+
+        self.assertEqual(self.dyn_struct.fields.get(id=changed_field.id).classes, 'col-md-6')
+        self.assertEqual(self.dyn_struct.fields.get(id=new_field.id).header, 'new_header')
+
+    def test_clone_keeps_form_keys(self):
+        field = self.dyn_struct.fields.exclude(name='').first()
+        DynamicStructureField.objects.filter(id=field.id).update(form_key='stored_key')
+
+        self.dyn_struct.clone()
+
+        self.assertEqual(self.dyn_struct.fields.get(name=field.name, header=field.header).form_key, 'stored_key')
+
+    def test_clone_atomic(self):
+        old_id = self.dyn_struct.id
+        old_version = self.dyn_struct.version
+        broken_field = DynamicStructureField(header='broken', row=None, position=0)
+        with self.assertRaises(Exception):
+            self.dyn_struct.clone(fields_override=[broken_field])
+
+        self.assertFalse(DynamicStructure.standard_objects.get(id=old_id).is_deprecated)
+        self.assertEqual((self.dyn_struct.id, self.dyn_struct.version), (old_id, old_version))
+        self.assertIsNone(broken_field.id)
+
+    def test_defer_fingerprint(self):
+        dyn_struct = factories.DynamicStructure()
+        with CaptureQueriesContext(connection) as ctx:
+            with defer_fingerprint():
+                factories.DynamicStructureField.create_batch(size=5, structure=dyn_struct)
+                self.assertEqual(DynamicStructure.standard_objects.get(id=dyn_struct.id).fingerprint, '')
+
+        field_table = DynamicStructureField._meta.db_table
+        self.assertEqual(len([q for q in ctx.captured_queries
+                              if q['sql'].startswith('SELECT') and 'FROM "{}"'.format(field_table) in q['sql']]), 1)
+        dyn_struct.refresh_from_db()
+        self.assertEqual(dyn_struct.fingerprint, dyn_struct.compute_fingerprint())
+
+    def test_fingerprint_updated_on_field_save(self):
+        fingerprint = self.dyn_struct.compute_fingerprint()
+        self.dyn_struct.refresh_from_db()
+        self.assertEqual(self.dyn_struct.fingerprint, fingerprint)
+
+        field = self.dyn_struct.fields.first()
+        field.classes = 'col-md-6'
+        field.save()
+
+        self.dyn_struct.refresh_from_db()
+        self.assertNotEqual(self.dyn_struct.fingerprint, fingerprint)
+
+    def test_clone_skip_unchanged(self):
+        old_id = self.dyn_struct.id
+        field = self.dyn_struct.fields.first()
+
+        self.assertFalse(self.dyn_struct.clone(fields_override=[field], skip_unchanged=True))
+        self.assertEqual(self.dyn_struct.id, old_id)
+        self.assertFalse(DynamicStructure.standard_objects.get(id=old_id).is_deprecated)
+
+        field.classes = 'col-md-6'
+        self.assertTrue(self.dyn_struct.clone(fields_override=[field], skip_unchanged=True))
+        self.assertNotEqual(self.dyn_struct.id, old_id)
+        self.assertEqual(self.dyn_struct.fingerprint, self.dyn_struct.compute_fingerprint())
+
+    def test_get_current(self):
+        with self.assertNumQueries(1):
+            self.assertEqual(DynamicStructure.get_current(self.dyn_struct.name), self.dyn_struct)
+
+        with self.assertRaises(DynamicStructure.DoesNotExist):
+            DynamicStructure.get_current('unknown')
+
+    def test_get_current_after_clone_and_delete(self):
+        name = self.dyn_struct.name
+        old_id = self.dyn_struct.id
+        self.dyn_struct.clone()
+        self.assertEqual(DynamicStructure.get_current(name), self.dyn_struct)
+        self.assertNotEqual(self.dyn_struct.id, old_id)
+
+        self.dyn_struct.delete()
+        with self.assertRaises(DynamicStructure.DoesNotExist):
+            DynamicStructure.get_current(name)
+
+    def test_get_current_after_rename(self):
+        old_name = self.dyn_struct.name
+        self.dyn_struct.name = 'renamed'
+        self.dyn_struct.save()
+
+        self.assertEqual(DynamicStructure.get_current('renamed'), self.dyn_struct)
+        with self.assertRaises(DynamicStructure.DoesNotExist):
+            DynamicStructure.get_current(old_name)
+
+    def test_get_current_after_raw_save(self):
+        # loaddata сохраняет объекты через save_base(raw=True), в обход save()
+        struct = DynamicStructure(name='fixture', version=1, created=timezone.now())
+        struct.save_base(raw=True)
+        self.assertEqual(DynamicStructure.get_current('fixture'), struct)
+
+    def test_get_current_repairs_pointer(self):
+        struct, = DynamicStructure.objects.bulk_create([DynamicStructure(name='bulk', version=1)])
+        self.assertEqual(DynamicStructure.get_current('bulk'), struct)
+        with self.assertNumQueries(1):
+            DynamicStructure.get_current('bulk')
+
+        DynamicStructure.standard_objects.filter(name='bulk').update(is_deprecated=True)
+        with self.assertRaises(DynamicStructure.DoesNotExist):
+            DynamicStructure.get_current('bulk')
+
     def test_get_rows_group_by_row(self):
         count_rows = self.dyn_struct.fields.values_list('row', flat=True).distinct().count()
         form = self.dyn_struct.build_form()
@@ -118,4 +261,20 @@ class DynamicStructureTestCase(BaseModels):
         self.dyn_struct.save()
         self.assertEqual(self.dyn_struct.is_deprecated, False)
         self.dyn_struct.delete()
-        self.assertEqual(self.dyn_struct.is_deprecated, True)
\ No newline at end of file
+        self.assertEqual(self.dyn_struct.is_deprecated, True)
+
+    def test_get_verbose_keeps_data(self):
+        data = DynamicData(json.dumps({
+            'structure': self.dyn_struct.name,
+            'version': self.dyn_struct.version,
+            'form_data': {'b': ['1', '2']},
+            'verbose_data': [
+                {'row': 1, 'position': 0, 'name': 'b', 'value': ['1', '2']},
+                {'row': 0, 'position': 0, 'name': 'a', 'value': 'test'},
+            ],
+        }))
+        table = DynamicStructure.get_verbose(data)
+        self.assertEqual([[i['name'] for i in row] for row in table], [['a'], ['b']])
+        self.assertEqual(table[1][0]['display_value'], '1; 2')
+        self.assertNotIn('display_value', data.parsed['verbose_data'][0])
+        self.assertEqual(table, DynamicStructure.get_verbose(data))
@@ -1,9 +1,11 @@
 import json
+from unittest import mock
 
 import django
 from django.core.exceptions import ValidationError
 from django.test import TestCase
 from dyn_struct import factories
+from dyn_struct.db.models import DynamicStructureField
 
 
 class BaseModels(TestCase):
@@ -45,6 +47,40 @@ class DynamicStructureFieldTestCase(BaseModels):
         self.field_struct.save()
         self.assertEqual('test_name', self.field_struct.get_transliterate_name())
 
+    def test_form_key_saved(self):
+        self.field_struct.name = 'тест поле'
+        self.field_struct.save()
+        self.assertEqual(DynamicStructureField.objects.get(id=self.field_struct.id).form_key, 'test_pole')
+
+        with mock.patch('dyn_struct.db.models.transliterate') as transliterate:
+            field = DynamicStructureField.objects.get(id=self.field_struct.id)
+            self.assertEqual(field.get_transliterate_name(), 'test_pole')
+        transliterate.assert_not_called()
+
+    def test_get_transliterate_name_after_rename(self):
+        self.field_struct.name = 'тест'
+        self.field_struct.save()
+        field = DynamicStructureField.objects.get(id=self.field_struct.id)
+
+        field.name = 'новое'
+        self.assertEqual(field.get_transliterate_name(), 'novoe')
+
+    def test_get_field_by_key(self):
+        self.field_struct.name = 'тест поле'
+        self.field_struct.save()
+        self.assertEqual(self.dyn_struct.get_field_by_key('test_pole'), self.field_struct)
+        self.assertIsNone(self.dyn_struct.get_field_by_key('unknown'))
+
+    def test_form_key_on_clone(self):
+        self.field_struct.name = 'тест'
+        self.field_struct.save()
+        new_field = DynamicStructureField(name='новое поле', header='', form_field='CharField', row=1, position=0)
+
+        self.dyn_struct.clone(fields_override=[new_field])
+
+        self.assertEqual(self.dyn_struct.get_field_by_key('test').name, 'тест')
+        self.assertEqual(self.dyn_struct.get_field_by_key('novoe_pole').name, 'новое поле')
+
     def test_is_header_true(self):
         self.field_struct.header = 'test_header'
         self.field_struct.save()
@@ -0,0 +1,62 @@
+import json
+
+from django.test import TestCase
+from dyn_struct import factories
+from dyn_struct.db.models import DynamicStructureMixin, prefetch_structures
+
+
+class Record(DynamicStructureMixin):
+    def __init__(self, structure_name, data):
+        self.structure_name = structure_name
+        self.data = data
+
+    def get_structure_name(self):
+        return self.structure_name
+
+
+def make_record(struct):
+    data = json.dumps({
+        'structure': struct.name,
+        'version': struct.version,
+        'form_data': {},
+        'verbose_data': [],
+    })
+    return Record(struct.name, data)
+
+
+class DynamicStructureMixinTestCase(TestCase):
+    def setUp(self):
+        self.dyn_struct = factories.DynamicStructure()
+        factories.DynamicStructureField.create_batch(size=3, structure=self.dyn_struct)
+
+    def test_get_structure(self):
+        record = make_record(self.dyn_struct)
+        self.assertEqual(record.get_structure(), self.dyn_struct)
+        with self.assertNumQueries(0):
+            self.assertEqual(record.get_structure(), self.dyn_struct)
+
+    def test_get_structure_version_changed(self):
+        record = make_record(self.dyn_struct)
+        record.get_structure()
+        self.dyn_struct.clone()
+        record.data = make_record(self.dyn_struct).data
+        self.assertEqual(record.get_structure().version, self.dyn_struct.version)
+
+    def test_prefetch_structures(self):
+        other_struct = factories.DynamicStructure()
+        factories.DynamicStructureField.create_batch(size=3, structure=other_struct)
+        records = [make_record(self.dyn_struct) for _ in range(5)] + [make_record(other_struct) for _ in range(5)]
+
+        with self.assertNumQueries(2):
+            records = prefetch_structures(records)
+
+        with self.assertNumQueries(0):
+            for record in records:
+                structure = record.get_structure()
+                self.assertEqual(structure.name, record.structure_name)
+                self.assertEqual(len(structure.fields.all()), 3)
+
+    def test_prefetch_structures_without_data(self):
+        records = [Record(self.dyn_struct.name, '')]
+        with self.assertNumQueries(0):
+            self.assertEqual(prefetch_structures(records), records)
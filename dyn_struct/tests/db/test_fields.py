@@ -1,8 +1,10 @@
+import json
 from unittest import mock
 
 from django.test import TestCase
 
 from dyn_struct.db import fields
+from dyn_struct.tests.models import DynamicRecord, DynamicRecordTableMixin
 
 
 class ParamsFieldTest(TestCase):
@@ -14,3 +16,56 @@ class ParamsFieldTest(TestCase):
         params_field = fields.ParamsField()
         self.assertIn(test_dict, params_field.validators)
         self.assertTrue(mock_params.called)
+
+
+class DynamicDataTest(TestCase):
+    def setUp(self):
+        self.payload = json.dumps({
+            'structure': 'тест "1"',
+            'version': 3,
+            'form_data': {'a': 1},
+            'verbose_data': [],
+        }, indent=4, ensure_ascii=False)
+
+    def test_parse_data_header(self):
+        self.assertEqual(fields.parse_data_header(self.payload), ('тест "1"', 3))
+
+    def test_parse_data_header_fallback(self):
+        payload = json.dumps({'form_data': {}, 'version': 2, 'structure': 'test'})
+        self.assertEqual(fields.parse_data_header(payload), ('test', 2))
+
+    def test_header_without_parsing(self):
+        data = fields.DynamicData(self.payload)
+        self.assertEqual(data.structure, 'тест "1"')
+        self.assertEqual(data.version, 3)
+        self.assertNotIn('parsed', data.__dict__)
+
+    def test_parsed_cached(self):
+        data = fields.DynamicData(self.payload)
+        self.assertIs(fields.parse_data(data), fields.parse_data(data))
+        self.assertEqual(data.parsed['form_data'], {'a': 1})
+        self.assertEqual(data, self.payload)
+
+
+class DynamicDataFieldTest(DynamicRecordTableMixin, TestCase):
+    def setUp(self):
+        self.payload = json.dumps({'structure': 'test', 'version': 1, 'form_data': {}, 'verbose_data': []})
+
+    def test_assignment_wraps_value(self):
+        record = DynamicRecord(structure_name='test', data=self.payload)
+        self.assertIsInstance(record.data, fields.DynamicData)
+        parsed = record.data.parsed
+
+        record.data = self.payload.replace('"version": 1', '"version": 2')
+        self.assertIsInstance(record.data, fields.DynamicData)
+        self.assertIsNot(record.data.parsed, parsed)
+        self.assertEqual(record.data.version, 2)
+
+    def test_load_from_db(self):
+        record = DynamicRecord.objects.create(structure_name='test', data=self.payload)
+        record = DynamicRecord.objects.get(id=record.id)
+        self.assertIsInstance(record.data, fields.DynamicData)
+        self.assertEqual(record.data, self.payload)
+
+        record = DynamicRecord.objects.defer('data').get(id=record.id)
+        self.assertEqual(record.data.version, 1)
@@ -0,0 +1,90 @@
+from django.db import connection
+from django.test import TestCase, TransactionTestCase
+
+from dyn_struct import factories
+from dyn_struct.datatools import get_structure_data
+from dyn_struct.db import query
+from dyn_struct.tests.models import DynamicRecord, DynamicRecordTableMixin
+
+
+class DynamicQuerySetTest(DynamicRecordTableMixin, TestCase):
+    def setUp(self):
+        self.dyn_struct = factories.DynamicStructure()
+        factories.DynamicStructureField(structure=self.dyn_struct, header='', name='возраст', form_field='IntegerField',
+                                        form_kwargs='{"required": false}')
+        factories.DynamicStructureField(structure=self.dyn_struct, header='', name='answer', form_field='CharField',
+                                        form_kwargs='{"required": false}')
+        factories.DynamicStructureField(structure=self.dyn_struct, header='', name='flag', form_field='BooleanField',
+                                        form_kwargs='{"required": false}')
+        self.records = [self.create(age, answer, flag)
+                        for age, answer, flag in (('9', 'да', True), ('10', 'нет', False), ('42', 'да', False))]
+
+    def create(self, age, answer, flag):
+        data = get_structure_data(self.dyn_struct, {'vozrast': age, 'answer': answer, 'flag': flag})
+        return DynamicRecord.objects.create(structure_name=self.dyn_struct.name, data=data)
+
+    def test_filter_dynamic_casts_by_form_field(self):
+        # без приведения к числу '9' > '10' при сравнении строк
+        qs = DynamicRecord.objects.filter_dynamic(self.dyn_struct, vozrast__gt=9).order_by('pk')
+        self.assertEqual(list(qs), self.records[1:])
+
+        qs = DynamicRecord.objects.filter_dynamic(self.dyn_struct.name, vozrast__lt=40, answer='да')
+        self.assertEqual(list(qs), self.records[:1])
+
+        self.assertEqual(list(DynamicRecord.objects.filter_dynamic(self.dyn_struct, flag=True)), self.records[:1])
+
+    def test_filter_dynamic_chained(self):
+        qs = DynamicRecord.objects.filter_dynamic(self.dyn_struct, answer='да').filter_dynamic(
+            self.dyn_struct, vozrast__gte=10
+        )
+        self.assertEqual(list(qs), self.records[2:])
+
+    def test_filter_dynamic_without_structure(self):
+        self.assertEqual(list(DynamicRecord.objects.filter_dynamic(answer='нет')), self.records[1:2])
+
+    def test_filter_dynamic_other_structure(self):
+        other_struct = factories.DynamicStructure()
+        factories.DynamicStructureField(structure=other_struct, header='', name='answer', form_field='CharField')
+        other = DynamicRecord.objects.create(structure_name=other_struct.name,
+                                             data=get_structure_data(other_struct, {'answer': 'нет'}))
+
+        self.assertEqual(list(DynamicRecord.objects.filter_dynamic(self.dyn_struct, answer='нет')), self.records[1:2])
+        self.assertEqual(list(DynamicRecord.objects.filter_dynamic(other_struct.name, answer='нет')), [other])
+        self.assertEqual(len(DynamicRecord.objects.filter_dynamic(answer='нет')), 2)
+
+    def test_filter_dynamic_empty_number(self):
+        empty = self.create('', 'нет', False)
+
+        self.assertEqual(list(DynamicRecord.objects.filter_dynamic(self.dyn_struct, vozrast__lt=5)), [])
+        self.assertEqual(list(DynamicRecord.objects.filter_dynamic(self.dyn_struct, vozrast=0)), [])
+        self.assertEqual(list(DynamicRecord.objects.filter_dynamic(self.dyn_struct, vozrast__isnull=True)), [empty])
+
+    def test_filter_structure(self):
+        DynamicRecord.objects.create(structure_name=self.dyn_struct.name, data='')
+        self.assertEqual(list(DynamicRecord.objects.filter_structure(self.dyn_struct.name).order_by('pk')),
+                         self.records)
+        self.assertFalse(DynamicRecord.objects.filter_structure('other').exists())
+
+    def test_annotate_dynamic(self):
+        qs = DynamicRecord.objects.annotate_dynamic(self.dyn_struct, age='vozrast').order_by('-age')
+        self.assertEqual(list(qs.values_list('age', flat=True)), [42, 10, 9])
+
+
+class DynamicIndexTest(DynamicRecordTableMixin, TransactionTestCase):
+    # схему SQLite нельзя менять внутри транзакции теста
+    def setUp(self):
+        self.dyn_struct = factories.DynamicStructure()
+        factories.DynamicStructureField(structure=self.dyn_struct, header='', name='возраст', form_field='IntegerField',
+                                        form_kwargs='{"required": false}')
+
+    def test_dynamic_index(self):
+        index = query.create_dynamic_index(DynamicRecord, 'vozrast', 'IntegerField')
+        try:
+            constraints = connection.introspection.get_constraints(connection.cursor(),
+                                                                   DynamicRecord._meta.db_table)
+            self.assertIn(index.name, constraints)
+
+            plan = DynamicRecord.objects.filter_dynamic(self.dyn_struct, vozrast__gt=9).explain()
+            self.assertIn(index.name, plan)
+        finally:
+            query.drop_dynamic_index(DynamicRecord, 'vozrast', 'IntegerField')
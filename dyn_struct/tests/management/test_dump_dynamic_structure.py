@@ -0,0 +1,40 @@
+import json
+import os
+import tempfile
+from contextlib import redirect_stdout
+from io import StringIO
+
+from django.core.management import call_command
+from django.test import TestCase
+
+from dyn_struct import factories
+from dyn_struct.datatools import structure_to_dict
+from dyn_struct.db.models import DynamicStructure
+
+
+class DumpDynamicStructureTest(TestCase):
+    def setUp(self):
+        for _ in range(2):
+            dyn_struct = factories.DynamicStructure()
+            factories.DynamicStructureField.create_batch(size=2, structure=dyn_struct)
+
+    def dump(self, **options):
+        out = StringIO()
+        with redirect_stdout(out):
+            call_command('dump_dynamic_structure', **options)
+        return out.getvalue()
+
+    def test_dump(self):
+        expected = [structure_to_dict(struct, is_compact=False) for struct in DynamicStructure.objects.all()]
+        self.assertEqual(self.dump(indent=2), json.dumps(expected, indent=2) + '\n')
+
+    def test_dump_jsonl(self):
+        lines = self.dump(format='jsonl', compact=True).splitlines()
+        self.assertEqual([json.loads(line) for line in lines],
+                         [structure_to_dict(struct) for struct in DynamicStructure.objects.all()])
+
+    def test_dump_shards(self):
+        with tempfile.TemporaryDirectory() as shard_dir:
+            output = self.dump(shard_dir=shard_dir, workers=2)
+            self.assertEqual(len(os.listdir(shard_dir)), 2)
+        self.assertIn('2 files written', output)
@@ -0,0 +1,60 @@
+import csv
+import json
+import os
+import tempfile
+from io import StringIO
+
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.test import TestCase
+
+from dyn_struct import factories
+from dyn_struct.datatools import get_structure_data
+from dyn_struct.tests.models import DynamicRecord, DynamicRecordTableMixin
+
+
+class ExportDynamicDataTest(DynamicRecordTableMixin, TestCase):
+    def setUp(self):
+        self.dyn_struct = factories.DynamicStructure(name='export')
+        factories.DynamicStructureField(structure=self.dyn_struct, header='', name='field', form_field='CharField')
+        for i in range(3):
+            DynamicRecord.objects.create(
+                structure_name=self.dyn_struct.name,
+                data=get_structure_data(self.dyn_struct, {'field': str(i)}),
+            )
+
+    def test_export_stdout(self):
+        out = StringIO()
+        call_command('export_dynamic_data', model='dyn_struct.DynamicRecord', structure='export', stdout=out)
+
+        rows = list(csv.reader(StringIO(out.getvalue())))
+        self.assertEqual(rows[0], ['id', 'structure_version', 'field'])
+        self.assertEqual([row[2] for row in rows[1:]], ['0', '1', '2'])
+
+    def test_export_stdout_jsonl(self):
+        out = StringIO()
+        call_command('export_dynamic_data', model='dyn_struct.DynamicRecord', structure='export', format='jsonl',
+                     stdout=out)
+
+        lines = out.getvalue().split('\n')
+        self.assertEqual(lines[-1], '')
+        self.assertEqual([json.loads(line)['field'] for line in lines[:-1]], ['0', '1', '2'])
+
+    def test_export_file(self):
+        out = StringIO()
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            path = os.path.join(tmp_dir, 'export.jsonl')
+            call_command('export_dynamic_data', model='dyn_struct.DynamicRecord', structure='export',
+                         format='jsonl', output=path, chunk_size=2, stdout=out)
+            with open(path, 'r', encoding='utf-8') as file:
+                self.assertEqual(len(file.readlines()), 3)
+
+        self.assertIn('3 records exported', out.getvalue())
+
+    def test_errors(self):
+        with self.assertRaises(CommandError):
+            call_command('export_dynamic_data', model='dyn_struct.DynamicRecord', field='missing',
+                         structure='export', stdout=StringIO())
+        with self.assertRaises(CommandError):
+            call_command('export_dynamic_data', model='dyn_struct.DynamicRecord', structure='export',
+                         format='npz', stdout=StringIO())
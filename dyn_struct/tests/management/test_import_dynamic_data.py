@@ -0,0 +1,43 @@
+import json
+import os
+import tempfile
+from io import StringIO
+
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.test import TestCase
+
+from dyn_struct import factories
+from dyn_struct.tests.models import DynamicRecord, DynamicRecordTableMixin
+
+
+class ImportDynamicDataTest(DynamicRecordTableMixin, TestCase):
+    def setUp(self):
+        self.dyn_struct = factories.DynamicStructure(name='import')
+        factories.DynamicStructureField(structure=self.dyn_struct, header='', name='field', form_field='CharField')
+
+    def test_import(self):
+        out = StringIO()
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            path = os.path.join(tmp_dir, 'records.csv')
+            rejects_path = os.path.join(tmp_dir, 'rejects.jsonl')
+            with open(path, 'w', encoding='utf-8') as file:
+                file.write('field\n1\n2\n""\n')
+
+            call_command('import_dynamic_data', path, model='dyn_struct.DynamicRecord', structure='import',
+                         defaults=['structure_name=import'], rejects=rejects_path, stdout=out)
+
+            with open(rejects_path, 'r', encoding='utf-8') as file:
+                rejects = [json.loads(line) for line in file]
+
+        self.assertIn('3 records: 2 imported, 1 rejected', out.getvalue())
+        self.assertEqual(DynamicRecord.objects.filter(structure_name='import').count(), 2)
+        self.assertEqual(rejects[0]['line'], 3)
+
+    def test_errors(self):
+        with self.assertRaises(CommandError):
+            call_command('import_dynamic_data', 'missing.csv', model='dyn_struct.DynamicRecord', structure='missing',
+                         stdout=StringIO())
+        with self.assertRaises(CommandError):
+            call_command('import_dynamic_data', 'missing.csv', model='dyn_struct.DynamicRecord', structure='import',
+                         defaults=['structure_name'], stdout=StringIO())
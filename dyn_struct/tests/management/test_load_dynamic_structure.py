@@ -0,0 +1,74 @@
+import json
+import os
+import tempfile
+from contextlib import redirect_stdout
+from io import StringIO
+
+from django.core.management import CommandError, call_command
+from django.test import TestCase
+
+from dyn_struct.db.models import DynamicStructure
+from dyn_struct.tests.test_loading import make_struct_info
+
+
+class LoadDynamicStructureTest(TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.struct_infos = [make_struct_info(name='test_command_{}'.format(i), count=2) for i in range(3)]
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def load(self, file_name, content, **options):
+        path = os.path.join(self.tmp_dir.name, file_name)
+        with open(path, 'w') as file:
+            file.write(content)
+
+        out = StringIO()
+        with redirect_stdout(out):
+            call_command('load_dynamic_structure', file=path, **options)
+        return out.getvalue()
+
+    def test_load_json(self):
+        output = self.load('structures.json', json.dumps(self.struct_infos), batch_size=2)
+        self.assertIn('test_command_0 v1: 2 created, 0 updated, 0 unchanged', output)
+        self.assertIn('3 structures loaded', output)
+        self.assertIn('Success!', output)
+        self.assertEqual(DynamicStructure.objects.filter(name__startswith='test_command_').count(), 3)
+
+    def test_load_jsonl(self):
+        content = '\n'.join(json.dumps(struct_info) for struct_info in self.struct_infos)
+        self.load('structures.jsonl', content)
+        self.assertEqual(DynamicStructure.objects.filter(name__startswith='test_command_').count(), 3)
+
+    def test_load_with_checkpoint(self):
+        checkpoint = os.path.join(self.tmp_dir.name, 'checkpoint.json')
+        with open(checkpoint, 'w') as file:
+            json.dump({'loaded': 2}, file)
+
+        output = self.load('structures.json', json.dumps(self.struct_infos), checkpoint=checkpoint)
+
+        self.assertIn('Skip 2 loaded structures', output)
+        self.assertFalse(os.path.exists(checkpoint))
+        self.assertEqual(list(DynamicStructure.objects.filter(name__startswith='test_command_')
+                              .values_list('name', flat=True)), ['test_command_2'])
+
+    def test_workers_with_checkpoint(self):
+        with self.assertRaises(CommandError):
+            self.load('structures.json', json.dumps(self.struct_infos), workers=2, batch_size=10)
+
+    def test_load_directory(self):
+        for i, struct_info in enumerate(self.struct_infos):
+            with open(os.path.join(self.tmp_dir.name, 'shard{}.json'.format(i)), 'w') as file:
+                json.dump([struct_info], file)
+
+        out = StringIO()
+        with redirect_stdout(out):
+            call_command('load_dynamic_structure', file=self.tmp_dir.name)
+
+        self.assertIn('3 structures: 6 fields created, 0 updated, 0 unchanged', out.getvalue())
+        self.assertEqual(DynamicStructure.objects.filter(name__startswith='test_command_').count(), 3)
+
+    def test_load_missing_files(self):
+        with self.assertRaises(CommandError):
+            call_command('load_dynamic_structure', file=os.path.join(self.tmp_dir.name, '*.json'))
@@ -0,0 +1,33 @@
+from io import StringIO
+
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.test import TestCase
+
+from dyn_struct import factories
+from dyn_struct.datatools import get_structure_data
+from dyn_struct.contrib.projection.models import DynamicValue
+from dyn_struct.tests.models import DynamicRecord, DynamicRecordTableMixin
+
+
+class RebuildDynamicValuesTest(DynamicRecordTableMixin, TestCase):
+    def setUp(self):
+        super(RebuildDynamicValuesTest, self).setUp()
+        self.dyn_struct = factories.DynamicStructure()
+        factories.DynamicStructureField(structure=self.dyn_struct, header='', name='field', form_field='CharField')
+        for i in range(3):
+            DynamicRecord.objects.create(
+                structure_name=self.dyn_struct.name,
+                data=get_structure_data(self.dyn_struct, {'field': str(i)}),
+            )
+
+    def test_rebuild(self):
+        out = StringIO()
+        call_command('rebuild_dynamic_values', models=['dyn_struct.DynamicRecord'], stdout=out)
+
+        self.assertIn('dyn_struct.DynamicRecord: 3 records', out.getvalue())
+        self.assertEqual(DynamicValue.objects.filter(key='field').count(), 3)
+
+    def test_rebuild_not_dynamic_model(self):
+        with self.assertRaises(CommandError):
+            call_command('rebuild_dynamic_values', models=['dyn_struct.DynamicStructure'], stdout=StringIO())
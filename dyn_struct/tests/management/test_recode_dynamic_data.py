@@ -0,0 +1,80 @@
+import json
+import os
+import tempfile
+from io import StringIO
+
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.test import TestCase
+
+from dyn_struct import codec, factories, recoding
+from dyn_struct.datatools import get_structure_data
+from dyn_struct.tests.models import DynamicRecord, DynamicRecordTableMixin
+
+
+class RecodeDynamicDataTest(DynamicRecordTableMixin, TestCase):
+    def setUp(self):
+        self.dyn_struct = factories.DynamicStructure()
+        factories.DynamicStructureField(structure=self.dyn_struct, header='', name='field', form_field='CharField')
+        self.records = [
+            DynamicRecord.objects.create(
+                structure_name=self.dyn_struct.name,
+                data=get_structure_data(self.dyn_struct, {'field': str(i)}, data_format=codec.FORMAT_VERBOSE),
+            )
+            for i in range(5)
+        ]
+        DynamicRecord.objects.create(structure_name=self.dyn_struct.name, data='')
+
+    def recode(self, **options):
+        out = StringIO()
+        call_command('recode_dynamic_data', model='dyn_struct.DynamicRecord', chunk_size=2, stdout=out, **options)
+        return out.getvalue()
+
+    def test_recode(self):
+        verbose = [record.get_verbose_data() for record in self.records]
+        output = self.recode()
+        self.assertIn('6 rows, 5 recoded', output)
+
+        for record, record_verbose in zip(DynamicRecord.objects.exclude(data=''), verbose):
+            data = json.loads(record.data)
+            self.assertEqual(codec.get_format(data), codec.FORMAT_COMPACT)
+            self.assertEqual(record.get_verbose_data(), record_verbose)
+
+        self.assertIn('6 rows, 0 recoded', self.recode())
+
+    def test_dry_run(self):
+        output = self.recode(dry_run=True)
+        self.assertIn('6 rows, 5 to recode', output)
+        for record in DynamicRecord.objects.exclude(data=''):
+            self.assertEqual(codec.get_format(json.loads(record.data)), codec.FORMAT_VERBOSE)
+
+    def test_dry_run_keeps_checkpoint_dir_empty(self):
+        with tempfile.TemporaryDirectory() as checkpoint_dir:
+            self.recode(dry_run=True, checkpoint=checkpoint_dir)
+            self.assertEqual(os.listdir(checkpoint_dir), [])
+
+    def test_unknown_field(self):
+        with self.assertRaises(CommandError):
+            self.recode(field='missing')
+
+    def test_read_chunk(self):
+        chunk = recoding.read_chunk(DynamicRecord, 'data', (None, None), self.records[0].pk, chunk_size=2, lock=True)
+        self.assertEqual([pk for pk, _ in chunk], [record.pk for record in self.records[1:3]])
+
+    def test_checkpoint_resume(self):
+        with tempfile.TemporaryDirectory() as checkpoint_dir:
+            plan = recoding.get_plan(DynamicRecord, checkpoint_dir)
+            recoding.write_checkpoint(checkpoint_dir, plan[0], {
+                'last_pk': self.records[1].pk,
+                'stats': {'rows': 2, 'changed': 2, 'bytes_before': 0, 'bytes_after': 0},
+            })
+            output = self.recode(checkpoint=checkpoint_dir)
+            self.assertTrue(os.path.exists(recoding.get_checkpoint_path(checkpoint_dir, plan[0])))
+
+        self.assertIn('6 rows, 5 recoded', output)
+        formats = [codec.get_format(json.loads(record.data)) for record in DynamicRecord.objects.exclude(data='')]
+        self.assertEqual(formats, [codec.FORMAT_VERBOSE] * 2 + [codec.FORMAT_COMPACT] * 3)
+
+    def test_split_pk_range(self):
+        self.assertEqual(recoding.split_pk_range(1, 10, 3), [(0, 3), (3, 6), (6, 10)])
+        self.assertEqual(recoding.split_pk_range(5, 6, 4), [(4, 5), (5, 6)])
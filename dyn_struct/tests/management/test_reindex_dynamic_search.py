@@ -0,0 +1,29 @@
+from io import StringIO
+
+from django.core.management import call_command
+from django.test import TestCase
+
+from dyn_struct import factories, search
+from dyn_struct.datatools import get_structure_data
+from dyn_struct.tests.models import DynamicRecord, DynamicRecordTableMixin
+
+
+class ReindexDynamicSearchTest(DynamicRecordTableMixin, TestCase):
+    def setUp(self):
+        super(ReindexDynamicSearchTest, self).setUp()
+        self.dyn_struct = factories.DynamicStructure()
+        factories.DynamicStructureField(structure=self.dyn_struct, header='', name='field', form_field='CharField')
+        self.records = [
+            DynamicRecord.objects.create(
+                structure_name=self.dyn_struct.name,
+                data=get_structure_data(self.dyn_struct, {'field': 'значение {}'.format(i)}),
+            )
+            for i in range(3)
+        ]
+
+    def test_reindex(self):
+        out = StringIO()
+        call_command('reindex_dynamic_search', models=['dyn_struct.DynamicRecord'], chunk_size=2, stdout=out)
+
+        self.assertIn('dyn_struct.DynamicRecord: 3 records, 3 documents', out.getvalue())
+        self.assertEqual(search.search(DynamicRecord, 'значение 1'), [self.records[1].pk])
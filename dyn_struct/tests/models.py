@@ -0,0 +1,41 @@
+from django.contrib.contenttypes.models import ContentType
+from django.db import connection, models
+
+from dyn_struct.db.fields import DynamicDataField
+from dyn_struct.db.models import DynamicStructureMixin
+from dyn_struct.db.query import DynamicManager
+
+
+class DynamicRecord(DynamicStructureMixin, models.Model):
+    """ Модель-владелец динамических данных для тестов (таблица создается в setUpClass) """
+    structure_name = models.CharField(max_length=255)
+    data = DynamicDataField(blank=True)
+
+    objects = DynamicManager()
+
+    class Meta:
+        app_label = 'dyn_struct'
+
+    def get_structure_name(self):
+        return self.structure_name
+
+
+class DynamicRecordTableMixin(object):
+    """ Таблица DynamicRecord на время тестов класса """
+
+    @classmethod
+    def setUpClass(cls):
+        with connection.schema_editor() as editor:
+            editor.create_model(DynamicRecord)
+        super(DynamicRecordTableMixin, cls).setUpClass()
+
+    @classmethod
+    def tearDownClass(cls):
+        super(DynamicRecordTableMixin, cls).tearDownClass()
+        with connection.schema_editor() as editor:
+            editor.delete_model(DynamicRecord)
+
+    def setUp(self):
+        # тип DynamicRecord создается в транзакции теста и откатывается, а кэш типов хранит его между тестами
+        ContentType.objects.clear_cache()
+        super(DynamicRecordTableMixin, self).setUp()
@@ -0,0 +1,61 @@
+import json
+
+from django.test import TestCase
+
+from dyn_struct import codec, factories
+from dyn_struct.datatools import get_structure_data
+from dyn_struct.db.models import DynamicStructure
+
+
+class CodecTest(TestCase):
+    def setUp(self):
+        self.dyn_struct = factories.DynamicStructure()
+        factories.DynamicStructureField(structure=self.dyn_struct, row=0, position=0, name='', form_field='')
+        for i in range(3):
+            factories.DynamicStructureField(structure=self.dyn_struct, header='', name='field{}'.format(i),
+                                            form_field='CharField', row=1, position=i)
+        self.form_data = {'field0': 'a', 'field1': 'b', 'field2': 'в'}
+
+    def test_encode_verbose(self):
+        value = get_structure_data(self.dyn_struct, dict(self.form_data), data_format=codec.FORMAT_VERBOSE)
+        data = json.loads(value)
+        self.assertEqual(codec.get_format(data), codec.FORMAT_VERBOSE)
+        self.assertEqual(len(data['verbose_data']), 4)
+        self.assertEqual(data['form_data'], self.form_data)
+
+    def test_encode_compact(self):
+        value = get_structure_data(self.dyn_struct, dict(self.form_data), data_format=codec.FORMAT_COMPACT)
+        data = json.loads(value)
+        self.assertEqual(codec.get_format(data), codec.FORMAT_COMPACT)
+        self.assertNotIn('verbose_data', data)
+        self.assertEqual(data['structure'], self.dyn_struct.name)
+        self.assertEqual(data['version'], self.dyn_struct.version)
+        self.assertEqual(data['form_data'], self.form_data)
+        self.assertNotIn('\n', value)
+
+    def test_encode_unknown_format(self):
+        with self.assertRaises(ValueError):
+            codec.encode(self.dyn_struct.name, 1, {}, data_format=5)
+
+    def test_default_format(self):
+        value = get_structure_data(self.dyn_struct, dict(self.form_data))
+        self.assertEqual(codec.get_format(json.loads(value)), codec.FORMAT_VERBOSE)
+
+        with self.settings(DYN_STRUCT_DATA_FORMAT=codec.FORMAT_COMPACT):
+            value = get_structure_data(self.dyn_struct, dict(self.form_data))
+        self.assertEqual(codec.get_format(json.loads(value)), codec.FORMAT_COMPACT)
+
+    def test_get_verbose_same_for_formats(self):
+        verbose = get_structure_data(self.dyn_struct, dict(self.form_data), data_format=codec.FORMAT_VERBOSE)
+        compact = get_structure_data(self.dyn_struct, dict(self.form_data), data_format=codec.FORMAT_COMPACT)
+        self.assertLess(len(compact), len(verbose))
+        self.assertEqual(DynamicStructure.get_verbose(verbose), DynamicStructure.get_verbose(compact))
+        self.assertEqual(DynamicStructure.get_verbose(verbose),
+                         DynamicStructure.get_verbose(compact, structure=self.dyn_struct))
+
+    def test_recode(self):
+        verbose = get_structure_data(self.dyn_struct, dict(self.form_data), data_format=codec.FORMAT_VERBOSE)
+        compact = codec.recode(verbose)
+        self.assertEqual(compact, get_structure_data(self.dyn_struct, dict(self.form_data),
+                                                     data_format=codec.FORMAT_COMPACT))
+        self.assertEqual(codec.recode(compact, data_format=codec.FORMAT_VERBOSE), verbose)
@@ -0,0 +1,103 @@
+from django.test import TestCase
+
+from dyn_struct import compiler, factories
+from dyn_struct.db.models import DynamicStructure
+
+
+class LRUCacheTest(TestCase):
+    def test_get_set(self):
+        cache = compiler.LRUCache(maxsize=2)
+        cache.set('a', 1)
+        self.assertEqual(cache.get('a'), 1)
+        self.assertIsNone(cache.get('b'))
+        self.assertEqual(cache.get('b', 2), 2)
+
+    def test_eviction(self):
+        cache = compiler.LRUCache(maxsize=2)
+        cache.set('a', 1)
+        cache.set('b', 2)
+        cache.get('a')
+        cache.set('c', 3)
+        self.assertIn('a', cache)
+        self.assertNotIn('b', cache)
+        self.assertIn('c', cache)
+        self.assertEqual(len(cache), 2)
+
+
+class CompiledStructureTest(TestCase):
+    def setUp(self):
+        compiler.clear()
+        self.dyn_struct = factories.DynamicStructure()
+        factories.DynamicStructureField.create_batch(size=5, structure=self.dyn_struct, header='')
+
+    def test_get_compiled_cached(self):
+        compiled = compiler.get_compiled(self.dyn_struct)
+        with self.assertNumQueries(0):
+            self.assertIs(compiled, compiler.get_compiled(self.dyn_struct))
+
+    def test_build_form_without_queries(self):
+        self.dyn_struct.build_form()
+        with self.assertNumQueries(0):
+            form = self.dyn_struct.build_form(data={})
+        self.assertEqual(len(form.fields), 5)
+
+    def test_form_instances_do_not_share_fields(self):
+        form1 = self.dyn_struct.build_form()
+        form2 = self.dyn_struct.build_form()
+        self.assertIs(type(form1), type(form2))
+        for field_name in form1.fields:
+            self.assertIsNot(form1.fields[field_name], form2.fields[field_name])
+
+    def test_invalidate_on_field_save(self):
+        compiled = compiler.get_compiled(self.dyn_struct)
+        field = self.dyn_struct.fields.first()
+        field.name = 'new_name'
+        field.save()
+        self.assertIsNot(compiled, compiler.get_compiled(self.dyn_struct))
+        self.assertIn('new_name', self.dyn_struct.build_form().fields)
+
+    def test_invalidate_on_field_delete(self):
+        self.dyn_struct.build_form()
+        self.dyn_struct.fields.first().delete()
+        self.assertEqual(len(self.dyn_struct.build_form().fields), 4)
+
+    def test_invalidate_all_versions(self):
+        compiler.get_compiled(self.dyn_struct)
+        compiler.invalidate(self.dyn_struct.name)
+        self.assertEqual(len(compiler.get_cache()), 0)
+
+    def test_recompile_on_fingerprint_change(self):
+        # поля изменены другим процессом: локальный кэш не сброшен, но у строки структуры новый отпечаток
+        compiled = compiler.get_compiled(self.dyn_struct)
+        self.dyn_struct.fields.update(classes='col-md-6')
+        self.dyn_struct.update_fingerprint()
+
+        struct = DynamicStructure.standard_objects.get(id=self.dyn_struct.id)
+        recompiled = compiler.get_compiled(struct)
+        self.assertIsNot(recompiled, compiled)
+        self.assertEqual({field.classes for field in recompiled.fields}, {'col-md-6'})
+
+    def test_rows_plan(self):
+        self.dyn_struct.fields.update(row=1)
+        factories.DynamicStructureField(structure=self.dyn_struct, row=0, position=0)
+        compiled = compiler.get_compiled(self.dyn_struct)
+        self.assertEqual(len(compiled.rows), 2)
+        self.assertTrue(compiled.rows[0][0][0].is_header())
+        self.assertIsNone(compiled.rows[0][0][1])
+        positions = [field.position for field, _ in compiled.rows[1]]
+        self.assertEqual(positions, sorted(positions))
+
+    def test_get_rows_without_queries(self):
+        form = self.dyn_struct.build_form()
+        with self.assertNumQueries(0):
+            rows = self.dyn_struct.get_rows(form)
+        for row in rows:
+            for field in row:
+                self.assertEqual(field.bound_field.name, field.get_transliterate_name())
+
+    def test_bind_rows_keeps_plan(self):
+        compiled = compiler.get_compiled(self.dyn_struct)
+        compiled.bind_rows(self.dyn_struct.build_form())
+        for row in compiled.rows:
+            for field, _ in row:
+                self.assertFalse(hasattr(field, 'bound_field'))
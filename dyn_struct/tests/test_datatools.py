@@ -1,7 +1,14 @@
+from unittest import mock
+
 from django import forms
+from django.db import connection
 from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
 
+import dyn_struct.compiler
 import dyn_struct.datatools
+from dyn_struct import factories
+from dyn_struct.db import fields, models
 from dyn_struct.exceptions import CheckClassArgumentsException
 
 
@@ -57,4 +64,56 @@ class DatatoolsTest(TestCase):
         with self.assertRaises(CheckClassArgumentsException) as ex:
             dyn_struct.datatools.check_class_arguments(class_obj, {error_key1: 'test_error', error_key2: 'test_error2'})
         self.assertIn(error_key1, str(ex.exception))
-        self.assertIn(error_key2, str(ex.exception))
\ No newline at end of file
+        self.assertIn(error_key2, str(ex.exception))
+
+    def test_get_fields_fingerprint_stable(self):
+        fields_data = [
+            {'header': '', 'name': 'a', 'form_field': 'CharField', 'form_kwargs': '{"required": false}',
+             'widget': '', 'widget_kwargs': '{}', 'row': 1, 'position': 1, 'classes': ''},
+            {'header': 'Заголовок', 'name': '', 'form_field': '', 'form_kwargs': '{}',
+             'widget': '', 'widget_kwargs': '', 'row': 0, 'position': 1, 'classes': ''},
+        ]
+        reformatted = [dict(fields_data[1], widget_kwargs='{}'),
+                       dict(fields_data[0], form_kwargs='{\n    "required": false\n}')]
+
+        fingerprint = dyn_struct.datatools.get_fields_fingerprint(fields_data)
+        self.assertEqual(len(fingerprint), 64)
+        self.assertEqual(fingerprint, dyn_struct.datatools.get_fields_fingerprint(reformatted))
+
+        changed = [dict(fields_data[0], classes='col-md-6'), fields_data[1]]
+        self.assertNotEqual(fingerprint, dyn_struct.datatools.get_fields_fingerprint(changed))
+
+
+class StructureInitialTest(TestCase):
+    def setUp(self):
+        dyn_struct.compiler.clear()
+        self.struct = factories.DynamicStructure()
+        factories.DynamicStructureField(structure=self.struct, header='', name='title', form_field='CharField',
+                                        form_kwargs='{"initial": "test", "required": false}')
+        factories.DynamicStructureField(structure=self.struct, header='', name='tags',
+                                        form_field='MultipleChoiceField',
+                                        form_kwargs='{"choices": [["a", "A"]], "required": false}')
+
+    def test_get_structure_initial(self):
+        initial = dyn_struct.datatools.get_structure_initial(self.struct, prefix='data')
+        self.assertEqual(initial, {'data-title': 'test', 'data-tags': []})
+
+        initial['data-tags'].append('a')
+        self.assertEqual(dyn_struct.datatools.get_structure_initial(self.struct, prefix='data')['data-tags'], [])
+
+    def test_get_structure_initial_data_cached(self):
+        json_data = dyn_struct.datatools.get_structure_initial_data(self.struct)
+        self.assertEqual(fields.parse_data(json_data)['form_data'], {'title': 'test', 'tags': []})
+
+        with mock.patch.object(models.DynamicStructure, 'build_form') as build_form:
+            self.assertEqual(dyn_struct.datatools.get_structure_initial_data(self.struct), json_data)
+            self.assertEqual(dyn_struct.datatools.get_structure_initial_data(self.struct, validate=False), json_data)
+        build_form.assert_not_called()
+
+    def test_get_structure_initial_data_batch(self):
+        with CaptureQueriesContext(connection) as ctx:
+            batch = dyn_struct.datatools.get_structure_initial_data_batch(self.struct, 100)
+
+        self.assertEqual(len(batch), 100)
+        self.assertEqual(set(batch), {dyn_struct.datatools.get_structure_initial_data(self.struct)})
+        self.assertLessEqual(len(ctx.captured_queries), 1)
@@ -0,0 +1,58 @@
+import io
+import json
+import os
+import tempfile
+
+from django.test import TestCase
+
+from dyn_struct import dumping, factories
+from dyn_struct.datatools import structure_to_dict
+from dyn_struct.db.models import DynamicStructure
+from dyn_struct.loading import iter_structures
+
+
+class DumpingTest(TestCase):
+    def setUp(self):
+        for i in range(3):
+            dyn_struct = factories.DynamicStructure(name='тест/{}'.format(i))
+            factories.DynamicStructureField.create_batch(size=3, structure=dyn_struct)
+
+    def test_iter_structure_dicts(self):
+        with self.assertNumQueries(2):
+            items = list(dumping.iter_structure_dicts())
+        self.assertEqual(items, [structure_to_dict(struct) for struct in DynamicStructure.objects.all()])
+
+    def test_write_json(self):
+        items = list(dumping.iter_structure_dicts())
+        for kwargs in ({}, {'indent': 2}, {'indent': 4, 'sort_keys': True, 'ensure_ascii': False}):
+            file = io.StringIO()
+            dumping.write_json(iter(items), file, **kwargs)
+            self.assertEqual(file.getvalue(), json.dumps(items, **kwargs))
+
+    def test_write_json_empty(self):
+        for indent in (None, 2):
+            file = io.StringIO()
+            dumping.write_json(iter([]), file, indent=indent)
+            self.assertEqual(file.getvalue(), json.dumps([], indent=indent))
+
+    def test_write_jsonl(self):
+        items = list(dumping.iter_structure_dicts())
+        file = io.StringIO()
+        dumping.write_jsonl(items, file)
+        file.seek(0)
+        self.assertEqual(list(iter_structures(file, 'jsonl')), items)
+
+    def test_write_shards(self):
+        dyn_struct = DynamicStructure.objects.get(name='тест/0')
+        dyn_struct.clone()
+        items = list(dumping.iter_structure_dicts(DynamicStructure.standard_objects.all(), is_compact=False))
+
+        with tempfile.TemporaryDirectory() as shard_dir:
+            paths = dumping.write_shards(iter(items), shard_dir, workers=2)
+            self.assertEqual(len(paths), 3)
+
+            path = os.path.join(shard_dir, dumping.get_shard_file_name('тест/0'))
+            self.assertIn(path, paths)
+            with open(path, encoding='utf-8') as file:
+                versions = [item['version'] for item in json.load(file)]
+        self.assertEqual(versions, [2, 1])
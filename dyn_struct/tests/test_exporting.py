@@ -0,0 +1,103 @@
+import csv
+import io
+import json
+import os
+import tempfile
+import unittest
+
+from django.test import TestCase
+
+from dyn_struct import codec, exporting, factories
+from dyn_struct.datatools import get_structure_data
+from dyn_struct.tests.models import DynamicRecord, DynamicRecordTableMixin
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+
+class ExportingTest(DynamicRecordTableMixin, TestCase):
+    def setUp(self):
+        self.dyn_struct = factories.DynamicStructure(name='export')
+        factories.DynamicStructureField(structure=self.dyn_struct, header='', name='answer', form_field='CharField',
+                                        row=1, position=1)
+        factories.DynamicStructureField(structure=self.dyn_struct, header='Заголовок', name='', row=0, position=0)
+        factories.DynamicStructureField(structure=self.dyn_struct, header='', name='age', form_field='IntegerField',
+                                        form_kwargs='{"required": false}', row=0, position=1)
+
+        self.records = [
+            self.create(self.dyn_struct, answer='да', age='42'),
+            self.create(self.dyn_struct, answer='нет', age=''),
+        ]
+        other_struct = factories.DynamicStructure(name='other')
+        factories.DynamicStructureField(structure=other_struct, header='', name='answer', form_field='CharField')
+        self.create(other_struct, answer='чужой')
+        DynamicRecord.objects.create(structure_name='export', data='')
+
+    def create(self, struct, **form_data):
+        data = get_structure_data(struct, form_data, data_format=codec.FORMAT_COMPACT)
+        return DynamicRecord.objects.create(structure_name=struct.name, data=data)
+
+    def export(self, file_format, **kwargs):
+        output = io.StringIO()
+        count = exporting.export(DynamicRecord.objects.all(), 'export', output, file_format, **kwargs)
+        return count, output.getvalue()
+
+    def test_get_columns(self):
+        new_struct = factories.DynamicStructure(name='export', version=self.dyn_struct.version + 1)
+        factories.DynamicStructureField(structure=new_struct, header='', name='city', form_field='CharField')
+
+        columns = exporting.get_columns('export')
+
+        self.assertEqual([column.key for column in columns], ['city', 'age', 'answer'])
+        self.assertEqual(columns[0].label, 'city')
+        self.assertTrue(columns[1].is_numeric)
+        self.assertFalse(columns[2].is_numeric)
+
+    def test_csv(self):
+        count, output = self.export('csv', chunk_size=1)
+
+        rows = list(csv.reader(io.StringIO(output)))
+        self.assertEqual(count, 2)
+        self.assertEqual(rows, [
+            ['id', 'structure_version', 'age', 'answer'],
+            [str(self.records[0].pk), str(self.dyn_struct.version), '42', 'да'],
+            [str(self.records[1].pk), str(self.dyn_struct.version), '', 'нет'],
+        ])
+
+    def test_csv_workers(self):
+        self.assertEqual(self.export('csv', chunk_size=1, workers=2), self.export('csv', chunk_size=1))
+
+    def test_iter_records_filters_structure(self):
+        chunks = list(exporting.iter_records(DynamicRecord.objects.all(), 'export', chunk_size=10))
+        self.assertEqual([[pk for pk, _ in chunk] for chunk in chunks], [[record.pk for record in self.records]])
+
+    def test_jsonl(self):
+        count, output = self.export('jsonl')
+
+        rows = [json.loads(line) for line in output.splitlines()]
+        self.assertEqual(count, 2)
+        self.assertEqual(rows[0], {'id': self.records[0].pk, 'structure_version': self.dyn_struct.version,
+                                   'age': '42', 'answer': 'да'})
+        self.assertEqual(rows[1]['age'], '')
+
+    def test_decode_chunk(self):
+        chunk = [(1, None), (2, self.records[0].data), (3, '')]
+        self.assertEqual(exporting.decode_chunk(chunk, 'export', ['answer', 'missing']),
+                         [[2, self.dyn_struct.version, 'да', None]])
+
+    def test_format_value(self):
+        self.assertEqual(exporting._format_value(['a', 'b']), 'a; b')
+        self.assertEqual(exporting._format_value({'type': 'file', 'sha256': 'x', 'name': 'f/x.txt'}), 'f/x.txt')
+
+    @unittest.skipIf(numpy is None, 'numpy is not installed')
+    def test_npz(self):
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            count = exporting.export(DynamicRecord.objects.all(), 'export', tmp_dir, 'npz')
+            part = numpy.load(os.path.join(tmp_dir, 'part-00000.npz'))
+
+            self.assertEqual(count, 2)
+            self.assertEqual(part['age'][0], 42.0)
+            self.assertTrue(numpy.isnan(part['age'][1]))
+            self.assertEqual(list(part['answer']), ['да', 'нет'])
@@ -0,0 +1,105 @@
+import json
+import os
+import tempfile
+
+from django.core.files.storage import FileSystemStorage
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import TestCase
+
+from dyn_struct import factories, filestorage
+from dyn_struct.datatools import get_structure_data
+from dyn_struct.db.models import DynamicStructure
+
+
+class FileStorageTest(TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.storage = FileSystemStorage(location=self.tmp_dir.name, base_url='/media/')
+        self.dyn_struct = factories.DynamicStructure()
+        factories.DynamicStructureField(structure=self.dyn_struct, header='', name='document',
+                                        form_field='FileField', widget='FileInput', row=0, position=0)
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def get_data(self, content=b'content', **kwargs):
+        document = SimpleUploadedFile('scan.pdf', content, content_type='application/pdf')
+        return json.loads(get_structure_data(self.dyn_struct, {'document': document}, **kwargs))
+
+    def test_without_storage(self):
+        data = self.get_data()
+        self.assertEqual(data['form_data']['document'], 'Y29udGVudA==')
+
+    def test_store_file(self):
+        data = self.get_data(file_storage=self.storage)
+        ref = data['form_data']['document']
+        self.assertTrue(filestorage.is_file_ref(ref))
+        self.assertEqual(ref['size'], len(b'content'))
+        self.assertEqual(ref['filename'], 'scan.pdf')
+        self.assertEqual(ref['content_type'], 'application/pdf')
+        self.assertTrue(self.storage.exists(ref['name']))
+        self.assertEqual(data['verbose_data'][0]['value'], ref)
+
+    def test_cyrillic_field_name(self):
+        factories.DynamicStructureField(structure=self.dyn_struct, header='', name='скан',
+                                        form_field='FileField', widget='FileInput', row=0, position=1)
+        data = {
+            'document': SimpleUploadedFile('scan.pdf', b'content'),
+            'skan': SimpleUploadedFile('scan.png', b'image'),
+        }
+
+        stored = json.loads(get_structure_data(self.dyn_struct, dict(data), file_storage=self.storage))
+        self.assertEqual(stored['form_data']['skan']['filename'], 'scan.png')
+        self.assertNotIn('скан', stored['form_data'])
+        self.assertEqual(stored['verbose_data'][1]['value'], stored['form_data']['skan'])
+
+        data['skan'].seek(0)
+        stored = json.loads(get_structure_data(self.dyn_struct, dict(data)))
+        self.assertEqual(stored['form_data']['skan'], 'aW1hZ2U=')
+
+    def test_store_file_once(self):
+        ref1 = self.get_data(file_storage=self.storage)['form_data']['document']
+        ref2 = self.get_data(file_storage=self.storage)['form_data']['document']
+        ref3 = self.get_data(content=b'other', file_storage=self.storage)['form_data']['document']
+        self.assertEqual(ref1['name'], ref2['name'])
+        self.assertNotEqual(ref1['name'], ref3['name'])
+
+        stored = [name for _, _, names in os.walk(self.tmp_dir.name) for name in names]
+        self.assertEqual(len(stored), 2)
+
+    def test_storage_from_settings(self):
+        storages = {
+            'default': {'BACKEND': 'django.core.files.storage.InMemoryStorage'},
+            'dyn_struct': {'BACKEND': 'django.core.files.storage.FileSystemStorage',
+                           'OPTIONS': {'location': self.tmp_dir.name, 'base_url': '/media/'}},
+        }
+        with self.settings(STORAGES=storages, DYN_STRUCT_FILE_STORAGE='dyn_struct'):
+            data = json.dumps(self.get_data())
+            stored_file = DynamicStructure.get_verbose(data)[0][0]['display_value']
+
+            self.assertIsInstance(stored_file, filestorage.StoredFile)
+            self.assertEqual(stored_file.read(), b'content')
+            self.assertEqual(str(stored_file), '/media/' + stored_file.name)
+
+    def test_explicit_storage_read_back(self):
+        storages = {
+            'default': {'BACKEND': 'django.core.files.storage.InMemoryStorage'},
+            'documents': {'BACKEND': 'django.core.files.storage.FileSystemStorage',
+                          'OPTIONS': {'location': self.tmp_dir.name, 'base_url': '/documents/'}},
+        }
+        with self.settings(STORAGES=storages):
+            data = self.get_data(file_storage='documents')
+            self.assertEqual(data['form_data']['document']['storage'], 'documents')
+
+            stored_file = DynamicStructure.get_verbose(json.dumps(data))[0][0]['display_value']
+            self.assertEqual(stored_file.read(), b'content')
+            self.assertTrue(str(stored_file).startswith('/documents/'))
+
+    def test_storage_name(self):
+        self.assertEqual(filestorage.get_storage_name('documents'), 'documents')
+        self.assertIsNone(filestorage.get_storage_name(self.storage))
+        with self.settings(DYN_STRUCT_FILE_STORAGE='dyn_struct'):
+            self.assertEqual(filestorage.get_storage_name(None), 'dyn_struct')
+
+        from django.core.files.storage import storages
+        self.assertEqual(filestorage.get_storage_name(storages['default']), 'default')
@@ -1,9 +1,12 @@
 from unittest import mock
 
+from django import forms
+from django.core.exceptions import ValidationError
 from django.forms.models import modelform_factory
 from django.test import TestCase
 from dyn_struct import factories
-from dyn_struct.db import models
+from dyn_struct.datatools import get_structure_data
+from dyn_struct.db import fields, models
 from dyn_struct.forms import DynamicStructureForm, DynamicField, DynamicWidget
 
 
@@ -40,3 +43,37 @@ class DynamicStructureFormTest(TestCase):
         form = test_form(dynamic_structure_name=self.dyn_struct.name,
                          dynamic_template=test_template)
         self.assertEqual(form.fields['data'].widget.template, test_template)
+
+
+class DynamicFieldTest(TestCase):
+    def setUp(self):
+        self.dyn_struct = factories.DynamicStructure()
+        factories.DynamicStructureField(structure=self.dyn_struct, name='title', header='',
+                                        form_field='CharField', form_kwargs='{"required": true}')
+        factories.DynamicStructureField(structure=self.dyn_struct, name='count', header='',
+                                        form_field='IntegerField', form_kwargs='{"required": false}')
+
+    def build_form(self, data):
+        form_class = type('TestForm', (forms.Form,), {'data': DynamicField(label='')})
+        form = form_class(data=data)
+        form.fields['data'].widget.dynamic_structure = self.dyn_struct
+        return form
+
+    def test_clean_builds_inner_form_once(self):
+        form = self.build_form({'data-title': 'test', 'data-count': '3'})
+        with mock.patch.object(models.DynamicStructure, 'build_form', autospec=True,
+                               side_effect=models.DynamicStructure.build_form) as build_form:
+            self.assertTrue(form.is_valid())
+        self.assertEqual(build_form.call_count, 1)
+
+        form_data = fields.parse_data(form.cleaned_data['data'])['form_data']
+        self.assertEqual(form_data, {'title': 'test', 'count': '3'})
+
+    def test_clean_errors(self):
+        form = self.build_form({'data-title': '', 'data-count': 'abc'})
+        self.assertFalse(form.is_valid())
+
+        # сообщение совпадает с проверкой через get_structure_data
+        with self.assertRaises(ValidationError) as ex:
+            get_structure_data(self.dyn_struct, {'title': '', 'count': 'abc'})
+        self.assertEqual(form.errors['data'], ex.exception.messages)
@@ -0,0 +1,75 @@
+import io
+import json
+
+from django.test import TestCase
+
+from dyn_struct import codec, factories, importing
+from dyn_struct.db import fields
+from dyn_struct.tests.models import DynamicRecord, DynamicRecordTableMixin
+
+
+class ImportingTest(DynamicRecordTableMixin, TestCase):
+    def setUp(self):
+        self.dyn_struct = factories.DynamicStructure(name='import')
+        factories.DynamicStructureField(structure=self.dyn_struct, header='', name='answer', form_field='CharField')
+        factories.DynamicStructureField(structure=self.dyn_struct, header='', name='age', form_field='IntegerField',
+                                        form_kwargs='{"required": false}')
+
+    def test_iter_rows(self):
+        csv_file = io.StringIO('id,structure_version,answer,age\r\n1,1,да,42\r\n')
+        self.assertEqual(list(importing.iter_rows(csv_file, 'csv', is_export=True)), [{'answer': 'да', 'age': '42'}])
+
+        jsonl_file = io.StringIO('{"answer": "да"}\n\n{"answer": "нет", "id": "5"}\n')
+        self.assertEqual(list(importing.iter_rows(jsonl_file)), [{'answer': 'да'}, {'answer': 'нет', 'id': '5'}])
+
+    def test_validate_chunk(self):
+        rows = [(1, {'answer': 'да', 'age': '42'}), (2, {'answer': '', 'age': 'x'})]
+        accepted, rejected = importing.validate_chunk(self.dyn_struct, rows)
+
+        self.assertEqual([number for number, _ in accepted], [1])
+        data = fields.parse_data(accepted[0][1])
+        self.assertEqual(data['format'], codec.FORMAT_COMPACT)
+        self.assertEqual(data['form_data'], {'answer': 'да', 'age': '42'})
+        self.assertEqual([number for number, _, _ in rejected], [2])
+        self.assertEqual(len(rejected[0][2]), 2)
+
+    def test_validate_chunk_form_fields_only(self):
+        factories.DynamicStructureField(structure=self.dyn_struct, header='', name='tags',
+                                        form_field='MultipleChoiceField',
+                                        form_kwargs='{"choices": [["a", "a"], ["b", "b"]], "required": false}')
+        rows = [(1, {'answer': 'да', 'tags': 'a; b', 'old_field': 'x', 'id': '7'}), (2, {'answer': 'нет', 'tags': ''})]
+        accepted, rejected = importing.validate_chunk(self.dyn_struct, rows)
+
+        self.assertEqual(rejected, [])
+        self.assertEqual(fields.parse_data(accepted[0][1])['form_data'], {'answer': 'да', 'tags': ['a', 'b']})
+        self.assertEqual(fields.parse_data(accepted[1][1])['form_data'], {'answer': 'нет', 'tags': []})
+
+    def test_import_records(self):
+        rows = [{'answer': str(i), 'age': str(i)} for i in range(5)] + [{'age': '1'}]
+        rejects_file = io.StringIO()
+
+        stats = importing.import_records(DynamicRecord, 'import', iter(rows), defaults={'structure_name': 'import'},
+                                         chunk_size=2, rejects_file=rejects_file)
+
+        self.assertEqual(stats, {'rows': 6, 'imported': 5, 'rejected': 1})
+        records = list(DynamicRecord.objects.order_by('pk'))
+        self.assertEqual([record.structure_name for record in records], ['import'] * 5)
+        self.assertEqual(records[2].get_structure().version, self.dyn_struct.version)
+
+        rejects = [json.loads(line) for line in rejects_file.getvalue().splitlines()]
+        self.assertEqual(rejects[0]['line'], 6)
+        self.assertEqual(rejects[0]['data'], {'age': '1'})
+        self.assertTrue(rejects[0]['errors'])
+
+    def test_import_records_workers(self):
+        rows = [{'answer': str(i)} for i in range(7)] + [{'age': 'x'}]
+        rejects_file = io.StringIO()
+
+        stats = importing.import_records(DynamicRecord, 'import', iter(rows), defaults={'structure_name': 'import'},
+                                         chunk_size=2, workers=2, rejects_file=rejects_file)
+
+        self.assertEqual(stats, {'rows': 8, 'imported': 7, 'rejected': 1})
+        answers = [fields.parse_data(data)['form_data']['answer']
+                   for data in DynamicRecord.objects.order_by('pk').values_list('data', flat=True)]
+        self.assertEqual(answers, [str(i) for i in range(7)])
+        self.assertEqual(json.loads(rejects_file.getvalue())['line'], 8)
@@ -0,0 +1,257 @@
+import io
+import json
+import os
+import tempfile
+
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+
+from dyn_struct import factories, loading
+from dyn_struct.datatools import structure_from_dict, structure_to_dict
+from dyn_struct.db.models import DynamicStructure, DynamicStructureField
+
+
+def make_struct_info(name='test_loading', version=1, count=20):
+    return {
+        'name': name,
+        'version': version,
+        'fields': [
+            {
+                'header': '',
+                'name': 'field{}'.format(i),
+                'form_field': 'CharField',
+                'form_kwargs': '{}',
+                'widget': '',
+                'widget_kwargs': '{}',
+                'row': i // 4,
+                'position': i % 4,
+                'classes': '',
+            }
+            for i in range(count)
+        ],
+    }
+
+
+class LoadStructureTest(TestCase):
+    def test_create(self):
+        struct_info = make_struct_info()
+        with CaptureQueriesContext(connection) as ctx:
+            struct, stats = loading.load_structure(struct_info)
+
+        # включая пересчет указателя на актуальную версию (создание указателя - в точке сохранения)
+        self.assertLess(len(ctx.captured_queries), 14)
+        self.assertEqual((stats.created, stats.updated, stats.unchanged), (20, 0, 0))
+        self.assertEqual(struct.fields.count(), 20)
+        self.assertEqual(structure_to_dict(struct), struct_info)
+
+    def test_reload_unchanged(self):
+        struct_info = make_struct_info()
+        loading.load_structure(struct_info)
+        with CaptureQueriesContext(connection) as ctx:
+            struct, stats = loading.load_structure(struct_info)
+
+        self.assertEqual((stats.created, stats.updated, stats.unchanged), (0, 0, 20))
+        self.assertFalse([q for q in ctx.captured_queries if q['sql'].startswith('INSERT')])
+        self.assertEqual(DynamicStructure.standard_objects.filter(name=struct_info['name']).count(), 1)
+
+    def test_create_form_key(self):
+        struct_info = make_struct_info(count=1)
+        struct_info['fields'][0]['name'] = 'поле 1'
+        struct, _ = loading.load_structure(struct_info)
+        self.assertEqual(struct.fields.get().form_key, 'pole_1')
+
+    def test_reload_changed(self):
+        struct_info = make_struct_info()
+        loading.load_structure(struct_info)
+
+        struct_info['fields'][0]['classes'] = 'col-md-6'
+        struct_info['fields'].append(dict(struct_info['fields'][0], name='new_field'))
+        struct, stats = loading.load_structure(struct_info)
+
+        self.assertEqual((stats.created, stats.updated, stats.unchanged), (1, 1, 19))
+        self.assertEqual(struct.fields.get(name='field0').classes, 'col-md-6')
+        self.assertIn('new_field', struct.build_form().fields)
+
+    def test_reload_deprecated_version(self):
+        loading.load_structure(make_struct_info(version=1))
+        loading.load_structure(make_struct_info(version=2))
+        struct_info = dict(make_struct_info(version=1), is_deprecated=True)
+
+        struct, stats = loading.load_structure(struct_info)
+
+        self.assertEqual(struct.version, 1)
+        self.assertEqual(stats.unchanged, 20)
+        self.assertEqual(DynamicStructure.objects.get(name=struct_info['name']).version, 2)
+        self.assertEqual(DynamicStructure.get_current(struct_info['name']).version, 2)
+
+    def test_use_local_version(self):
+        dyn_struct = factories.DynamicStructure(name='test_loading')
+        factories.DynamicStructureField.create_batch(size=3, structure=dyn_struct)
+
+        struct = structure_from_dict(make_struct_info(version=7), use_local_version=True)
+
+        self.assertEqual(struct.version, dyn_struct.version + 1)
+        self.assertEqual(struct.fields.count(), 23)
+        self.assertTrue(DynamicStructure.standard_objects.get(id=dyn_struct.id).is_deprecated)
+        self.assertEqual(DynamicStructureField.objects.filter(structure=dyn_struct).count(), 3)
+
+    def test_reload_unchanged_skips_fields_query(self):
+        struct_info = make_struct_info()
+        loading.load_structure(struct_info)
+        with CaptureQueriesContext(connection) as ctx:
+            loading.load_structure(struct_info)
+
+        field_table = DynamicStructureField._meta.db_table
+        self.assertFalse([q for q in ctx.captured_queries if field_table in q['sql']])
+
+    def test_use_local_version_unchanged(self):
+        struct_info = make_struct_info()
+        struct = structure_from_dict(struct_info, use_local_version=True)
+        struct_info['fields'].reverse()
+
+        reloaded, stats = loading.load_structure(struct_info, use_local_version=True)
+
+        self.assertEqual(reloaded.version, struct.version)
+        self.assertEqual(stats.unchanged, 20)
+        self.assertEqual(DynamicStructure.standard_objects.filter(name=struct_info['name']).count(), 1)
+
+    def test_use_local_version_subset_unchanged(self):
+        struct_info = make_struct_info()
+        struct = structure_from_dict(struct_info, use_local_version=True)
+        struct_info['fields'] = struct_info['fields'][:5]
+
+        reloaded, stats = loading.load_structure(struct_info, use_local_version=True)
+
+        self.assertEqual(reloaded.version, struct.version)
+        self.assertEqual((stats.created, stats.updated, stats.unchanged), (0, 0, 5))
+
+    def test_stats_str(self):
+        _, stats = loading.load_structure(make_struct_info(count=2))
+        self.assertIn('test_loading v1: 2 created, 0 updated, 0 unchanged', str(stats))
+
+
+class StreamingLoadTest(TestCase):
+    def setUp(self):
+        self.struct_infos = [make_struct_info(name='test_loading_{}'.format(i), count=3) for i in range(5)]
+
+    def test_iter_json_array(self):
+        dumped = json.dumps([1, 234, 'a]b,', {'x': [1, 2]}, self.struct_infos], indent=2)
+        for chunk_size in (1, 3, 7, 1024):
+            items = list(loading.iter_json_array(io.StringIO(dumped), chunk_size=chunk_size))
+            self.assertEqual(items, [1, 234, 'a]b,', {'x': [1, 2]}, self.struct_infos])
+
+    def test_iter_json_array_empty(self):
+        self.assertEqual(list(loading.iter_json_array(io.StringIO(' [ ] '))), [])
+
+    def test_iter_json_array_errors(self):
+        with self.assertRaises(ValueError):
+            list(loading.iter_json_array(io.StringIO('{}')))
+        with self.assertRaises(ValueError):
+            list(loading.iter_json_array(io.StringIO('[{"a": 1}, {"b"'), chunk_size=4))
+
+    def test_iter_structures_jsonl(self):
+        dumped = '\n'.join(json.dumps(struct_info) for struct_info in self.struct_infos) + '\n\n'
+        self.assertEqual(list(loading.iter_structures(io.StringIO(dumped), 'jsonl')), self.struct_infos)
+
+    def test_load_structures_batches(self):
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            checkpoint_path = os.path.join(tmp_dir, 'checkpoint.json')
+            batches = list(loading.load_structures(iter(self.struct_infos), batch_size=2,
+                                                   checkpoint_path=checkpoint_path))
+            self.assertEqual(loading.read_checkpoint(checkpoint_path), 5)
+
+        self.assertEqual([loaded for loaded, _ in batches], [2, 4, 5])
+        self.assertEqual(DynamicStructure.objects.filter(name__startswith='test_loading_').count(), 5)
+
+    def test_load_structures_resume(self):
+        broken_infos = list(self.struct_infos)
+        broken_infos[3] = dict(broken_infos[3], fields=[{'header': '', 'name': 'broken', 'row': None}])
+
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            checkpoint_path = os.path.join(tmp_dir, 'checkpoint.json')
+            with self.assertRaises(Exception):
+                for _ in loading.load_structures(iter(broken_infos), batch_size=2, checkpoint_path=checkpoint_path):
+                    pass
+            self.assertEqual(loading.read_checkpoint(checkpoint_path), 2)
+            self.assertFalse(DynamicStructure.objects.filter(name='test_loading_2').exists())
+
+            skip = loading.read_checkpoint(checkpoint_path)
+            batches = list(loading.load_structures(iter(self.struct_infos), batch_size=2, skip=skip,
+                                                   checkpoint_path=checkpoint_path))
+
+        self.assertEqual([loaded for loaded, _ in batches], [4, 5])
+        self.assertEqual(DynamicStructure.objects.filter(name__startswith='test_loading_').count(), 5)
+
+
+class ParallelLoadTest(TestCase):
+    def test_get_files(self):
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            for file_name in ('b.json', 'a.jsonl', 'c.txt'):
+                open(os.path.join(tmp_dir, file_name), 'w').close()
+
+            self.assertEqual([os.path.basename(path) for path in loading.get_files(tmp_dir)], ['a.jsonl', 'b.json'])
+            self.assertEqual([os.path.basename(path) for path in loading.get_files(os.path.join(tmp_dir, '*.j*'))],
+                             ['a.jsonl', 'b.json'])
+        self.assertEqual(loading.get_files('/tmp/structures.json'), ['/tmp/structures.json'])
+
+    def test_group_by_name(self):
+        struct_infos = [make_struct_info('b', 2), make_struct_info('a', 1), make_struct_info('b', 1)]
+        groups = loading.group_by_name(struct_infos)
+        self.assertEqual(list(groups.keys()), ['b', 'a'])
+        self.assertEqual([i['version'] for i in groups['b']], [1, 2])
+
+    def test_load_parallel_failure(self):
+        broken_info = dict(make_struct_info('test_broken', 2), fields=[{'header': '', 'name': 'x', 'row': None}])
+        struct_infos = [
+            make_struct_info('test_ok', 1),
+            make_struct_info('test_broken', 1),
+            broken_info,
+            make_struct_info('test_broken', 3),
+        ]
+
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            paths = []
+            for i, struct_info in enumerate(struct_infos):
+                paths.append(os.path.join(tmp_dir, '{}.json'.format(i)))
+                with open(paths[-1], 'w') as file:
+                    json.dump([struct_info], file)
+
+            results = loading.load_parallel(paths, workers=1)
+
+        self.assertEqual([name for name, _, _ in results], ['test_broken', 'test_ok'])
+        name, stats_list, error = results[0]
+        self.assertEqual([stats.version for stats in stats_list], [1])
+        self.assertTrue(error.startswith('v2: IntegrityError'))
+        self.assertIsNone(results[1][2])
+        self.assertEqual(list(DynamicStructure.standard_objects.filter(name='test_broken')
+                              .values_list('version', flat=True)), [1])
+
+    def test_plan_file_tasks(self):
+        file_names = {'a.json': {'a'}, 'b1.json': {'b'}, 'b2.json': {'b', 'c'}, 'all.json': {'x', 'y', 'z'}}
+
+        self.assertEqual(sorted(loading.plan_file_tasks(file_names, workers=2)), [
+            (['a.json'], ['a']),
+            (['all.json'], ['x', 'y', 'z']),
+            (['b1.json', 'b2.json'], ['b', 'c']),
+        ])
+        self.assertEqual(loading.plan_file_tasks({'all.json': {'x', 'y', 'z'}}, workers=2),
+                         [(['all.json'], ['x', 'y']), (['all.json'], ['z'])])
+
+    def test_load_files(self):
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            path = os.path.join(tmp_dir, 'structures.jsonl')
+            with open(path, 'w') as file:
+                for struct_info in [make_struct_info('b', 2), make_struct_info('a'), make_struct_info('b', 1)]:
+                    file.write(json.dumps(struct_info) + '\n')
+
+            results = loading.load_files([path], ['b'])
+
+        self.assertEqual([(name, [stats.version for stats in stats_list]) for name, stats_list, _ in results],
+                         [('b', [1, 2])])
+        self.assertFalse(DynamicStructure.objects.filter(name='a').exists())
+
+    def test_summarize(self):
+        stats_list = [loading.load_structure(make_struct_info(name, count=2))[1] for name in ('a', 'b')]
+        self.assertEqual(loading.summarize(stats_list),
+                         '2 structures: 4 fields created, 0 updated, 0 unchanged')
@@ -0,0 +1,80 @@
+from django.test import TestCase, override_settings
+
+from dyn_struct import codec, factories, projection
+from dyn_struct.datatools import get_structure_data
+from dyn_struct.contrib.projection.models import DynamicValue
+from dyn_struct.tests.models import DynamicRecord, DynamicRecordTableMixin
+
+
+@override_settings(DYN_STRUCT_PROJECTION=True)
+class ProjectionTest(DynamicRecordTableMixin, TestCase):
+    def setUp(self):
+        super(ProjectionTest, self).setUp()
+        self.dyn_struct = factories.DynamicStructure()
+        factories.DynamicStructureField(structure=self.dyn_struct, header='', name='answer', form_field='CharField',
+                                        form_kwargs='{"required": false}')
+        factories.DynamicStructureField(structure=self.dyn_struct, header='', name='age', form_field='IntegerField',
+                                        form_kwargs='{"required": false}')
+        factories.DynamicStructureField(structure=self.dyn_struct, header='', name='flag', form_field='BooleanField',
+                                        form_kwargs='{"required": false}')
+
+    def create(self, **form_data):
+        data = get_structure_data(self.dyn_struct, dict({'answer': '', 'age': '', 'flag': False}, **form_data),
+                                  data_format=codec.FORMAT_COMPACT)
+        return DynamicRecord.objects.create(structure_name=self.dyn_struct.name, data=data)
+
+    def test_values_saved(self):
+        record = self.create(answer='да', age='42', flag=True)
+
+        values = {value.key: value for value in DynamicValue.objects.filter(object_id=record.pk)}
+        self.assertEqual(set(values), {'answer', 'age', 'flag'})
+        self.assertEqual(values['answer'].value_text, 'да')
+        self.assertEqual(values['age'].value_number, 42)
+        self.assertTrue(values['flag'].value_bool)
+        self.assertEqual(values['age'].structure_version, self.dyn_struct.version)
+
+    def test_values_updated_and_deleted(self):
+        record = self.create(answer='да')
+        record.data = get_structure_data(self.dyn_struct, {'answer': 'нет', 'age': '', 'flag': False})
+        record.save()
+        self.assertEqual(list(DynamicValue.objects.filter(key='answer').values_list('value_text', flat=True)),
+                         ['нет'])
+
+        record.delete()
+        self.assertFalse(DynamicValue.objects.exists())
+
+    def test_disabled(self):
+        with override_settings(DYN_STRUCT_PROJECTION=False):
+            self.create(answer='да')
+        self.assertFalse(DynamicValue.objects.exists())
+
+    def test_filter_by_value(self):
+        yes = self.create(answer='да', age='20')
+        no = self.create(answer='нет', age='60', flag=True)
+        records = DynamicRecord.objects.all()
+
+        self.assertEqual(list(projection.filter_by_value(records, 'answer', 'да')), [yes])
+        self.assertEqual(list(projection.filter_by_value(records, 'age', 30, lookup='gte')), [no])
+        self.assertEqual(list(projection.filter_by_value(records, 'flag', True)), [no])
+        self.assertEqual(list(projection.filter_by_value(records, 'answer', 'да', structure_name='unknown')), [])
+
+    def test_rebuild(self):
+        with override_settings(DYN_STRUCT_PROJECTION=False):
+            records = [self.create(answer=str(i)) for i in range(5)]
+            DynamicRecord.objects.create(structure_name=self.dyn_struct.name, data='')
+
+        self.assertEqual(projection.rebuild(DynamicRecord, chunk_size=2), 6)
+        self.assertEqual(DynamicValue.objects.filter(key='answer').count(), 5)
+        self.assertEqual(list(projection.filter_by_value(DynamicRecord.objects.all(), 'answer', '3')), [records[3]])
+
+    def test_rebuild_replaces_stale_values(self):
+        records = [self.create(answer=str(i)) for i in range(5)]
+        with override_settings(DYN_STRUCT_PROJECTION=False):
+            records[1].data = get_structure_data(self.dyn_struct, {'answer': 'new', 'age': '', 'flag': False})
+            records[1].save()
+            records[2].delete()
+            records[4].delete()
+
+        self.assertEqual(projection.rebuild(DynamicRecord, chunk_size=2), 3)
+        self.assertEqual(sorted(DynamicValue.objects.filter(key='answer').values_list('value_text', flat=True)),
+                         ['0', '3', 'new'])
@@ -0,0 +1,73 @@
+from unittest import mock
+
+from django.test import TestCase, override_settings
+
+from dyn_struct import compiler, factories, rendering
+from dyn_struct.db import models
+
+
+class RenderStructureTest(TestCase):
+    def setUp(self):
+        compiler.clear()
+        self.dyn_struct = factories.DynamicStructure()
+        factories.DynamicStructureField(structure=self.dyn_struct, header='Header <b>', name='', row=0, position=0)
+        factories.DynamicStructureField(structure=self.dyn_struct, header='', name='title', form_field='CharField',
+                                        row=1, position=0, classes='col-md-6')
+        factories.DynamicStructureField(structure=self.dyn_struct, header='', name='count',
+                                        form_field='IntegerField', row=1, position=1)
+        self.value = {'data-title': 'test <value>', 'data-count': 'abc'}
+
+    def render(self, value=None, template='bootstrap3'):
+        return rendering.render_structure(self.dyn_struct, 'data', value, template)
+
+    def test_render(self):
+        html = self.render(self.value)
+        self.assertIn('Header &lt;b&gt;', html)
+        self.assertIn('name="data-title"', html)
+        self.assertIn('test &lt;value&gt;', html)
+        self.assertIn('class="col-md-6"', html)
+
+    def test_python_renderer_same_markup(self):
+        factories.DynamicStructureField(structure=self.dyn_struct, header='', name='note', form_field='CharField',
+                                        form_kwargs='{"required": false, "help_text": "<i>help</i>"}',
+                                        row=2, position=0)
+        for template in ('bootstrap2', 'bootstrap3'):
+            for value in (None, self.value):
+                expected = self.render(value, template)
+                with override_settings(DYN_STRUCT_PYTHON_RENDERER=True):
+                    self.assertEqual(self.render(value, template), expected)
+
+    def test_python_renderer_disabled_by_default(self):
+        self.assertIsNone(rendering.get_python_renderer('bootstrap3'))
+        with override_settings(DYN_STRUCT_PYTHON_RENDERER=True):
+            self.assertIs(rendering.get_python_renderer('bootstrap3'), rendering.render_field_bootstrap3)
+
+    @override_settings(DYN_STRUCT_PYTHON_RENDERER=True)
+    def test_python_renderer_custom_template(self):
+        self.assertIsNone(rendering.get_python_renderer('dyn_struct/render_struct_field_bootstrap3.html'))
+        with mock.patch.object(rendering, 'render_python') as render_python:
+            html = self.render(self.value, 'dyn_struct/render_struct_field_bootstrap3.html')
+        render_python.assert_not_called()
+        self.assertIn('name="data-title"', html)
+
+    def test_render_cache_same_markup(self):
+        for template in ('bootstrap2', 'bootstrap3'):
+            for value in (None, self.value):
+                expected = self.render(value, template)
+                with override_settings(DYN_STRUCT_RENDER_CACHE=True):
+                    self.assertEqual(self.render(value, template), expected)
+                    self.assertEqual(self.render(value, template), expected)
+
+    @override_settings(DYN_STRUCT_RENDER_CACHE=True)
+    def test_render_unbound_cached(self):
+        html = self.render()
+        with mock.patch.object(models.DynamicStructure, 'build_form') as build_form:
+            self.assertEqual(self.render(), html)
+        build_form.assert_not_called()
+
+    @override_settings(DYN_STRUCT_RENDER_CACHE=True)
+    def test_render_cache_reset_with_version(self):
+        self.render()
+        factories.DynamicStructureField(structure=self.dyn_struct, header='', name='new_field',
+                                        form_field='CharField', row=2, position=0)
+        self.assertIn('name="data-new_field"', self.render())
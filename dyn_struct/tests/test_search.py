@@ -0,0 +1,91 @@
+from unittest import mock
+
+from django.test import TestCase, override_settings
+
+from dyn_struct import codec, factories, search
+from dyn_struct.datatools import get_structure_data
+from dyn_struct.contrib.search.models import DynamicSearchDocument
+from dyn_struct.tests.models import DynamicRecord, DynamicRecordTableMixin
+
+
+@override_settings(DYN_STRUCT_SEARCH=True)
+class SearchTest(DynamicRecordTableMixin, TestCase):
+    def setUp(self):
+        super(SearchTest, self).setUp()
+        self.dyn_struct = factories.DynamicStructure()
+        factories.DynamicStructureField(structure=self.dyn_struct, header='Жалобы', name='', row=0, position=0)
+        factories.DynamicStructureField(structure=self.dyn_struct, header='', name='complaints',
+                                        form_field='CharField', form_kwargs='{"required": false}', row=1, position=0)
+        factories.DynamicStructureField(structure=self.dyn_struct, header='', name='age', form_field='IntegerField',
+                                        form_kwargs='{"required": false}', row=1, position=1)
+
+    def create(self, complaints, age='30', data_format=codec.FORMAT_COMPACT):
+        data = get_structure_data(self.dyn_struct, {'complaints': complaints, 'age': age}, data_format=data_format)
+        return DynamicRecord.objects.create(structure_name=self.dyn_struct.name, data=data)
+
+    def test_get_text(self):
+        record = self.create('Головная боль', data_format=codec.FORMAT_VERBOSE)
+        self.assertEqual(search.get_text(record), 'Головная боль\n30')
+
+    def test_search(self):
+        headache = self.create('Головная боль, тошнота, слабость и головокружение')
+        pain = self.create('Боль в спине')
+        self.create('Жалоб нет')
+
+        self.assertEqual(search.search(DynamicRecord, 'боль'), [pain.pk, headache.pk])
+        self.assertEqual(search.search(DynamicRecord, 'головная БОЛЬ'), [headache.pk])
+        self.assertEqual(search.search(DynamicRecord, 'боль', limit=1), [pain.pk])
+        self.assertEqual(search.search(DynamicRecord, 'боль', structure_name='unknown'), [])
+        # ключи JSON в поиск не попадают
+        self.assertEqual(search.search(DynamicRecord, 'complaints'), [])
+        self.assertEqual(search.search(DynamicRecord, '"OR*'), [])
+
+    def test_update_and_delete(self):
+        record = self.create('Головная боль')
+        record.data = get_structure_data(self.dyn_struct, {'complaints': 'Кашель', 'age': ''})
+        record.save()
+        self.assertEqual(search.search(DynamicRecord, 'боль'), [])
+        self.assertEqual(search.search(DynamicRecord, 'кашель'), [record.pk])
+
+        record.delete()
+        self.assertEqual(search.search(DynamicRecord, 'кашель'), [])
+        self.assertFalse(DynamicSearchDocument.objects.exists())
+
+    def test_reindex(self):
+        with override_settings(DYN_STRUCT_SEARCH=False):
+            records = [self.create('запись {}'.format(i)) for i in range(5)]
+            DynamicRecord.objects.create(structure_name=self.dyn_struct.name, data='')
+        self.assertEqual(search.search(DynamicRecord, 'запись'), [])
+
+        self.assertEqual(search.reindex(DynamicRecord, chunk_size=2), (6, 5))
+        self.assertEqual(sorted(search.search(DynamicRecord, 'запись')), [record.pk for record in records])
+        self.assertEqual(search.search(DynamicRecord, '3'), [records[3].pk])
+
+        self.assertEqual(search.reindex(DynamicRecord), (6, 5))
+        self.assertEqual(DynamicSearchDocument.objects.count(), 5)
+
+    def test_reindex_replaces_stale_documents(self):
+        records = [self.create('запись {}'.format(i)) for i in range(4)]
+        with override_settings(DYN_STRUCT_SEARCH=False):
+            records[0].data = get_structure_data(self.dyn_struct, {'complaints': 'кашель', 'age': ''})
+            records[0].save()
+            records[3].delete()
+
+        self.assertEqual(search.reindex(DynamicRecord, chunk_size=2), (3, 3))
+        self.assertEqual(search.search(DynamicRecord, 'кашель'), [records[0].pk])
+        self.assertEqual(sorted(search.search(DynamicRecord, 'запись')), [records[1].pk, records[2].pk])
+
+    def test_search_fallback_matches_all_words(self):
+        headache = self.create('Головная боль и слабость')
+        self.create('Слабость, головная тяжесть')
+
+        with mock.patch.object(search, 'get_connection', return_value=mock.Mock(vendor='oracle')):
+            self.assertEqual(search.search(DynamicRecord, 'слабость боль'), [headache.pk])
+            self.assertEqual(search.search(DynamicRecord, '?!'), [])
+
+    def test_search_without_fts(self):
+        # SQLite без FTS5: миграция не создает таблицу FTS, документы ищутся через icontains
+        with mock.patch.object(search, 'uses_fts', return_value=False):
+            headache = self.create('Головная боль')
+            self.create('Кашель')
+            self.assertEqual(search.search(DynamicRecord, 'боль'), [headache.pk])
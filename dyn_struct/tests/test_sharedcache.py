@@ -0,0 +1,82 @@
+import tempfile
+
+from django.core.cache import caches
+from django.test import TestCase, override_settings
+
+from dyn_struct import compiler, factories, sharedcache
+from dyn_struct.db.models import DynamicStructure
+
+LOCMEM_CACHES = {
+    'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'},
+    'dyn_struct': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': 'dyn_struct'},
+}
+
+
+@override_settings(CACHES=LOCMEM_CACHES, DYN_STRUCT_CACHE='dyn_struct')
+class SharedCacheTest(TestCase):
+    def setUp(self):
+        caches['dyn_struct'].clear()
+        compiler.clear()
+        self.dyn_struct = factories.DynamicStructure(name='тестовая структура')
+        factories.DynamicStructureField.create_batch(size=3, structure=self.dyn_struct, header='')
+
+    def test_disabled(self):
+        with override_settings(DYN_STRUCT_CACHE=None):
+            self.assertIsNone(sharedcache.get_cache())
+            DynamicStructure.get_current(self.dyn_struct.name)
+            self.assertIsNone(sharedcache.get_current(self.dyn_struct.name))
+
+    def test_get_current_cached(self):
+        DynamicStructure.get_current(self.dyn_struct.name)
+        with self.assertNumQueries(0):
+            struct = DynamicStructure.get_current(self.dyn_struct.name)
+        self.assertEqual(struct, self.dyn_struct)
+        self.assertEqual(struct.version, self.dyn_struct.version)
+        self.assertFalse(struct._state.adding)
+
+    def test_get_current_after_clone(self):
+        DynamicStructure.get_current(self.dyn_struct.name)
+        self.dyn_struct.clone()
+        self.assertEqual(DynamicStructure.get_current(self.dyn_struct.name).version, self.dyn_struct.version)
+
+    def test_get_current_after_delete(self):
+        DynamicStructure.get_current(self.dyn_struct.name)
+        self.dyn_struct.delete()
+        with self.assertRaises(DynamicStructure.DoesNotExist):
+            DynamicStructure.get_current(self.dyn_struct.name)
+
+    def test_fields_cached(self):
+        expected = list(self.dyn_struct.get_compiled().form_class.base_fields)
+        compiler.clear()
+
+        struct = DynamicStructure.get_current(self.dyn_struct.name)
+        with self.assertNumQueries(0):
+            compiled = struct.get_compiled()
+        self.assertEqual(list(compiled.form_class.base_fields), expected)
+
+    def test_fields_invalidated(self):
+        self.dyn_struct.get_compiled()
+        factories.DynamicStructureField(structure=self.dyn_struct, header='', name='new_field', form_field='CharField')
+        compiler.clear()
+
+        self.assertIn('new_field', self.dyn_struct.get_compiled().form_class.base_fields)
+
+
+class FileSharedCacheTest(TestCase):
+    def test_file_cache(self):
+        with tempfile.TemporaryDirectory() as cache_dir:
+            file_caches = dict(LOCMEM_CACHES, dyn_struct={
+                'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache', 'LOCATION': cache_dir,
+            })
+            with override_settings(CACHES=file_caches, DYN_STRUCT_CACHE='dyn_struct'):
+                compiler.clear()
+                dyn_struct = factories.DynamicStructure()
+                factories.DynamicStructureField.create_batch(size=2, structure=dyn_struct, header='')
+                dyn_struct.get_compiled()
+                compiler.clear()
+
+                struct = DynamicStructure.get_current(dyn_struct.name)
+                with self.assertNumQueries(0):
+                    self.assertEqual(len(DynamicStructure.get_current(dyn_struct.name).get_compiled().fields), 2)
+                self.assertEqual(struct.id, dyn_struct.id)
+                caches['dyn_struct'].close()